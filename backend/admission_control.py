@@ -0,0 +1,173 @@
+from collections import OrderedDict
+from typing import Optional
+import asyncio
+import json
+import math
+import os
+import time
+
+class RouteBudget:
+    """Limits for one route class.
+
+    rate/burst: per-client token bucket (requests per second, bucket size).
+    concurrency: requests of this class processed at once across all clients.
+    queue: requests allowed to wait for a free slot; beyond that they are shed.
+    max_wait: seconds a queued request waits before it is shed.
+    """
+
+    def __init__(self, rate: float, burst: int, concurrency: int, queue: int, max_wait: float):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.queue = queue
+        self.max_wait = max_wait
+
+def _env_budget(name: str, default: RouteBudget) -> RouteBudget:
+    # e.g. ADMISSION_SEARCH="rate=20,burst=40,concurrency=32,queue=64,max_wait=2"
+    raw = os.getenv(f'ADMISSION_{name.upper()}')
+    if not raw:
+        return default
+    values = dict(item.split('=', 1) for item in raw.split(',') if '=' in item)
+    return RouteBudget(
+        rate=float(values.get('rate', default.rate)),
+        burst=int(values.get('burst', default.burst)),
+        concurrency=int(values.get('concurrency', default.concurrency)),
+        queue=int(values.get('queue', default.queue)),
+        max_wait=float(values.get('max_wait', default.max_wait)),
+    )
+
+DEFAULT_BUDGETS = {
+    'search': RouteBudget(rate=20, burst=40, concurrency=32, queue=64, max_wait=2.0),
+    'write': RouteBudget(rate=5, burst=10, concurrency=8, queue=16, max_wait=5.0),
+    'download': RouteBudget(rate=5, burst=10, concurrency=8, queue=8, max_wait=2.0),
+    # Long-lived SSE connections hold a slot for their whole lifetime
+    'stream': RouteBudget(rate=1, burst=5, concurrency=500, queue=0, max_wait=0.0),
+}
+
+# Peers whose X-Forwarded-For is believed, e.g. TRUSTED_PROXIES="10.0.0.5,10.0.0.6". From
+# anyone else the header is ignored, since a client could rotate it to get fresh buckets.
+TRUSTED_PROXIES = frozenset(ip.strip() for ip in os.getenv('TRUSTED_PROXIES', '').split(',') if ip.strip())
+
+# Paths that are never limited
+EXEMPT_PATHS = ('/api/', '/api/health')
+
+def route_class(method: str, path: str) -> Optional[str]:
+    if path in EXEMPT_PATHS or not path.startswith('/api/'):
+        return None
+    if path == '/api/properties/changes':
+        return 'stream'
+    if path.startswith('/api/files/') or path.startswith('/api/properties/export'):
+        return 'download'
+    if method in ('GET', 'HEAD') or path == '/api/properties/search':
+        return 'search'
+    if method == 'OPTIONS':
+        return None
+    return 'write'
+
+class TokenBuckets:
+    # Least recently seen clients are dropped beyond this many buckets
+    MAX_BUCKETS = 10000
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = OrderedDict()
+
+    def take(self, client: str, now: float) -> float:
+        """Take a token; returns 0 on success or the seconds until one is available"""
+        tokens, updated = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        taken = tokens >= 1
+        self._buckets[client] = (tokens - 1 if taken else tokens, now)
+        if len(self._buckets) > self.MAX_BUCKETS:
+            self._buckets.popitem(last=False)
+        return 0.0 if taken else (1 - tokens) / self.rate
+
+class ConcurrencyLimiter:
+    """Semaphore with a bounded wait queue and a wait deadline"""
+
+    def __init__(self, concurrency: int, queue: int, max_wait: float):
+        self.queue = queue
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._waiting = 0
+
+    async def acquire(self) -> bool:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return True
+        if self._waiting >= self.queue:
+            return False
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiting -= 1
+
+    def release(self):
+        self._semaphore.release()
+
+class AdmissionControlMiddleware:
+    """ASGI middleware applying per-client rate limits and per-class concurrency limits.
+
+    Over-rate clients get 429 and overloaded classes get 503, both with Retry-After, before
+    the request reaches a route or the database pool. Classes have separate budgets so a
+    search spike can't starve uploads or downloads.
+    """
+
+    def __init__(self, app, budgets: Optional[dict] = None):
+        self.app = app
+        budgets = budgets or {name: _env_budget(name, budget) for name, budget in DEFAULT_BUDGETS.items()}
+        self.buckets = {name: TokenBuckets(b.rate, b.burst) for name, b in budgets.items()}
+        self.limiters = {name: ConcurrencyLimiter(b.concurrency, b.queue, b.max_wait) for name, b in budgets.items()}
+
+    @staticmethod
+    def _client(scope) -> str:
+        client = scope.get('client')
+        peer = client[0] if client else 'unknown'
+        if peer not in TRUSTED_PROXIES:
+            return peer
+        for name, value in scope.get('headers', ()):
+            if name == b'x-forwarded-for':
+                # Nearest address not added by one of our own proxies
+                for address in reversed(value.decode('latin-1').split(',')):
+                    address = address.strip()
+                    if address and address not in TRUSTED_PROXIES:
+                        return address
+        return peer
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        name = route_class(scope['method'], scope['path'])
+        if name is None:
+            return await self.app(scope, receive, send)
+
+        retry_after = self.buckets[name].take(self._client(scope), time.monotonic())
+        if retry_after:
+            return await self._reject(send, 429, "Rate limit exceeded", retry_after)
+
+        limiter = self.limiters[name]
+        if not await limiter.acquire():
+            return await self._reject(send, 503, "Server busy, please retry", limiter.max_wait)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    @staticmethod
+    async def _reject(send, status_code: int, detail: str, retry_after: float):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': status_code,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'retry-after', str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,172 @@
+from fastapi import HTTPException
+from sqlalchemy import select
+from typing import Optional, List
+import logging
+import threading
+import time
+import pandas as pd
+import memory_profiling
+import models
+import property_service
+
+logger = logging.getLogger(__name__)
+
+GROUP_COLUMNS = ('location', 'developer', 'configurations')
+METRIC_COLUMNS = ('price_per_sqft', 'budget')
+FRAME_COLUMNS = ('budget', 'price_per_sqft', 'carpet_area', 'location', 'developer', 'configurations', 'is_hidden')
+
+QUANTILES = (0.1, 0.5, 0.9)
+
+class CatalogFrame:
+    """Columnar pandas copy of the properties table kept current from property writes.
+
+    start() loads the frame on a background thread (reads answer 503 until it is ready).
+    Writes in this process are queued by the change listener and folded in on the next
+    read. A read of a frame older than MAX_AGE schedules a background reload, which
+    bounds staleness from writes made by other workers, while the current frame keeps
+    serving; writes arriving during the reload are folded into the new frame instead.
+    The change listener only ever queues, so it never waits on a load or a fold.
+    """
+
+    MAX_AGE = 300.0
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._frame: Optional[pd.DataFrame] = None
+        self._loaded_at = 0.0
+        self._pending = {}
+        self._reloading = False
+        self._replay = {}
+        self._lock = threading.Lock()
+        # Serializes folds, so writes taken by one read are never lost to another
+        self._fold_lock = threading.Lock()
+
+    def memory_stats(self) -> dict:
+        frame = self._frame
+        if frame is None:
+            return {'entries': 0, 'bytes': 0}
+        return {'entries': len(frame), 'pending': len(self._pending), 'bytes': int(frame.memory_usage(deep=True).sum())}
+
+    def start(self):
+        """Listen for property writes and load the frame in the background"""
+        self._schedule_reload()
+
+    def stop(self):
+        property_service.remove_change_listener(self.on_change)
+
+    def _schedule_reload(self):
+        property_service.add_change_listener(self.on_change)
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+            self._replay = {}
+        threading.Thread(target=self._reload, name='catalog-frame-reload', daemon=True).start()
+
+    def _reload(self):
+        try:
+            frame = self._load()
+        except Exception:
+            logger.exception("Catalog frame reload failed")
+            with self._lock:
+                self._reloading = False
+            return
+        with self._lock:
+            # Earlier writes are in the loaded rows; only those made during the load remain
+            self._frame = frame
+            self._pending = self._replay
+            self._loaded_at = time.monotonic()
+            self._reloading = False
+            self._replay = {}
+
+    def _load(self) -> pd.DataFrame:
+        db = self.session_factory()
+        try:
+            rows = db.execute(select(
+                models.Property.property_id,
+                *[getattr(models.Property, column) for column in FRAME_COLUMNS]
+            )).all()
+        finally:
+            db.close()
+        return self._to_frame([tuple(row) for row in rows])
+
+    @staticmethod
+    def _to_frame(rows) -> pd.DataFrame:
+        frame = pd.DataFrame.from_records(rows, columns=('property_id',) + FRAME_COLUMNS, index='property_id')
+        for column in ('budget', 'price_per_sqft', 'carpet_area'):
+            frame[column] = frame[column].astype('float64')
+        frame['is_hidden'] = frame['is_hidden'].fillna(False).astype(bool)
+        return frame
+
+    def on_change(self, event: str, property_id: str, db_property: Optional[models.Property]):
+        """Property change listener: queue the row (or its removal) for the next read"""
+        row = None
+        if db_property is not None:
+            row = tuple(getattr(db_property, column) for column in FRAME_COLUMNS)
+        with self._lock:
+            self._pending[property_id] = row
+            if self._reloading:
+                self._replay[property_id] = row
+
+    def frame(self) -> pd.DataFrame:
+        if self._frame is None or time.monotonic() - self._loaded_at > self.MAX_AGE:
+            self._schedule_reload()
+        with self._fold_lock:
+            with self._lock:
+                frame, pending, self._pending = self._frame, self._pending, {}
+            if frame is None:
+                raise HTTPException(status_code=503, detail="Market analytics are starting up",
+                                    headers={"Retry-After": "5"})
+            if not pending:
+                return frame
+            upserts = [(property_id,) + row for property_id, row in pending.items() if row is not None]
+            kept = frame.drop(index=list(pending), errors='ignore')
+            folded = pd.concat([kept, self._to_frame(upserts)]) if upserts else kept
+            with self._lock:
+                # A reload swapped in meanwhile already covers these writes
+                if self._frame is frame:
+                    self._frame = folded
+            return folded
+
+_catalog_frame: Optional[CatalogFrame] = None
+
+def get_catalog_frame() -> CatalogFrame:
+    global _catalog_frame
+    if _catalog_frame is None:
+        from database import SessionLocal
+        _catalog_frame = CatalogFrame(SessionLocal)
+        memory_profiling.register_cache('catalog_frame', _catalog_frame.memory_stats)
+    return _catalog_frame
+
+def _metric_stats(grouped, column: str, counts: pd.Series) -> pd.DataFrame:
+    quantiles = grouped[column].quantile(list(QUANTILES)).unstack()
+    stats = pd.DataFrame({
+        'mean': grouped[column].mean(),
+        'median': quantiles[0.5],
+        'p10': quantiles[0.1],
+        'p90': quantiles[0.9],
+    })
+    return stats.reindex(counts.index)
+
+def market_stats(frame: pd.DataFrame, group_by: str, include_hidden: bool = True) -> List[dict]:
+    """Inventory count and price_per_sqft/budget distributions per group, largest groups first"""
+    if not include_hidden:
+        frame = frame[~frame['is_hidden']]
+    frame = frame[frame[group_by].notna()]
+    if frame.empty:
+        return []
+
+    grouped = frame.groupby(group_by, sort=False)
+    counts = grouped.size().sort_values(ascending=False, kind='stable')
+    stats = {column: _metric_stats(grouped, column, counts) for column in METRIC_COLUMNS}
+
+    # NaN (no values in the group) becomes None in the JSON response
+    stats = {column: df.astype(object).where(df.notna(), None) for column, df in stats.items()}
+    return [
+        {
+            'group': group,
+            'count': int(count),
+            **{column: stats[column].loc[group].to_dict() for column in METRIC_COLUMNS},
+        }
+        for group, count in counts.items()
+    ]
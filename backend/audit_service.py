@@ -0,0 +1,194 @@
+from fastapi import HTTPException
+from sqlalchemy import insert, or_, and_
+from sqlalchemy.orm import Session
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Optional, List
+import asyncio
+import base64
+import json
+import logging
+import os
+import models
+import schemas
+
+logger = logging.getLogger(__name__)
+
+# Events waiting to be written; recording waits for room once this many are queued
+QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))
+
+BATCH = 500
+
+# How long the first event of a batch waits for others to join it
+FLUSH_INTERVAL = 1.0
+
+# Seconds to wait before each retry of a batch that failed to write
+RETRY_DELAYS = (0.5, 1.0, 2.0, 4.0, 8.0)
+
+MAX_AUDIT_PAGE = 200
+
+class AuditLog:
+    """Admin action trail written off the request path.
+
+    record() only queues the event, so admin requests don't wait on an insert or the
+    database write lock. A background task writes whatever has queued in one transaction
+    on its own thread. When the queue is full record() waits for room, slowing admin
+    requests down to the rate the trail can be written rather than losing events.
+
+    A batch that fails to write is retried after each of RETRY_DELAYS (the queue filling
+    up meanwhile holds admin requests back), then written event by event. Only events
+    that still fail on their own are dropped, and each one dropped is logged.
+    """
+
+    def __init__(self, session_factory, queue_size: int = QUEUE_SIZE, batch: int = BATCH,
+                 flush_interval: float = FLUSH_INTERVAL):
+        self.session_factory = session_factory
+        self.queue_size = queue_size
+        self.batch = batch
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='audit-log')
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._flush_requested = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def record(self, actor: Optional[models.User], action: str, target_id: Optional[str] = None, **details):
+        """Queue one event; waits only while the queue is full"""
+        self.start()
+        if self._queue.full():
+            # No point waiting out the batch interval when callers are blocked
+            self._flush_requested.set()
+        await self._queue.put({
+            'audit_id': models.generate_uuid(),
+            'occurred_at': datetime.now(timezone.utc),
+            'actor_id': actor.user_id if actor is not None else None,
+            'action': action,
+            'target_id': target_id,
+            'details': json.dumps(details, default=str) if details else None,
+        })
+
+    async def flush(self):
+        """Write queued events now and wait until they are"""
+        if self._queue is not None:
+            self._flush_requested.set()
+            await self._queue.join()
+
+    async def stop(self):
+        """Write what is queued and stop the background task (on shutdown)"""
+        if self._task is None:
+            return
+        await self.flush()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            rows = [await self._queue.get()]
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            while len(rows) < self.batch and not self._queue.empty():
+                rows.append(self._queue.get_nowait())
+            if self._queue.empty():
+                self._flush_requested.clear()
+            try:
+                await self._write_with_retries(loop, rows)
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+    async def _write_with_retries(self, loop, rows: List[dict]):
+        for delay in RETRY_DELAYS + (None,):
+            try:
+                await loop.run_in_executor(self._executor, self._write, rows)
+                return
+            except Exception:
+                if delay is None:
+                    break
+                logger.warning("Failed to write %d audit events, retrying in %.1fs", len(rows), delay, exc_info=True)
+                await asyncio.sleep(delay)
+
+        # A single bad event shouldn't take the rest of its batch down with it
+        for row in rows:
+            try:
+                await loop.run_in_executor(self._executor, self._write, [row])
+            except Exception:
+                logger.exception("Dropping audit event %s", row)
+
+    def _write(self, rows: List[dict]):
+        db = self.session_factory()
+        try:
+            db.execute(insert(models.AuditEvent), rows)
+            db.commit()
+        finally:
+            db.close()
+
+def _encode_cursor(occurred_at: datetime, audit_id: str) -> str:
+    raw = json.dumps([occurred_at.isoformat(), audit_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor: str):
+    try:
+        occurred_at, audit_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(occurred_at), audit_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _event_to_schema(event: models.AuditEvent) -> schemas.AuditEvent:
+    return schemas.AuditEvent(
+        audit_id=event.audit_id,
+        occurred_at=event.occurred_at,
+        actor_id=event.actor_id,
+        action=event.action,
+        target_id=event.target_id,
+        details=json.loads(event.details) if event.details else None,
+    )
+
+def list_events(db: Session, actor_id: Optional[str] = None, action: Optional[str] = None,
+                target_id: Optional[str] = None, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                cursor: Optional[str] = None, limit: int = 50) -> schemas.AuditPage:
+    """Keyset-paginated audit events, newest first"""
+    query = db.query(models.AuditEvent)
+    if actor_id:
+        query = query.filter(models.AuditEvent.actor_id == actor_id)
+    if action:
+        query = query.filter(models.AuditEvent.action == action)
+    if target_id:
+        query = query.filter(models.AuditEvent.target_id == target_id)
+    if since:
+        query = query.filter(models.AuditEvent.occurred_at >= since)
+    if until:
+        query = query.filter(models.AuditEvent.occurred_at < until)
+    if cursor:
+        occurred_at, audit_id = _decode_cursor(cursor)
+        query = query.filter(or_(
+            models.AuditEvent.occurred_at < occurred_at,
+            and_(models.AuditEvent.occurred_at == occurred_at, models.AuditEvent.audit_id < audit_id)
+        ))
+
+    events = query.order_by(models.AuditEvent.occurred_at.desc(), models.AuditEvent.audit_id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_cursor = _encode_cursor(events[-1].occurred_at, events[-1].audit_id)
+    return schemas.AuditPage(events=[_event_to_schema(event) for event in events], next_cursor=next_cursor)
+
+_audit_log: Optional[AuditLog] = None
+
+def get_audit_log() -> AuditLog:
+    global _audit_log
+    if _audit_log is None:
+        from database import SessionLocal
+        _audit_log = AuditLog(SessionLocal)
+    return _audit_log
@@ -1,10 +1,14 @@
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, func
 from datetime import datetime, timedelta, timezone
-import pyotp
+from typing import Optional
+import base64
+import json
 import secrets
 import models
 import schemas
+import write_counter
 
 def create_user(db: Session, user_data: schemas.UserCreate):
     # Check if user exists
@@ -15,6 +19,7 @@ def create_user(db: Session, user_data: schemas.UserCreate):
             existing_user.role = user_data.role
             db.commit()
             db.refresh(existing_user)
+            write_counter.bump('users')
         return existing_user
     
     # Create new user
@@ -27,6 +32,7 @@ def create_user(db: Session, user_data: schemas.UserCreate):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    write_counter.bump('users')
     return db_user
 
 def get_user_by_email(db: Session, email: str):
@@ -41,6 +47,7 @@ def enable_2fa_for_user(db: Session, user_id: str) -> str:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Generate TOTP secret
+    import pyotp
     secret = pyotp.random_base32()
     user.totp_secret = secret
     user.is_2fa_enabled = True
@@ -53,6 +60,7 @@ def verify_otp(db: Session, user_id: str, otp_code: str) -> bool:
     if not user or not user.totp_secret:
         return False
     
+    import pyotp
     totp = pyotp.TOTP(user.totp_secret)
     # Verify with window to allow for time drift
     return totp.verify(otp_code, valid_window=1)
@@ -104,11 +112,78 @@ def delete_session(db: Session, session_token: str):
 def get_all_users(db: Session):
     return db.query(models.User).all()
 
+USER_SORT_COLUMNS = {
+    'created_at': models.User.created_at,
+    'email': models.User.email,
+    'username': models.User.username,
+}
+
+MAX_USER_PAGE = 200
+
+# Filtered counts stop here and are reported as approximate
+USER_COUNT_CAP = 10000
+
+def _encode_cursor(sort_value, user_id: str) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, user_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor: str, sort: str):
+    try:
+        sort_value, user_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if sort == 'created_at':
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, user_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def list_users(db: Session, role: Optional[str] = None, email_prefix: Optional[str] = None,
+               sort: str = 'created_at', order: str = 'desc', cursor: Optional[str] = None, limit: int = 50):
+    """Keyset-paginated user listing; returns a schemas.UserPage-shaped dict"""
+    sort_column = USER_SORT_COLUMNS[sort]
+    query = db.query(models.User)
+    if role:
+        query = query.filter(models.User.role == role)
+    if email_prefix:
+        # A range instead of LIKE so the email index is used on every backend
+        query = query.filter(models.User.email >= email_prefix, models.User.email < email_prefix + '\uffff')
+    filtered = query
+    
+    if cursor:
+        sort_value, user_id = _decode_cursor(cursor, sort)
+        if order == 'desc':
+            query = query.filter(or_(sort_column < sort_value, and_(sort_column == sort_value, models.User.user_id < user_id)))
+        else:
+            query = query.filter(or_(sort_column > sort_value, and_(sort_column == sort_value, models.User.user_id > user_id)))
+    
+    if order == 'desc':
+        query = query.order_by(sort_column.desc(), models.User.user_id.desc())
+    else:
+        query = query.order_by(sort_column.asc(), models.User.user_id.asc())
+    users = query.limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = _encode_cursor(getattr(users[-1], sort), users[-1].user_id)
+    
+    total = db.query(func.count()).select_from(
+        filtered.with_entities(models.User.user_id).limit(USER_COUNT_CAP + 1).subquery()
+    ).scalar()
+    return {
+        "users": users,
+        "next_cursor": next_cursor,
+        "total": min(total, USER_COUNT_CAP),
+        "total_is_approximate": total > USER_COUNT_CAP,
+    }
+
 def delete_user(db: Session, user_id: str):
     user = get_user_by_id(db, user_id)
     if user:
         db.delete(user)
         db.commit()
+        write_counter.bump('users')
         return True
     return False
 
@@ -118,5 +193,6 @@ def update_user_role(db: Session, user_id: str, new_role: str):
         user.role = new_role
         db.commit()
         db.refresh(user)
+        write_counter.bump('users')
         return user
     return None
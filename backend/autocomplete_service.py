@@ -0,0 +1,245 @@
+from fastapi import HTTPException
+from sqlalchemy import select
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Optional, List, Iterable
+import heapq
+import logging
+import threading
+import time
+import field_visibility
+import memory_profiling
+import models
+import property_service
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('location', 'developer', 'name', 'tag')
+
+MAX_LIMIT = 20
+
+# Cached prefix results per field before the cache is reset
+CACHE_SIZE = 4096
+
+# Highest code point, so prefix + _PREFIX_END sorts after every key starting with prefix
+_PREFIX_END = '\U0010ffff'
+
+class PrefixIndex:
+    """Sorted, lower-cased distinct values of one field with listing counts.
+
+    Completions for a prefix are the contiguous bisect range of the sorted keys, ranked
+    by count. Results are cached per prefix until the field's values change.
+    """
+
+    def __init__(self):
+        self.keys: List[str] = []
+        self.counts = {}
+        self.display = {}
+        self._cache = {}
+
+    def add(self, value: str):
+        key = value.strip().lower()
+        if not key:
+            return
+        if key not in self.counts:
+            insort(self.keys, key)
+            self.counts[key] = 0
+            self.display[key] = value.strip()
+        self.counts[key] += 1
+        self._cache.clear()
+
+    def load(self, values: Iterable[str]):
+        """Replace the index with values, sorting the distinct keys once"""
+        self.counts = {}
+        self.display = {}
+        for value in values:
+            key = value.strip().lower()
+            if not key:
+                continue
+            if key not in self.counts:
+                self.counts[key] = 0
+                self.display[key] = value.strip()
+            self.counts[key] += 1
+        self.keys = sorted(self.counts)
+        self._cache.clear()
+
+    def remove(self, value: str):
+        key = value.strip().lower()
+        if key not in self.counts:
+            return
+        self.counts[key] -= 1
+        if self.counts[key] <= 0:
+            del self.counts[key]
+            del self.display[key]
+            del self.keys[bisect_left(self.keys, key)]
+        self._cache.clear()
+
+    def complete(self, prefix: str, limit: int) -> List[tuple]:
+        prefix = prefix.strip().lower()
+        cached = self._cache.get((prefix, limit))
+        if cached is None:
+            start = bisect_left(self.keys, prefix)
+            stop = bisect_left(self.keys, prefix + _PREFIX_END, start)
+            top = heapq.nsmallest(limit, self.keys[start:stop], key=lambda key: (-self.counts[key], key))
+            cached = [(self.display[key], self.counts[key]) for key in top]
+            if len(self._cache) >= CACHE_SIZE:
+                self._cache.clear()
+            self._cache[(prefix, limit)] = cached
+        return cached
+
+class _Completions:
+    """One built generation of the autocomplete index (see AutocompleteIndex)"""
+
+    def __init__(self):
+        self.indexes = {field: PrefixIndex() for field in FIELDS}
+        self._values = {}
+
+    @classmethod
+    def build(cls, session_factory) -> '_Completions':
+        db = session_factory()
+        try:
+            rows = db.execute(
+                select(models.Property.property_id, models.Property.location, models.Property.developer,
+                       models.Property.name, models.Property.hidden_fields)
+                .where(models.Property.is_hidden == False)
+            ).all()
+            tags = defaultdict(list)
+            for property_id, tag_name in db.execute(select(models.PropertyTag.property_id, models.PropertyTag.tag_name)):
+                tags[property_id].append(tag_name)
+        finally:
+            db.close()
+
+        completions = cls()
+        for row in rows:
+            completions._values[row.property_id] = _property_values(
+                row.location, row.developer, row.name, tags[row.property_id], row.hidden_fields
+            )
+        # Count every value first and sort each field's keys once, rather than an insort per key
+        for field, index in completions.indexes.items():
+            index.load(value for values in completions._values.values() for value in values[field])
+        return completions
+
+    def memory_stats(self) -> dict:
+        return {
+            'entries': len(self._values),
+            'keys': sum(len(index.keys) for index in self.indexes.values()),
+            'cached_prefixes': sum(len(index._cache) for index in self.indexes.values()),
+        }
+
+    def apply(self, property_id: str, values: Optional[dict]):
+        """Swap the property's old values for values (None removes it)"""
+        for field, field_values in self._values.pop(property_id, {}).items():
+            for value in field_values:
+                self.indexes[field].remove(value)
+        if values is not None:
+            self._values[property_id] = values
+            for field, field_values in values.items():
+                for value in field_values:
+                    self.indexes[field].add(value)
+
+    def complete(self, prefix: str, fields: Iterable[str], limit: int) -> List[dict]:
+        return [
+            {'field': f, 'value': value, 'count': count}
+            for f in fields
+            for value, count in self.indexes[f].complete(prefix, limit)
+        ]
+
+def _property_values(location, developer, name, tags, hidden_fields: Optional[int]) -> dict:
+    # Fields the listing hides from the public never become suggestions
+    hidden = field_visibility.hidden_attributes(hidden_fields or 0)
+    return {
+        'location': [location] if location and 'location' not in hidden else [],
+        'developer': [developer] if developer and 'developer' not in hidden else [],
+        'name': [name] if name and 'name' not in hidden else [],
+        'tag': sorted(set(tags)) if 'tags' not in hidden else [],
+    }
+
+class AutocompleteIndex:
+    """Prefix indexes over visible properties, maintained from property writes.
+
+    start() builds the first index on a background thread (completions answer 503 until
+    it is ready), and a completion on an index older than MAX_AGE schedules a rebuild,
+    which picks up other workers' writes, while the current index keeps serving. Writes
+    arriving during a rebuild are replayed onto the new index before it is swapped in.
+    """
+
+    MAX_AGE = 300.0
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._completions: Optional[_Completions] = None
+        self._lock = threading.Lock()
+        self._built_at = 0.0
+        self._rebuilding = False
+        self._pending = []
+
+    def memory_stats(self) -> dict:
+        completions = self._completions
+        return completions.memory_stats() if completions is not None else {'entries': 0}
+
+    def start(self):
+        """Listen for property writes and build the first index in the background"""
+        self._schedule_rebuild()
+
+    def stop(self):
+        property_service.remove_change_listener(self.on_change)
+
+    def _schedule_rebuild(self):
+        property_service.add_change_listener(self.on_change)
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+            self._pending = []
+        threading.Thread(target=self._rebuild, name='autocomplete-rebuild', daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            completions = _Completions.build(self.session_factory)
+        except Exception:
+            logger.exception("Autocomplete index rebuild failed")
+            with self._lock:
+                self._rebuilding = False
+            return
+        with self._lock:
+            for property_id, values in self._pending:
+                completions.apply(property_id, values)
+            self._completions = completions
+            self._built_at = time.monotonic()
+            self._rebuilding = False
+            self._pending = []
+
+    def on_change(self, event: str, property_id: str, db_property: Optional[models.Property]):
+        """Property change listener: swap the property's old values for its new ones"""
+        values = None
+        if db_property is not None and not db_property.is_hidden:
+            values = _property_values(
+                db_property.location, db_property.developer, db_property.name,
+                [tag.tag_name for tag in db_property.tags], db_property.hidden_fields
+            )
+        with self._lock:
+            if self._completions is not None:
+                self._completions.apply(property_id, values)
+            if self._rebuilding:
+                self._pending.append((property_id, values))
+
+    def complete(self, prefix: str, field: Optional[str] = None, limit: int = 8) -> List[dict]:
+        if self._completions is None or time.monotonic() - self._built_at > self.MAX_AGE:
+            self._schedule_rebuild()
+        if self._completions is None:
+            raise HTTPException(status_code=503, detail="Autocomplete is starting up", headers={"Retry-After": "5"})
+        with self._lock:
+            suggestions = self._completions.complete(prefix, [field] if field else FIELDS, limit)
+        if field is None:
+            suggestions.sort(key=lambda s: -s['count'])
+        return suggestions[:limit]
+
+_autocomplete_index: Optional[AutocompleteIndex] = None
+
+def get_autocomplete_index() -> AutocompleteIndex:
+    global _autocomplete_index
+    if _autocomplete_index is None:
+        from database import SessionLocal
+        _autocomplete_index = AutocompleteIndex(SessionLocal)
+        memory_profiling.register_cache('autocomplete', _autocomplete_index.memory_stats)
+    return _autocomplete_index
@@ -0,0 +1,119 @@
+"""Rows/sec and bytes/row for read-only property loads: ORM entities vs Core PropertyRows.
+
+Seeds a throwaway SQLite database, then for each path times loading the catalog
+(load) and loading plus converting to schemas.Property (to schema), and measures the
+memory the loaded rows hold while alive (identity map included) with tracemalloc.
+
+    python benchmarks/bench_read_path.py [rows] [repeats]
+"""
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+DB_PATH = Path(tempfile.mkdtemp()) / 'bench_read_path.db'
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+
+from sqlalchemy import insert
+from database import engine, Base, SessionLocal
+import models
+import property_service
+
+TAGS = ['Sea View', 'Premium', 'Ready to Move', 'Gated']
+
+def seed(rows: int):
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now(timezone.utc)
+    properties = [
+        {
+            'property_id': f'property-{i:07d}',
+            'name': f'Property {i}',
+            'budget': 5000000 + i,
+            'configurations': '3 BHK',
+            'location': 'Bandra West, Mumbai',
+            'price_per_sqft': 25000.0,
+            'carpet_area': 1200.0,
+            'developer': 'Oberoi Realty',
+            'description': 'Spacious apartment with sea views and modern amenities. ' * 8,
+            'gmaps_link': 'https://maps.google.com/?q=Bandra+West+Mumbai',
+            'is_hidden': False,
+            'hidden_fields': 0,
+            'created_at': now,
+            'updated_at': now,
+        }
+        for i in range(rows)
+    ]
+    tags = [
+        {'tag_id': f'tag-{i:07d}-{j}', 'property_id': f'property-{i:07d}', 'tag_name': TAGS[(i + j) % len(TAGS)]}
+        for i in range(rows) for j in range(2)
+    ]
+    with engine.begin() as connection:
+        connection.execute(insert(models.Property), properties)
+        connection.execute(insert(models.PropertyTag), tags)
+
+def orm_lazy_tags(db, rows):
+    # The list endpoint's previous path: entities, tags loaded per property on conversion
+    properties = property_service.get_properties(db, 0, rows, show_hidden=True)
+    return properties, lambda: [property_service.property_to_schema(p) for p in properties]
+
+def orm_batched_tags(db, rows):
+    properties = property_service.get_properties(db, 0, rows, show_hidden=True)
+    tags = {}
+    ids = [p.property_id for p in properties]
+    for start in range(0, len(ids), 500):
+        tags.update(property_service.get_tags_by_property(db, ids[start:start + 500]))
+    return (properties, tags), lambda: [property_service.property_to_schema(p, tags=tags[p.property_id]) for p in properties]
+
+def core_rows(db, rows):
+    loaded = property_service.get_property_rows(db, 0, rows, show_hidden=True)
+    return loaded, lambda: [property_service.property_to_schema(row, tags=row.tags) for row in loaded]
+
+def bench(label, loader, rows, repeats):
+    best_load = best_total = float('inf')
+    for _ in range(repeats):
+        db = SessionLocal()
+        start = time.perf_counter()
+        _, convert = loader(db, rows)
+        loaded = time.perf_counter()
+        convert()
+        best_load = min(best_load, loaded - start)
+        best_total = min(best_total, time.perf_counter() - start)
+        db.close()
+
+    # Memory held by the loaded rows (and the session tracking them), before conversion
+    db = SessionLocal()
+    db.connection()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = loader(db, rows)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del held
+    db.close()
+
+    print(f"{label:<24} load {rows / best_load:>10,.0f} rows/sec   to schema {rows / best_total:>10,.0f} rows/sec"
+          f"   {size / rows:>7,.0f} bytes/row")
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    seed(rows)
+    try:
+        bench('ORM, lazy tags', orm_lazy_tags, rows, repeats)
+        bench('ORM, batched tags', orm_batched_tags, rows, repeats)
+        bench('Core PropertyRow', core_rows, rows, repeats)
+    finally:
+        engine.dispose()
+        DB_PATH.unlink(missing_ok=True)
+        DB_PATH.parent.rmdir()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Rows/sec serialized for property list responses.
+
+Compares the previous response_model path (re-validation + stdlib json) with the
+single-validation dump_json path, with and without a sparse fieldset.
+
+    python benchmarks/bench_serialization.py [rows] [repeats]
+"""
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+import schemas
+import serialization
+
+def make_properties(rows: int):
+    now = datetime.now(timezone.utc)
+    return [
+        schemas.Property(
+            property_id=f"property-{i}",
+            name=f"Property {i}",
+            budget=5000000 + i,
+            configurations='3 BHK',
+            location='Bandra West, Mumbai',
+            price_per_sqft=25000.0,
+            carpet_area=1200.0,
+            developer='Oberoi Realty',
+            description='Spacious apartment with sea views and modern amenities. ' * 8,
+            gmaps_link='https://maps.google.com/?q=Bandra+West+Mumbai',
+            is_hidden=False,
+            field_visibility=None,
+            uploaded_by=None,
+            created_at=now,
+            updated_at=now,
+            tags=['Sea View', 'Premium'],
+        )
+        for i in range(rows)
+    ]
+
+def response_model_path(properties):
+    # What FastAPI does for response_model=List[schemas.Property]
+    content = [p.model_dump(exclude_unset=True) for p in properties]
+    validated = serialization.PROPERTY_LIST_ADAPTER.validate_python(content)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+def bench(label, fn, rows, repeats):
+    best = float('inf')
+    size = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        body = fn()
+        best = min(best, time.perf_counter() - start)
+        size = len(body)
+    print(f"{label:<32} {rows / best:>12,.0f} rows/sec {size / rows:>8,.0f} bytes/row")
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    properties = make_properties(rows)
+    grid_fields = serialization.parse_fields('name,budget,location')
+    
+    bench('response_model + json', lambda: response_model_path(properties), rows, repeats)
+    bench('dump_json', lambda: serialization.dump_properties(properties), rows, repeats)
+    bench('dump_json ?fields=name,budget,location', lambda: serialization.dump_properties(properties, grid_fields), rows, repeats)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Cold start of server.py: import time and time to the first response.
+
+Each run is a fresh interpreter so module caches don't hide import costs.
+Exits non-zero when the median cold start exceeds the budget.
+
+    python benchmarks/bench_startup.py [runs] [budget_ms]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Cold-start-to-first-response budget for a single worker
+COLD_START_BUDGET_MS = 1000
+
+# Runs in the child interpreter: import the app, run its lifespan and serve
+# GET /api/health through the raw ASGI interface (no HTTP client needed).
+CHILD = r'''
+import asyncio, json, sys, time
+start = time.perf_counter()
+import server
+imported = time.perf_counter()
+
+async def first_response():
+    messages = []
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': '/api/health', 'raw_path': b'/api/health',
+        'root_path': '', 'query_string': b'', 'headers': [], 'server': ('test', 80), 'client': ('test', 1),
+    }
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    async with server.app.router.lifespan_context(server.app):
+        started = time.perf_counter()
+        await server.app(scope, receive, send)
+    return started, messages[0]['status']
+
+started, status = asyncio.run(first_response())
+done = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'startup_ms': (started - imported) * 1000,
+    'first_response_ms': (done - start) * 1000,
+    'status': status,
+}))
+'''
+
+def run_once(env):
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    budget_ms = float(sys.argv[2]) if len(sys.argv) > 2 else COLD_START_BUDGET_MS
+    env = dict(os.environ)
+    env.setdefault('UPLOAD_DIR', str(BACKEND_DIR / 'uploads'))
+
+    results = [run_once(env) for _ in range(runs)]
+    for key in ('import_ms', 'startup_ms', 'first_response_ms'):
+        values = [r[key] for r in results]
+        print(f"{key:<20} median {statistics.median(values):8.1f} ms   max {max(values):8.1f} ms")
+
+    cold_start = statistics.median(r['first_response_ms'] for r in results)
+    print(f"budget {budget_ms:.0f} ms: {'OK' if cold_start <= budget_ms else 'EXCEEDED'}")
+    sys.exit(0 if cold_start <= budget_ms else 1)
+
+if __name__ == '__main__':
+    main()
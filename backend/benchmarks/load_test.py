@@ -0,0 +1,448 @@
+"""End-to-end HTTP load test replaying the frontend's request flows.
+
+Scenarios, picked at random per arrival according to --mix:
+  login   POST /auth/init-2fa then /auth/verify-2fa with the returned demo_otp
+  search  POST /properties/search with filters drawn from the live catalog
+  get     GET /properties/{id}
+  upload  multipart POST /properties with a floor plan file (as an admin)
+
+Arrivals are open-loop (Poisson at --rate per second); at most --concurrency scenarios
+are in flight, and arrivals beyond that are counted as dropped rather than queued, so a
+slow server shows up as drops instead of silently lowering the offered load. Requests
+are spread over --clients X-Forwarded-For identities so per-client rate limits behave
+as they would with many real users; the server only honours the header from its
+TRUSTED_PROXIES, so a server started without --spawn needs TRUSTED_PROXIES=127.0.0.1.
+
+Against a running server:
+    python benchmarks/load_test.py --base-url http://127.0.0.1:8000 --rate 50 --duration 30
+
+Or start one on a scratch copy of the database and upload directory:
+    python benchmarks/load_test.py --spawn --rate 50 --duration 30 --json results.json
+
+Properties created by the upload scenario are deleted at the end unless --keep-uploads.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_MIX = 'login=1,search=6,get=3,upload=0.5'
+
+PERCENTILES = (50, 90, 99)
+
+# ---- minimal keep-alive HTTP/1.1 client ----
+
+class Response:
+    def __init__(self, status: int, headers: dict, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+class HTTPPool:
+    """Keep-alive HTTP/1.1 connections to one host over asyncio streams.
+
+    Small on purpose: the harness only needs request/response with Content-Length or
+    chunked bodies, and the stdlib keeps it free of extra dependencies.
+    """
+
+    def __init__(self, base_url: str, timeout: float):
+        parts = urlsplit(base_url)
+        if parts.scheme != 'http':
+            raise ValueError("Only http:// base URLs are supported")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._idle = []
+
+    async def request(self, method: str, path: str, headers: dict = None, body: bytes = b'') -> Response:
+        return await asyncio.wait_for(self._request(method, path, headers or {}, body), self.timeout)
+
+    async def _request(self, method: str, path: str, headers: dict, body: bytes) -> Response:
+        reader, writer = self._idle.pop() if self._idle else await asyncio.open_connection(self.host, self.port)
+        try:
+            head = [f"{method} {self.prefix}{path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                    f"Content-Length: {len(body)}"]
+            head += [f"{name}: {value}" for name, value in headers.items()]
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+            await writer.drain()
+            response = await self._read_response(reader)
+        except BaseException:
+            writer.close()
+            raise
+        if response.headers.get('connection', '').lower() == 'close':
+            writer.close()
+        else:
+            self._idle.append((reader, writer))
+        return response
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader) -> Response:
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by server")
+        status = int(status_line.split()[1])
+        headers = {}
+        cookies = []
+        while True:
+            line = (await reader.readline()).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            name = name.strip().lower()
+            if name == 'set-cookie':
+                cookies.append(value.strip())
+            headers[name] = value.strip()
+        headers['set-cookie'] = cookies
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+            headers['connection'] = 'close'
+        return Response(status, headers, body)
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
+
+def encode_multipart(fields: dict, files: dict):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content, content_type) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'.encode() + content + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+# ---- metrics ----
+
+class Stats:
+    """Latencies and status codes per endpoint"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.dropped = 0
+        self.scenarios = Counter()
+
+    def record(self, endpoint: str, seconds: float, status):
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][status] += 1
+
+    @staticmethod
+    def _percentile(ordered: list, pct: float) -> float:
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint in sorted(self.latencies):
+            ordered = sorted(self.latencies[endpoint])
+            statuses = self.statuses[endpoint]
+            errors = sum(count for status, count in statuses.items() if not (isinstance(status, int) and status < 400))
+            endpoints[endpoint] = {
+                'requests': len(ordered),
+                'throughput_rps': len(ordered) / elapsed if elapsed else 0.0,
+                'errors': errors,
+                'error_rate': errors / len(ordered),
+                **{f'p{pct}_ms': self._percentile(ordered, pct) * 1000 for pct in PERCENTILES},
+                'max_ms': ordered[-1] * 1000,
+                'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+            }
+        return {
+            'elapsed_s': elapsed,
+            'scenarios': dict(self.scenarios),
+            'dropped_arrivals': self.dropped,
+            'endpoints': endpoints,
+        }
+
+def print_summary(summary: dict):
+    print(f"elapsed {summary['elapsed_s']:.1f}s  scenarios {summary['scenarios']}  dropped arrivals {summary['dropped_arrivals']}")
+    header = f"{'endpoint':<28}{'reqs':>7}{'rps':>8}{'err%':>7}" + ''.join(f"{f'p{p}':>9}" for p in PERCENTILES) + f"{'max':>9}  statuses"
+    print(header)
+    print('-' * len(header))
+    for endpoint, row in summary['endpoints'].items():
+        print(
+            f"{endpoint:<28}{row['requests']:>7}{row['throughput_rps']:>8.1f}{row['error_rate'] * 100:>6.1f}%"
+            + ''.join(f"{row[f'p{p}_ms']:>7.1f}ms" for p in PERCENTILES)
+            + f"{row['max_ms']:>7.1f}ms  {row['statuses']}"
+        )
+
+# ---- scenarios ----
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.pool = HTTPPool(args.base_url, args.timeout)
+        self.stats = Stats()
+        self.clients = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(args.clients)]
+        self.admin_cookie = None
+        self.property_ids = []
+        self.filter_pool = []
+        self.created = []
+        self.upload_body = os.urandom(args.upload_bytes)
+
+    async def call(self, endpoint: str, method: str, path: str, headers: dict = None,
+                   body: bytes = b'', json_body=None, record: bool = True) -> Response:
+        headers = {'X-Forwarded-For': random.choice(self.clients), **(headers or {})}
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        try:
+            response = await self.pool.request(method, path, headers, body)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as exc:
+            if record:
+                self.stats.record(endpoint, time.perf_counter() - start, type(exc).__name__)
+            raise
+        if record:
+            self.stats.record(endpoint, time.perf_counter() - start, response.status)
+        return response
+
+    async def login(self, role: str = 'user', record: bool = True):
+        """init-2fa -> verify-2fa; returns the session cookie"""
+        name = f"load-{uuid.uuid4().hex[:12]}"
+        init = await self.call('POST /auth/init-2fa', 'POST', '/api/auth/init-2fa',
+                               json_body={'username': name, 'email': f"{name}@loadtest.example.com", 'role': role},
+                               record=record)
+        if init.status != 200:
+            return None
+        data = init.json()
+        verify = await self.call('POST /auth/verify-2fa', 'POST', '/api/auth/verify-2fa',
+                                 json_body={'temp_token': data['temp_token'], 'otp_code': data['demo_otp']},
+                                 record=record)
+        for cookie in verify.headers['set-cookie']:
+            if cookie.startswith('session_token='):
+                return cookie.split(';', 1)[0]
+        return None
+
+    async def search(self):
+        await self.call('POST /properties/search', 'POST', '/api/properties/search', json_body=random.choice(self.filter_pool))
+
+    async def get(self):
+        await self.call('GET /properties/{id}', 'GET', f"/api/properties/{random.choice(self.property_ids)}")
+
+    async def upload(self):
+        body, content_type = encode_multipart(
+            {
+                'name': f"Load test {uuid.uuid4().hex[:8]}",
+                'budget': random.randint(50, 500) * 100000,
+                'location': random.choice(self.locations),
+                'configurations': random.choice(('1 BHK', '2 BHK', '3 BHK')),
+                'carpet_area': random.randint(400, 2000),
+                'tags': 'loadtest',
+            },
+            {'floor_plan_file': ('plan.pdf', self.upload_body, 'application/pdf')},
+        )
+        response = await self.call('POST /properties', 'POST', '/api/properties', body=body,
+                                   headers={'Content-Type': content_type, 'Cookie': self.admin_cookie})
+        if response.status == 200:
+            self.created.append(response.json()['property_id'])
+
+    async def setup(self):
+        """Admin session plus ids and filter values sampled from the current catalog"""
+        self.admin_cookie = await self.login(role='admin', record=False)
+        if self.admin_cookie is None:
+            raise SystemExit("Could not log in an admin user")
+        response = await self.call(
+            'setup', 'GET', '/api/properties?limit=1000&fields=property_id,location,developer,configurations,budget,tags',
+            headers={'Cookie': self.admin_cookie}, record=False
+        )
+        catalog = response.json()
+        if not catalog:
+            raise SystemExit("The catalog is empty; seed it before load testing")
+
+        self.property_ids = [p['property_id'] for p in catalog]
+        self.locations = sorted({p['location'] for p in catalog if p.get('location')}) or ['Mumbai']
+        developers = sorted({p['developer'] for p in catalog if p.get('developer')})
+        configurations = sorted({p['configurations'] for p in catalog if p.get('configurations')})
+        tags = sorted({tag for p in catalog for tag in p.get('tags') or ()})
+        budgets = sorted(p['budget'] for p in catalog if p.get('budget'))
+
+        # A mix shaped like the search page: mostly one or two filters, some empty searches
+        rng = random.Random(self.args.seed)
+        for _ in range(500):
+            filters = {}
+            if rng.random() < 0.5:
+                filters['location'] = rng.choice(self.locations)
+            if developers and rng.random() < 0.2:
+                filters['developer'] = rng.choice(developers)
+            if configurations and rng.random() < 0.3:
+                filters['configurations'] = rng.choice(configurations)
+            if budgets and rng.random() < 0.4:
+                low, high = sorted(rng.sample(budgets, 2)) if len(budgets) > 1 else (budgets[0], budgets[0])
+                filters['min_budget'], filters['max_budget'] = low, high
+            if tags and rng.random() < 0.2:
+                filters['tags'] = rng.choice(tags)
+            self.filter_pool.append(filters)
+
+    async def teardown(self):
+        for property_id in self.created:
+            await self.call('cleanup', 'DELETE', f"/api/properties/{property_id}",
+                            headers={'Cookie': self.admin_cookie}, record=False)
+
+    async def run_scenario(self, name: str):
+        self.stats.scenarios[name] += 1
+        try:
+            if name == 'login':
+                await self.login()
+            else:
+                await getattr(self, name)()
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            # Already recorded against the endpoint; a fresh connection is opened next time
+            pass
+
+    async def run(self) -> dict:
+        await self.setup()
+        names, weights = zip(*parse_mix(self.args.mix).items())
+        slots = asyncio.Semaphore(self.args.concurrency)
+        tasks = set()
+
+        async def guarded(name):
+            try:
+                await self.run_scenario(name)
+            finally:
+                slots.release()
+
+        start = time.perf_counter()
+        deadline = start + self.args.duration
+        next_arrival = start
+        while True:
+            next_arrival += random.expovariate(self.args.rate)
+            if next_arrival >= deadline:
+                break
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            if slots.locked():
+                self.stats.dropped += 1
+                continue
+            await slots.acquire()
+            task = asyncio.create_task(guarded(random.choices(names, weights)[0]))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks)
+        elapsed = time.perf_counter() - start
+
+        if not self.args.keep_uploads:
+            await self.teardown()
+        self.pool.close()
+        return self.stats.summary(elapsed)
+
+def parse_mix(raw: str) -> dict:
+    mix = {}
+    for item in raw.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ('login', 'search', 'get', 'upload'):
+            raise SystemExit(f"Unknown scenario in --mix: {name}")
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+# ---- optional local server ----
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def spawn_server(workdir: Path, workers: int):
+    """uvicorn on a copy of the development database, so test data never lands in it"""
+    database = workdir / 'loadtest.db'
+    source = BACKEND_DIR / 'mak_kotwal_venus.db'
+    if source.exists():
+        shutil.copy(source, database)
+    port = _free_port()
+    env = {
+        **os.environ,
+        'DATABASE_URL': f"sqlite:///{database}",
+        'UPLOAD_DIR': str(workdir / 'uploads'),
+        'EXPORT_DIR': str(workdir / 'exports'),
+        # The harness stands in for the proxy its X-Forwarded-For clients sit behind
+        'TRUSTED_PROXIES': '127.0.0.1',
+    }
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'server:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning'],
+        cwd=BACKEND_DIR, env=env
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            if process.poll() is not None:
+                raise SystemExit("Server exited during startup")
+            time.sleep(0.1)
+    process.terminate()
+    raise SystemExit("Server did not start listening")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--spawn', action='store_true', help="start a server on a scratch database copy")
+    parser.add_argument('--workers', type=int, default=1, help="uvicorn workers with --spawn")
+    parser.add_argument('--rate', type=float, default=20.0, help="scenario arrivals per second")
+    parser.add_argument('--concurrency', type=int, default=32, help="scenarios in flight at once")
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds of load")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="scenario weights, e.g. search=6,get=3")
+    parser.add_argument('--clients', type=int, default=100, help="distinct X-Forwarded-For identities")
+    parser.add_argument('--upload-bytes', type=int, default=256 * 1024)
+    parser.add_argument('--timeout', type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep-uploads', action='store_true')
+    parser.add_argument('--json', help="also write the summary to this file")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    process = workdir = None
+    if args.spawn:
+        workdir = Path(tempfile.mkdtemp(prefix='loadtest-'))
+        process, args.base_url = spawn_server(workdir, args.workers)
+    try:
+        summary = asyncio.run(LoadTest(args).run())
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    summary['config'] = {key: getattr(args, key) for key in ('rate', 'concurrency', 'duration', 'mix', 'clients', 'upload_bytes')}
+    print_summary(summary)
+    if args.json:
+        Path(args.json).write_text(json.dumps(summary, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""Immutable, memory-mapped columnar snapshot of the property catalog.
+
+In multi-worker deployments (CATALOG_SNAPSHOT_DIR set) one builder at a time writes
+a versioned directory of .npy columns and points the CURRENT file at it. Every worker
+maps the arrays read-only, so the OS page cache holds a single copy shared by all of
+them, and picks up new versions by re-reading CURRENT.
+
+Layout of <dir>/v<version>/:
+    property_ids.npy                      row -> property_id
+    budget/price_per_sqft/carpet_area.npy float64 columns, NaN for NULL
+    is_hidden.npy                         bool column
+    <column>_codes.npy, <column>_dict.npy int32 codes into a lower-cased string dictionary
+                                          (-1 for NULL) for name, location, developer, configurations
+    tag_dict.npy, tag_offsets.npy,        tag postings in CSR form: rows for tag_dict[i] are
+    tag_rows.npy                          tag_rows[tag_offsets[i]:tag_offsets[i + 1]]
+
+    python catalog_snapshot.py build      build a snapshot from the configured database
+"""
+from sqlalchemy import select
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional, List
+import fcntl
+import logging
+import os
+import shutil
+import threading
+import time
+import numpy as np
+import models
+import schemas
+
+logger = logging.getLogger(__name__)
+
+NUMERIC_COLUMNS = ('budget', 'price_per_sqft', 'carpet_area')
+STRING_COLUMNS = ('name', 'location', 'developer', 'configurations')
+
+CURRENT_FILE = 'CURRENT'
+LOCK_FILE = '.build.lock'
+
+# Old versions kept around so workers still mapping them aren't pulled from under them
+KEEP_VERSIONS = 3
+
+def _read_version(snapshot_dir: Path) -> int:
+    try:
+        return int((snapshot_dir / CURRENT_FILE).read_text().strip())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+def _encode_strings(values: List[Optional[str]]):
+    lowered = [value.lower() if value is not None else None for value in values]
+    dictionary = sorted({value for value in lowered if value is not None})
+    index = {value: code for code, value in enumerate(dictionary)}
+    codes = np.array([index[value] if value is not None else -1 for value in lowered], dtype=np.int32)
+    return codes, np.array(dictionary, dtype=str)
+
+def build_snapshot(db, snapshot_dir: Path) -> int:
+    """Write a new snapshot version from the database and publish it; returns the version"""
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    with open(snapshot_dir / LOCK_FILE, 'w') as lock:
+        # Only one builder across all worker processes
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            return _build_locked(db, snapshot_dir)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _build_locked(db, snapshot_dir: Path) -> int:
+    version = _read_version(snapshot_dir) + 1
+    rows = db.execute(
+        select(
+            models.Property.property_id,
+            models.Property.is_hidden,
+            *[getattr(models.Property, column) for column in NUMERIC_COLUMNS + STRING_COLUMNS],
+        ).order_by(models.Property.created_at)
+    ).all()
+    row_index = {row.property_id: i for i, row in enumerate(rows)}
+
+    columns = {
+        'property_ids': np.array([row.property_id for row in rows], dtype=str),
+        'is_hidden': np.array([bool(row.is_hidden) for row in rows], dtype=bool),
+    }
+    for column in NUMERIC_COLUMNS:
+        columns[column] = np.array(
+            [getattr(row, column) if getattr(row, column) is not None else np.nan for row in rows],
+            dtype=np.float64
+        )
+    for column in STRING_COLUMNS:
+        columns[f'{column}_codes'], columns[f'{column}_dict'] = _encode_strings([getattr(row, column) for row in rows])
+
+    postings = defaultdict(set)
+    for property_id, tag_name in db.execute(select(models.PropertyTag.property_id, models.PropertyTag.tag_name)):
+        if property_id in row_index:
+            postings[tag_name].add(row_index[property_id])
+    tag_names = sorted(postings)
+    offsets = np.zeros(len(tag_names) + 1, dtype=np.int64)
+    for i, tag_name in enumerate(tag_names):
+        offsets[i + 1] = offsets[i] + len(postings[tag_name])
+    columns['tag_dict'] = np.array(tag_names, dtype=str)
+    columns['tag_offsets'] = offsets
+    columns['tag_rows'] = np.array(
+        [row for tag_name in tag_names for row in sorted(postings[tag_name])], dtype=np.int32
+    )
+
+    # Write into a temp dir, rename it into place, then flip CURRENT atomically
+    tmp_dir = snapshot_dir / f'.v{version:08d}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir()
+    for name, array in columns.items():
+        np.save(tmp_dir / f'{name}.npy', array, allow_pickle=False)
+    os.rename(tmp_dir, snapshot_dir / f'v{version:08d}')
+
+    tmp_current = snapshot_dir / f'.{CURRENT_FILE}.{os.getpid()}.tmp'
+    tmp_current.write_text(f'{version:08d}\n')
+    os.replace(tmp_current, snapshot_dir / CURRENT_FILE)
+
+    for old in sorted(snapshot_dir.glob('v*'))[:-KEEP_VERSIONS]:
+        shutil.rmtree(old, ignore_errors=True)
+    logger.info("Built catalog snapshot v%d with %d properties", version, len(rows))
+    return version
+
+class CatalogSnapshot:
+    """A read-only view over one snapshot version; arrays are memory-mapped, not copied"""
+
+    def __init__(self, path: Path, version: int):
+        self.path = path
+        self.version = version
+        self.columns = {
+            file.stem: np.load(file, mmap_mode='r', allow_pickle=False)
+            for file in path.glob('*.npy')
+        }
+
+    def __len__(self):
+        return len(self.columns['property_ids'])
+
+    def _substring_mask(self, column: str, term: str):
+        dictionary = self.columns[f'{column}_dict']
+        matching = np.flatnonzero(np.char.find(dictionary, term.lower()) >= 0)
+        return np.isin(self.columns[f'{column}_codes'], matching)
+
+    def _tag_mask(self, tag_names: List[str]):
+        tag_dict = self.columns['tag_dict']
+        offsets = self.columns['tag_offsets']
+        mask = np.zeros(len(self), dtype=bool)
+        for tag_name in tag_names:
+            i = np.searchsorted(tag_dict, tag_name)
+            if i < len(tag_dict) and tag_dict[i] == tag_name:
+                mask[self.columns['tag_rows'][offsets[i]:offsets[i + 1]]] = True
+        return mask
+
+    def search(self, filters: schemas.PropertySearchFilters) -> List[str]:
+        """Property IDs matching the filters, with the same semantics as property_service.search_properties.
+
+        Free text (q) is not applied here; callers intersect with the text index's ranking.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for column in STRING_COLUMNS:
+            term = getattr(filters, column)
+            if term:
+                mask &= self._substring_mask(column, term)
+
+        for column in NUMERIC_COLUMNS:
+            low = getattr(filters, f'min_{column}')
+            high = getattr(filters, f'max_{column}')
+            # NaN comparisons are False, matching SQL NULL semantics
+            if low is not None:
+                mask &= self.columns[column] >= low
+            if high is not None:
+                mask &= self.columns[column] <= high
+
+        if filters.tags:
+            mask &= self._tag_mask([tag.strip() for tag in filters.tags.split(',')])
+
+        if not filters.show_hidden:
+            mask &= ~self.columns['is_hidden']
+
+        return self.columns['property_ids'][mask].tolist()
+
+class SnapshotManager:
+    """Per-worker handle that swaps to the newest published snapshot and schedules rebuilds"""
+
+    # How often workers re-read CURRENT, and how long writes are batched before a rebuild
+    CHECK_INTERVAL = 1.0
+    REBUILD_DELAY = 0.5
+
+    def __init__(self, snapshot_dir: Path, session_factory):
+        self.snapshot_dir = snapshot_dir
+        self.session_factory = session_factory
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._checked_at = 0.0
+        self._swap_lock = threading.Lock()
+        self._rebuild_requested = threading.Event()
+        self._stopped = threading.Event()
+        self._builder: Optional[threading.Thread] = None
+
+    def current(self) -> Optional[CatalogSnapshot]:
+        now = time.monotonic()
+        if now - self._checked_at >= self.CHECK_INTERVAL:
+            self._checked_at = now
+            version = _read_version(self.snapshot_dir)
+            if version and (self._snapshot is None or self._snapshot.version != version):
+                with self._swap_lock:
+                    path = self.snapshot_dir / f'v{version:08d}'
+                    if path.exists():
+                        # Readers holding the old snapshot keep using it until they finish
+                        self._snapshot = CatalogSnapshot(path, version)
+        return self._snapshot
+
+    def build(self) -> int:
+        db = self.session_factory()
+        try:
+            version = build_snapshot(db, self.snapshot_dir)
+        finally:
+            db.close()
+        self._checked_at = 0.0
+        return version
+
+    def request_rebuild(self, *args):
+        """Property change listener: rebuild soon, coalescing bursts of writes"""
+        self._rebuild_requested.set()
+
+    def start(self):
+        if _read_version(self.snapshot_dir) == 0:
+            self.build()
+        self._stopped.clear()
+        self._builder = threading.Thread(target=self._run_builder, name='catalog-snapshot-builder', daemon=True)
+        self._builder.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._rebuild_requested.set()
+        if self._builder:
+            self._builder.join(timeout=5)
+
+    def _run_builder(self):
+        while True:
+            self._rebuild_requested.wait()
+            if self._stopped.is_set():
+                return
+            time.sleep(self.REBUILD_DELAY)
+            self._rebuild_requested.clear()
+            try:
+                self.build()
+            except Exception:
+                logger.exception("Catalog snapshot rebuild failed")
+
+def manager_from_env(session_factory) -> Optional[SnapshotManager]:
+    snapshot_dir = os.getenv('CATALOG_SNAPSHOT_DIR')
+    return SnapshotManager(Path(snapshot_dir), session_factory) if snapshot_dir else None
+
+if __name__ == '__main__':
+    import sys
+    from database import SessionLocal
+
+    if sys.argv[1:] != ['build'] or not os.getenv('CATALOG_SNAPSHOT_DIR'):
+        sys.exit("usage: CATALOG_SNAPSHOT_DIR=<dir> python catalog_snapshot.py build")
+    logging.basicConfig(level=logging.INFO)
+    print(manager_from_env(SessionLocal).build())
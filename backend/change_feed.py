@@ -0,0 +1,139 @@
+from typing import Optional
+import asyncio
+import json
+import threading
+import models
+import schemas
+import property_service
+import text_search_service
+
+# Events buffered per subscriber; when a slow client falls further behind, new events
+# are dropped and it gets a single 'resync' event telling it to refetch.
+BUFFER_SIZE = 100
+
+MAX_SUBSCRIBERS = 1000
+
+HEARTBEAT_SECONDS = 15.0
+
+def _contains(value: Optional[str], term: Optional[str]) -> bool:
+    return not term or (value is not None and term.lower() in value.lower())
+
+def _in_range(value: Optional[float], low: Optional[float], high: Optional[float]) -> bool:
+    if low is None and high is None:
+        return True
+    if value is None:
+        return False
+    return (low is None or value >= low) and (high is None or value <= high)
+
+def matches(filters: schemas.PropertySearchFilters, prop: schemas.Property) -> bool:
+    """In-memory equivalent of property_service.search_properties for one property"""
+    if prop.is_hidden and not filters.show_hidden:
+        return False
+    if filters.tags:
+        wanted = {tag.strip() for tag in filters.tags.split(',')}
+        if not wanted.intersection(prop.tags or ()):
+            return False
+    return (
+        _contains(prop.name, filters.name)
+        and _contains(prop.location, filters.location)
+        and _contains(prop.configurations, filters.configurations)
+        and _contains(prop.developer, filters.developer)
+        and _in_range(prop.budget, filters.min_budget, filters.max_budget)
+        and _in_range(prop.price_per_sqft, filters.min_price_per_sqft, filters.max_price_per_sqft)
+        and _in_range(prop.carpet_area, filters.min_carpet_area, filters.max_carpet_area)
+        and text_search_service.matches_query(filters.q, prop.name, prop.description, prop.location, prop.developer, prop.tags or ())
+    )
+
+class Subscriber:
+    def __init__(self, filters: schemas.PropertySearchFilters, is_admin: bool, loop: asyncio.AbstractEventLoop):
+        self.filters = filters
+        self.is_admin = is_admin
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=BUFFER_SIZE)
+        self.lagged = False
+        # Properties this subscriber has been told about, so it learns when one stops matching
+        self.seen = set()
+
+    def offer(self, event: dict):
+        # Always runs on the subscriber's event loop
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+class ChangeFeed:
+    """In-process pub/sub of property changes, fed by property_service change listeners"""
+
+    def __init__(self):
+        self.subscribers = set()
+        self._lock = threading.Lock()
+        self._sequence = 0
+
+    def subscribe(self, filters: schemas.PropertySearchFilters, is_admin: bool) -> Optional[Subscriber]:
+        with self._lock:
+            if len(self.subscribers) >= MAX_SUBSCRIBERS:
+                return None
+            if not self.subscribers:
+                property_service.add_change_listener(self.publish)
+            subscriber = Subscriber(filters, is_admin, asyncio.get_running_loop())
+            self.subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self.subscribers.discard(subscriber)
+            if not self.subscribers:
+                property_service.remove_change_listener(self.publish)
+
+    def publish(self, event: str, property_id: str, db_property: Optional[models.Property]):
+        """Property change listener: fan the change out to matching subscribers"""
+        with self._lock:
+            subscribers = list(self.subscribers)
+            self._sequence += 1
+            sequence = self._sequence
+        if not subscribers:
+            return
+
+        views = {}
+        if db_property is not None:
+            views[True] = property_service.property_to_schema(db_property)
+            views[False] = property_service.property_to_schema(db_property, public=True)
+
+        for subscriber in subscribers:
+            prop = views.get(subscriber.is_admin)
+            if prop is not None and matches(subscriber.filters, prop):
+                subscriber.seen.add(property_id)
+                payload = {"event": event, "property_id": property_id,
+                           "property": prop.model_dump(mode='json', exclude_unset=True)}
+            elif (property_id in subscriber.seen or prop is None
+                  or (prop.is_hidden and not subscriber.filters.show_hidden)):
+                # Deleted, hidden, or edited out of a filter the subscriber was matching
+                subscriber.seen.discard(property_id)
+                payload = {"event": "removed", "property_id": property_id, "property": None}
+            else:
+                continue
+            subscriber.loop.call_soon_threadsafe(subscriber.offer, {"id": sequence, **payload})
+
+    async def stream(self, subscriber: Subscriber, is_disconnected):
+        """Yield SSE-encoded events until the client disconnects"""
+        try:
+            yield b"retry: 3000\n\n"
+            while not await is_disconnected():
+                if subscriber.lagged and subscriber.queue.empty():
+                    subscriber.lagged = False
+                    subscriber.seen.clear()
+                    yield b"event: resync\ndata: {}\n\n"
+                    continue
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": heartbeat\n\n"
+                    continue
+                event_id = event.pop("id")
+                yield f"id: {event_id}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n".encode()
+        finally:
+            self.unsubscribe(subscriber)
+
+change_feed = ChangeFeed()
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -12,11 +12,15 @@ DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///./mak_kotwal_venus.db')
 if DATABASE_URL.startswith('postgres://'):
     DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith('sqlite') else {},
-    pool_pre_ping=True
-)
+def make_engine(**kwargs):
+    return create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False} if DATABASE_URL.startswith('sqlite') else {},
+        pool_pre_ping=True,
+        **kwargs
+    )
+
+engine = make_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -28,3 +32,26 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def ensure_columns():
+    """Add columns declared on the models but missing from existing tables"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                if column.server_default is not None:
+                    default = getattr(column.server_default.arg, 'text', column.server_default.arg)
+                    ddl += f" DEFAULT {default}"
+                conn.execute(text(ddl))
+
+def ensure_indexes():
+    """Create indexes declared on the models but missing from existing tables"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,404 @@
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Optional, List, Tuple
+import logging
+import os
+import re
+import threading
+import time
+import numpy as np
+import memory_profiling
+import models
+import schemas
+import property_service
+
+logger = logging.getLogger(__name__)
+
+# What happens to a new listing that looks like an existing one: 'flag' creates it and
+# records the suspected duplicates for review, 'reject' refuses it, 'allow' skips the check
+POLICIES = ('flag', 'reject', 'allow')
+POLICY = os.getenv('DUPLICATE_POLICY', 'flag')
+
+# MinHash signature length, split into LSH bands of ROWS hashes. Two listings share a
+# bucket with probability 1 - (1 - s^ROWS)^BANDS for text similarity s: about 0.5 at
+# s = 0.5 and over 0.99 at s = 0.8.
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+
+SHINGLE_SIZE = 3
+
+# Candidates are duplicates when their estimated Jaccard similarity reaches this...
+SIMILARITY_THRESHOLD = 0.6
+
+# ...and budget and carpet area (where both are set) are within this fraction of each other
+NUMERIC_TOLERANCE = 0.1
+
+MAX_CLUSTERS = 200
+
+MAX_IMPORT = 1000
+
+_rng = np.random.default_rng(0x5EED)
+# Multiply-shift hash family: the high 32 bits of a * x + b (mod 2^64), a odd
+_MULTIPLIERS = _rng.integers(1, 2**63, NUM_HASHES, dtype=np.uint64) | np.uint64(1)
+_OFFSETS = _rng.integers(0, 2**63, NUM_HASHES, dtype=np.uint64)
+_EMPTY_SIGNATURE = np.full(NUM_HASHES, np.iinfo(np.uint32).max, dtype=np.uint32)
+
+_separator_re = re.compile(r'[^0-9a-z]+')
+
+def shingles(name: Optional[str], location: Optional[str], description: Optional[str]) -> set:
+    """Character shingles of the normalized text fields, tagged with the field they came from"""
+    result = set()
+    for prefix, text in (('n', name), ('l', location), ('d', description)):
+        text = _separator_re.sub(' ', (text or '').lower()).strip()
+        if len(text) <= SHINGLE_SIZE:
+            if text:
+                result.add(f'{prefix}:{text}')
+            continue
+        result.update(f'{prefix}:{text[i:i + SHINGLE_SIZE]}' for i in range(len(text) - SHINGLE_SIZE + 1))
+    return result
+
+def signature(shingle_set: set) -> np.ndarray:
+    """MinHash signature: per hash function, the minimum over the shingles"""
+    if not shingle_set:
+        return _EMPTY_SIGNATURE
+    # str hashes are salted per process, which is fine for signatures that are never stored
+    hashes = np.fromiter((hash(s) & 0xFFFFFFFFFFFFFFFF for s in shingle_set), dtype=np.uint64, count=len(shingle_set))
+    with np.errstate(over='ignore'):
+        mixed = hashes[None, :] * _MULTIPLIERS[:, None] + _OFFSETS[:, None]
+    return (mixed >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+class Fingerprint:
+    __slots__ = ('signature', 'budget', 'carpet_area')
+
+    def __init__(self, name, location, description, budget, carpet_area):
+        self.signature = signature(shingles(name, location, description))
+        self.budget = budget
+        self.carpet_area = carpet_area
+
+    def similarity(self, other: 'Fingerprint') -> float:
+        """Estimated Jaccard similarity of the two listings' shingles"""
+        return float(np.count_nonzero(self.signature == other.signature)) / NUM_HASHES
+
+    def numbers_close(self, other: 'Fingerprint') -> bool:
+        for a, b in ((self.budget, other.budget), (self.carpet_area, other.carpet_area)):
+            if a is not None and b is not None and abs(a - b) > NUMERIC_TOLERANCE * max(abs(a), abs(b)):
+                return False
+        return True
+
+def fingerprint_of(listing) -> Fingerprint:
+    """Fingerprint of a models.Property or schemas.PropertyCreate"""
+    return Fingerprint(listing.name, listing.location, listing.description, listing.budget, listing.carpet_area)
+
+class LSHIndex:
+    """Listings bucketed by each band of their MinHash signature.
+
+    A lookup only compares against listings sharing at least one bucket, so its cost
+    follows the number of similar listings rather than the catalog size.
+    """
+
+    def __init__(self):
+        self._buckets = defaultdict(set)
+        self._fingerprints = {}
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    @staticmethod
+    def _band_keys(fingerprint: Fingerprint) -> List[tuple]:
+        sig = fingerprint.signature
+        return [(band, sig[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+    def add(self, key: str, fingerprint: Fingerprint):
+        self.remove(key)
+        self._fingerprints[key] = fingerprint
+        for band_key in self._band_keys(fingerprint):
+            self._buckets[band_key].add(key)
+
+    def remove(self, key: str):
+        fingerprint = self._fingerprints.pop(key, None)
+        if fingerprint is None:
+            return
+        for band_key in self._band_keys(fingerprint):
+            bucket = self._buckets[band_key]
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[band_key]
+
+    def _is_duplicate(self, fingerprint: Fingerprint, other: Fingerprint) -> Optional[float]:
+        if not fingerprint.numbers_close(other):
+            return None
+        similarity = fingerprint.similarity(other)
+        return similarity if similarity >= SIMILARITY_THRESHOLD else None
+
+    def matches(self, fingerprint: Fingerprint, exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """(key, similarity) of indexed listings that duplicate fingerprint, most similar first"""
+        candidates = set()
+        for band_key in self._band_keys(fingerprint):
+            candidates.update(self._buckets.get(band_key, ()))
+        candidates.discard(exclude)
+        found = []
+        for key in candidates:
+            similarity = self._is_duplicate(fingerprint, self._fingerprints[key])
+            if similarity is not None:
+                found.append((key, similarity))
+        found.sort(key=lambda item: (-item[1], item[0]))
+        return found
+
+    def pairs(self) -> List[Tuple[str, str, float]]:
+        """Every duplicate pair in the index, from listings sharing a bucket"""
+        checked = set()
+        found = []
+        for bucket in self._buckets.values():
+            if len(bucket) < 2:
+                continue
+            members = sorted(bucket)
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    if (a, b) in checked:
+                        continue
+                    checked.add((a, b))
+                    similarity = self._is_duplicate(self._fingerprints[a], self._fingerprints[b])
+                    if similarity is not None:
+                        found.append((a, b, similarity))
+        return found
+
+class DuplicateIndex:
+    """LSH index over the whole catalog, maintained from property writes.
+
+    The full build fingerprints every listing, so it never runs on a request: start()
+    builds the first index on a background thread (checks answer 503 until it is ready),
+    and a check on an index older than MAX_AGE schedules a rebuild, which picks up other
+    workers' writes, while the current index keeps serving. Local writes update the
+    current index, and those arriving during a rebuild are replayed onto the new index
+    before it is swapped in.
+    """
+
+    MAX_AGE = 300.0
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._index: Optional[LSHIndex] = None
+        self._lock = threading.Lock()
+        self._built_at = 0.0
+        self._rebuilding = False
+        self._pending = []
+
+    def memory_stats(self) -> dict:
+        index = self._index
+        return {'entries': len(index), 'buckets': len(index._buckets)} if index is not None else {'entries': 0}
+
+    def start(self):
+        """Listen for property writes and build the first index in the background"""
+        self._schedule_rebuild()
+
+    def stop(self):
+        property_service.remove_change_listener(self.on_change)
+
+    def _schedule_rebuild(self):
+        property_service.add_change_listener(self.on_change)
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+            self._pending = []
+        threading.Thread(target=self._rebuild, name='duplicate-rebuild', daemon=True).start()
+
+    def _build(self) -> LSHIndex:
+        db = self.session_factory()
+        try:
+            rows = db.execute(select(
+                models.Property.property_id, models.Property.name, models.Property.location,
+                models.Property.description, models.Property.budget, models.Property.carpet_area
+            )).all()
+        finally:
+            db.close()
+        index = LSHIndex()
+        for row in rows:
+            index.add(row.property_id, fingerprint_of(row))
+        return index
+
+    def _rebuild(self):
+        try:
+            index = self._build()
+        except Exception:
+            logger.exception("Duplicate index rebuild failed")
+            with self._lock:
+                self._rebuilding = False
+            return
+        with self._lock:
+            for property_id, fingerprint in self._pending:
+                self._apply(index, property_id, fingerprint)
+            self._index = index
+            self._built_at = time.monotonic()
+            self._rebuilding = False
+            self._pending = []
+
+    @staticmethod
+    def _apply(index: LSHIndex, property_id: str, fingerprint: Optional[Fingerprint]):
+        if fingerprint is None:
+            index.remove(property_id)
+        else:
+            index.add(property_id, fingerprint)
+
+    def on_change(self, event: str, property_id: str, db_property: Optional[models.Property]):
+        """Property change listener: refingerprint the property"""
+        fingerprint = fingerprint_of(db_property) if db_property is not None else None
+        with self._lock:
+            if self._index is not None:
+                self._apply(self._index, property_id, fingerprint)
+            if self._rebuilding:
+                self._pending.append((property_id, fingerprint))
+
+    def _check_ready(self):
+        """Schedule a rebuild when the index is missing or stale; 503 until there is one"""
+        if self._index is None or time.monotonic() - self._built_at > self.MAX_AGE:
+            self._schedule_rebuild()
+        if self._index is None:
+            raise HTTPException(status_code=503, detail="Duplicate detection is starting up",
+                                headers={"Retry-After": "5"})
+
+    def matches(self, fingerprint: Fingerprint, exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        self._check_ready()
+        with self._lock:
+            return self._index.matches(fingerprint, exclude)
+
+    def pairs(self) -> List[Tuple[str, str, float]]:
+        self._check_ready()
+        with self._lock:
+            return self._index.pairs()
+
+def find_duplicates(property_data: schemas.PropertyCreate) -> List[Tuple[str, float]]:
+    """(property_id, similarity) of catalog listings the new listing appears to duplicate"""
+    return get_duplicate_index().matches(fingerprint_of(property_data))
+
+def find_batch_duplicates(listings: List[schemas.PropertyCreate]) -> List[List[Tuple[str, float]]]:
+    """find_duplicates for each listing of an import, also against earlier listings of the same import.
+
+    Earlier listings are keyed '#<position>' until they have property ids.
+    """
+    index = get_duplicate_index()
+    batch = LSHIndex()
+    results = []
+    for position, listing in enumerate(listings):
+        fingerprint = fingerprint_of(listing)
+        found = index.matches(fingerprint) + batch.matches(fingerprint)
+        found.sort(key=lambda item: (-item[1], item[0]))
+        results.append(found)
+        batch.add(f'#{position}', fingerprint)
+    return results
+
+def apply_create_flagged(db: Session, property_data: schemas.PropertyCreate, duplicates: List[Tuple[str, float]],
+                         **create_args) -> models.Property:
+    """Stage a new property along with flags for its suspected duplicates"""
+    db_property = property_service.apply_create_property(db, property_data, **create_args)
+    if duplicates:
+        # Assigns the new property's id
+        db.flush()
+        db.add_all(
+            models.DuplicateFlag(property_id=db_property.property_id, duplicate_of=property_id, similarity=similarity)
+            for property_id, similarity in duplicates
+        )
+    return db_property
+
+def add_flags(db: Session, flags: List[Tuple[str, str, float]]):
+    """Record (property_id, duplicate_of, similarity) flags between properties that already exist"""
+    db.add_all(
+        models.DuplicateFlag(property_id=property_id, duplicate_of=duplicate_of, similarity=similarity)
+        for property_id, duplicate_of, similarity in flags
+    )
+    db.commit()
+
+def describe(db: Session, duplicates: List[Tuple[str, float]]) -> List[schemas.DuplicateMatch]:
+    property_ids = [property_id for property_id, _ in duplicates if not property_id.startswith('#')]
+    names = dict(db.execute(
+        select(models.Property.property_id, models.Property.name).where(models.Property.property_id.in_(property_ids))
+    ).all()) if property_ids else {}
+    return [
+        schemas.DuplicateMatch(property_id=property_id, name=names.get(property_id), similarity=round(similarity, 3))
+        for property_id, similarity in duplicates
+    ]
+
+def duplicate_conflict(db: Session, duplicates: List[Tuple[str, float]]) -> HTTPException:
+    """409 naming the listings a rejected property duplicates"""
+    return HTTPException(status_code=409, detail={
+        'message': "Listing appears to duplicate existing properties",
+        'duplicates': [match.model_dump() for match in describe(db, duplicates)],
+    })
+
+def _clusters(pairs: List[tuple]) -> List[List[tuple]]:
+    """Group pairs (a, b, ...) into connected components"""
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for pair in pairs:
+        parent[find(pair[0])] = find(pair[1])
+    groups = defaultdict(list)
+    for pair in pairs:
+        groups[find(pair[0])].append(pair)
+    return list(groups.values())
+
+def list_clusters(db: Session, scan: bool = False, limit: int = 50) -> List[schemas.DuplicateCluster]:
+    """Suspected duplicate groups, largest first: from open flags, or with scan from the whole catalog"""
+    if scan:
+        # Pairs an admin already dismissed stay dismissed, whichever way round they were flagged
+        dismissed = set()
+        for property_id, duplicate_of in db.execute(
+            select(models.DuplicateFlag.property_id, models.DuplicateFlag.duplicate_of)
+            .where(models.DuplicateFlag.dismissed_at.is_not(None))
+        ):
+            dismissed.update(((property_id, duplicate_of), (duplicate_of, property_id)))
+        pairs = [
+            (a, b, similarity, None) for a, b, similarity in get_duplicate_index().pairs()
+            if (a, b) not in dismissed
+        ]
+    else:
+        pairs = [
+            (flag.property_id, flag.duplicate_of, flag.similarity, flag.flag_id)
+            for flag in db.query(models.DuplicateFlag).filter(models.DuplicateFlag.dismissed_at.is_(None))
+        ]
+
+    property_ids = list({property_id for pair in pairs for property_id in pair[:2]})
+    properties = {p.property_id: p for p in property_service.get_properties_by_ids(db, property_ids, show_hidden=True)}
+    # Flags outlive deleted listings where the database doesn't enforce foreign keys
+    pairs = [pair for pair in pairs if pair[0] in properties and pair[1] in properties]
+
+    clusters = []
+    for group in _clusters(pairs):
+        members = sorted({property_id for pair in group for property_id in pair[:2]})
+        clusters.append(schemas.DuplicateCluster(
+            properties=[property_service.property_to_schema(properties[property_id]) for property_id in members],
+            pairs=[
+                schemas.DuplicatePair(property_id=a, duplicate_of=b, similarity=round(similarity, 3), flag_id=flag_id)
+                for a, b, similarity, flag_id in group
+            ],
+        ))
+    clusters.sort(key=lambda cluster: -len(cluster.properties))
+    return clusters[:limit]
+
+def dismiss_flag(db: Session, flag_id: str) -> bool:
+    flag = db.get(models.DuplicateFlag, flag_id)
+    if flag is None:
+        return False
+    flag.dismissed_at = datetime.now(timezone.utc)
+    db.commit()
+    return True
+
+_duplicate_index: Optional[DuplicateIndex] = None
+
+def get_duplicate_index() -> DuplicateIndex:
+    global _duplicate_index
+    if _duplicate_index is None:
+        from database import SessionLocal
+        _duplicate_index = DuplicateIndex(SessionLocal)
+        memory_profiling.register_cache('duplicates', _duplicate_index.memory_stats)
+    return _duplicate_index
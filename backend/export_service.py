@@ -0,0 +1,130 @@
+from pathlib import Path
+from typing import Iterator, List
+import csv
+import importlib.util
+import io
+import os
+import zlib
+from database import SessionLocal
+import schemas
+import property_service
+
+# Rows fetched per server-side cursor round trip; also the unit of tag lookups
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+CSV_COLUMNS = [field for field in schemas.Property.model_fields if field != 'field_visibility']
+
+SNAPSHOT_FILENAME = 'properties.parquet'
+
+def iter_property_batches(db, public: bool) -> Iterator[List[schemas.Property]]:
+    """Stream the catalog in batches with one tag query per batch instead of one per row.
+
+    Rows are read without ORM entities, so nothing accumulates in the session's identity map.
+    """
+    for rows in property_service.iter_property_row_batches(db, show_hidden=not public, batch_size=EXPORT_BATCH_SIZE):
+        yield [property_service.property_to_schema(row, public=public, tags=row.tags) for row in rows]
+
+def _ndjson_chunks(batches):
+    for batch in batches:
+        yield b''.join(p.model_dump_json(exclude_unset=True).encode() + b'\n' for p in batch)
+
+def _csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    for batch in batches:
+        for p in batch:
+            row = p.model_dump(mode='json', exclude_unset=True)
+            if 'tags' in row:
+                row['tags'] = ';'.join(row['tags'])
+            writer.writerow(row)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+def stream_export(export_format: str, public: bool, gzip: bool = False) -> Iterator[bytes]:
+    """Yield the encoded catalog chunk by chunk using its own session.
+
+    The request-scoped session is closed before a streaming body is sent, so the
+    export opens and owns a session for the lifetime of the response.
+    """
+    db = SessionLocal()
+    try:
+        batches = iter_property_batches(db, public)
+        chunks = _csv_chunks(batches) if export_format == 'csv' else _ndjson_chunks(batches)
+        if not gzip:
+            yield from chunks
+            return
+
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+    finally:
+        db.close()
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    for coding in (accept_encoding or '').split(','):
+        name, _, params = coding.partition(';')
+        if name.strip().lower() != 'gzip':
+            continue
+        params = params.replace(' ', '')
+        if not params.startswith('q='):
+            return True
+        try:
+            return float(params[2:]) > 0
+        except ValueError:
+            return False
+    return False
+
+def parquet_available() -> bool:
+    return importlib.util.find_spec('pyarrow') is not None
+
+def write_parquet_snapshot(export_dir: Path) -> Path:
+    """Write the full catalog to a Parquet file, batch by batch, then swap it in atomically"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    export_dir.mkdir(parents=True, exist_ok=True)
+    target = export_dir / SNAPSHOT_FILENAME
+    tmp_path = export_dir / f".{SNAPSHOT_FILENAME}.{os.getpid()}.tmp"
+
+    arrow_schema = pa.schema([
+        ('property_id', pa.string()),
+        ('name', pa.string()),
+        ('budget', pa.float64()),
+        ('configurations', pa.string()),
+        ('location', pa.string()),
+        ('price_per_sqft', pa.float64()),
+        ('carpet_area', pa.float64()),
+        ('developer', pa.string()),
+        ('description', pa.string()),
+        ('gmaps_link', pa.string()),
+        ('video_file', pa.string()),
+        ('floor_plan_file', pa.string()),
+        ('is_hidden', pa.bool_()),
+        ('uploaded_by', pa.string()),
+        ('created_at', pa.timestamp('us')),
+        ('updated_at', pa.timestamp('us')),
+        ('tags', pa.list_(pa.string())),
+    ])
+
+    db = SessionLocal()
+    try:
+        with pq.ParquetWriter(tmp_path, arrow_schema, compression='zstd') as writer:
+            for batch in iter_property_batches(db, public=False):
+                rows = [p.model_dump(include=set(arrow_schema.names)) for p in batch]
+                writer.write_table(pa.Table.from_pylist(rows, schema=arrow_schema))
+        os.replace(tmp_path, target)
+    finally:
+        db.close()
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return target
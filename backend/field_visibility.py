@@ -0,0 +1,62 @@
+import json
+from functools import lru_cache
+from typing import Optional
+
+# Bit i of Property.hidden_fields hides VISIBILITY_FIELDS[i] from non-admin users.
+# Only ever append to this tuple - reordering would change stored masks.
+VISIBILITY_FIELDS = (
+    'budget',
+    'configurations',
+    'location',
+    'carpet_area',
+    'price_per_sqft',
+    'developer',
+    'description',
+    'gmaps_link',
+    'tags',
+    'downloads',
+)
+
+# Response attributes controlled by each visibility toggle
+FIELD_ATTRIBUTES = {
+    'downloads': ('video_file', 'floor_plan_file'),
+}
+
+def mask_from_dict(visibility: Optional[dict]) -> int:
+    """Compile a {field: visible} dict into a hidden-fields bitmask (unknown keys are ignored)"""
+    mask = 0
+    if not visibility:
+        return mask
+    for bit, field in enumerate(VISIBILITY_FIELDS):
+        if visibility.get(field) is False:
+            mask |= 1 << bit
+    return mask
+
+def mask_from_json(raw: Optional[str]) -> int:
+    """Compile a legacy JSON field_visibility string into a bitmask"""
+    if not raw:
+        return 0
+    try:
+        visibility = json.loads(raw)
+    except ValueError:
+        return 0
+    return mask_from_dict(visibility) if isinstance(visibility, dict) else 0
+
+@lru_cache(maxsize=None)
+def visibility_dict(mask: int) -> Optional[dict]:
+    """Expand a bitmask into the {field: visible} dict the frontend expects.
+
+    Results are cached per mask and shared between rows, so callers must not mutate them.
+    """
+    if not mask:
+        return None
+    return {field: not mask & (1 << bit) for bit, field in enumerate(VISIBILITY_FIELDS)}
+
+@lru_cache(maxsize=None)
+def hidden_attributes(mask: int) -> frozenset:
+    """Response attributes to omit from public responses for a bitmask"""
+    hidden = set()
+    for bit, field in enumerate(VISIBILITY_FIELDS):
+        if mask & (1 << bit):
+            hidden.update(FIELD_ATTRIBUTES.get(field, (field,)))
+    return frozenset(hidden)
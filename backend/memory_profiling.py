@@ -0,0 +1,323 @@
+"""Memory profiling of individual requests and in-process caches.
+
+A profile runs one request with tracemalloc on and reports its peak traced memory, the
+allocation sites alive at that peak and the ones still alive afterwards. Peaks are kept
+per endpoint. Caches register a stats callable so their sizes can be listed alongside.
+
+Profiles are serialized (tracemalloc is process-wide), and allocations made by other
+requests running at the same time are counted too, so profile a quiet worker or use
+the CLI, which runs the app in its own process:
+
+    python memory_profiling.py POST /api/properties/search --body '{}' --session-token <admin token>
+"""
+from collections import deque
+from datetime import datetime, timezone
+from functools import partial
+from typing import Optional, Callable
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+TOP_SITES = 15
+
+TRACE_FRAMES = 10
+
+RECENT_PROFILES = 20
+
+# Peak snapshots are retaken whenever traced memory grows this much past the last one
+PEAK_SNAPSHOT_GROWTH = 1.1
+
+PEAK_POLL_SECONDS = 0.002
+
+# The profiling endpoints themselves are never profiled
+PROFILING_PATH = '/api/admin/memory'
+
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, __file__),
+)
+
+# ---- cache registry ----
+
+_caches = {}
+
+def register_cache(name: str, stats: Callable[[], dict]):
+    """stats() returns at least {'entries': n}, plus 'bytes' where it can be estimated"""
+    _caches[name] = stats
+
+def cache_stats() -> dict:
+    stats = {}
+    for name, collect in list(_caches.items()):
+        try:
+            stats[name] = collect()
+        except Exception as exc:
+            stats[name] = {'error': type(exc).__name__}
+    return stats
+
+def process_memory() -> dict:
+    memory = {}
+    try:
+        with open('/proc/self/statm') as f:
+            memory['rss_bytes'] = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        memory['peak_rss_bytes'] = peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    if tracemalloc.is_tracing():
+        memory['traced_bytes'], memory['traced_peak_bytes'] = tracemalloc.get_traced_memory()
+    return memory
+
+# ---- profiling ----
+
+class _PeakSampler(threading.Thread):
+    """Keeps a snapshot from near the moment traced memory peaked"""
+
+    def __init__(self):
+        super().__init__(name='memory-peak-sampler', daemon=True)
+        self.snapshot = None
+        self.snapshot_bytes = 0
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(PEAK_POLL_SECONDS):
+            current, _ = tracemalloc.get_traced_memory()
+            if current > self.snapshot_bytes * PEAK_SNAPSHOT_GROWTH:
+                self.snapshot = tracemalloc.take_snapshot()
+                self.snapshot_bytes = current
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+def _top_sites(after, before, group_by: str, limit: int) -> list:
+    stats = after.filter_traces(_IGNORED).compare_to(before.filter_traces(_IGNORED), group_by)
+    return [
+        {
+            'site': stat.traceback.format(limit=3) if group_by == 'traceback' else str(stat.traceback[0]),
+            'size_bytes': stat.size_diff,
+            'count': stat.count_diff,
+        }
+        for stat in stats[:limit] if stat.size_diff > 0
+    ]
+
+class MemoryProfiler:
+    def __init__(self):
+        self.endpoints = {}
+        self.recent = deque(maxlen=RECENT_PROFILES)
+        self._busy = False
+        self._route_paths = {}
+
+    @property
+    def busy(self) -> bool:
+        return self._busy
+
+    def route_key(self, scope) -> str:
+        """'METHOD /path/{template}' for the route that served a request"""
+        endpoint = scope.get('endpoint')
+        path = self._route_paths.get(endpoint)
+        if path is None and endpoint is not None:
+            for route in getattr(scope.get('app'), 'routes', ()):
+                if getattr(route, 'endpoint', None) is endpoint:
+                    path = self._route_paths[endpoint] = route.path
+                    break
+        return f"{scope['method']} {path or scope['path']}"
+
+    async def profile(self, scope, run, top: int = TOP_SITES, group_by: str = 'lineno') -> dict:
+        """Run await run() under tracemalloc and record the result against its endpoint"""
+        if self._busy:
+            raise RuntimeError("A memory profile is already running")
+        self._busy = True
+        started = not tracemalloc.is_tracing()
+        try:
+            if started:
+                tracemalloc.start(TRACE_FRAMES)
+            gc.collect()
+            before = tracemalloc.take_snapshot()
+            baseline, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+
+            sampler = _PeakSampler()
+            sampler.snapshot_bytes = baseline
+            sampler.start()
+            start = time.perf_counter()
+            try:
+                outcome = await run()
+            finally:
+                sampler.stop()
+            duration = time.perf_counter() - start
+
+            current, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+        finally:
+            if started:
+                tracemalloc.stop()
+            self._busy = False
+
+        report = {
+            'endpoint': self.route_key(scope),
+            'profiled_at': datetime.now(timezone.utc).isoformat(),
+            'duration_ms': round(duration * 1000, 2),
+            'peak_bytes': peak - baseline,
+            'retained_bytes': current - baseline,
+            'top_at_peak': _top_sites(sampler.snapshot, before, group_by, top) if sampler.snapshot else [],
+            'top_retained': _top_sites(after, before, group_by, top),
+            **(outcome or {}),
+        }
+        self._record(report)
+        return report
+
+    def _record(self, report: dict):
+        entry = self.endpoints.setdefault(report['endpoint'], {'profiles': 0, 'max_peak_bytes': 0})
+        entry['profiles'] += 1
+        entry['last_peak_bytes'] = report['peak_bytes']
+        entry['max_peak_bytes'] = max(entry['max_peak_bytes'], report['peak_bytes'])
+        entry['last_profiled_at'] = report['profiled_at']
+        self.recent.append({key: report[key] for key in ('endpoint', 'profiled_at', 'duration_ms', 'peak_bytes', 'retained_bytes')})
+
+    def status(self) -> dict:
+        return {
+            'process': process_memory(),
+            'endpoints': self.endpoints,
+            'recent': list(self.recent),
+            'caches': cache_stats(),
+        }
+
+profiler = MemoryProfiler()
+
+async def replay(app, method: str, path: str, query_string: bytes = b'', body: bytes = b'',
+                 headers: Optional[list] = None, top: int = TOP_SITES, group_by: str = 'lineno',
+                 warmup: bool = False) -> dict:
+    """Profile one request sent through the ASGI app in-process; the response is counted, not kept.
+
+    warmup sends it once unprofiled first, so lazy imports and cache fills aren't counted.
+    """
+    def new_scope():
+        return {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': method.upper(), 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'root_path': '', 'query_string': query_string, 'server': ('memory-profile', 80),
+            'client': ('127.0.0.1', 0), 'app': app,
+            'headers': [(b'content-type', b'application/json'), *(headers or [])],
+        }
+
+    async def run(scope):
+        response = {'status': None, 'response_bytes': 0}
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if sent:
+                return {'type': 'http.disconnect'}
+            sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                response['response_bytes'] += len(message.get('body', b''))
+
+        await app(scope, receive, send)
+        return response
+
+    if warmup:
+        await run(new_scope())
+    scope = new_scope()
+    return await profiler.profile(scope, partial(run, scope), top, group_by)
+
+class MemoryProfilingMiddleware:
+    """Profiles a random sample of live requests (MEMORY_PROFILE_SAMPLE_RATE).
+
+    A sampled request runs unprofiled while another profile is in progress. Tracing slows the sampled
+    request and everything running beside it, so keep the rate low.
+    """
+
+    def __init__(self, app, sample_rate: float):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if (scope['type'] != 'http' or profiler.busy or scope['path'].startswith(PROFILING_PATH)
+                or random.random() >= self.sample_rate):
+            return await self.app(scope, receive, send)
+
+        async def run():
+            await self.app(scope, receive, send)
+
+        await profiler.profile(scope, run, top=5)
+
+def sample_rate_from_env() -> float:
+    return min(float(os.getenv('MEMORY_PROFILE_SAMPLE_RATE', '0')), 1.0)
+
+# ---- CLI ----
+
+def _format_bytes(size: int) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+def print_report(report: dict):
+    print(f"{report['endpoint']}  status {report.get('status')}  {report['duration_ms']} ms  "
+          f"response {_format_bytes(report.get('response_bytes', 0))}")
+    print(f"peak {_format_bytes(report['peak_bytes'])}  retained {_format_bytes(report['retained_bytes'])}")
+    for title, key in (('alive at peak', 'top_at_peak'), ('retained', 'top_retained')):
+        print(f"\ntop allocation sites {title}:")
+        for site in report[key]:
+            print(f"  {_format_bytes(site['size_bytes']):>10}  {site['count']:>8}  {site['site']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the memory of one API request")
+    parser.add_argument('method')
+    parser.add_argument('path', help="e.g. /api/properties/search")
+    parser.add_argument('--query', default='', help="query string without '?'")
+    parser.add_argument('--body', default='', help="JSON request body")
+    parser.add_argument('--session-token', help="session cookie for authenticated endpoints")
+    parser.add_argument('--top', type=int, default=TOP_SITES)
+    parser.add_argument('--group-by', choices=('lineno', 'filename', 'traceback'), default='lineno')
+    parser.add_argument('--url', help="profile on a running server via /api/admin/memory/profile instead of in-process")
+    parser.add_argument('--no-warmup', action='store_true', help="profile the first request, including lazy imports and cache fills")
+    parser.add_argument('--json', action='store_true', help="print the raw report")
+    args = parser.parse_args()
+
+    if args.url:
+        from urllib.request import Request, urlopen
+        payload = {'method': args.method, 'path': args.path, 'query': args.query or None,
+                   'body': json.loads(args.body) if args.body else None, 'top': args.top, 'group_by': args.group_by}
+        request = Request(f"{args.url.rstrip('/')}/api/admin/memory/profile", data=json.dumps(payload).encode(),
+                          headers={'Content-Type': 'application/json', 'Cookie': f"session_token={args.session_token}"})
+        with urlopen(request) as response:
+            report = json.load(response)
+    else:
+        import server
+        headers = [(b'cookie', f"session_token={args.session_token}".encode())] if args.session_token else []
+
+        async def run_profile():
+            async with server.app.router.lifespan_context(server.app):
+                return await replay(server.app, args.method, args.path, args.query.encode(), args.body.encode(),
+                                    headers, args.top, args.group_by, warmup=not args.no_warmup)
+
+        report = asyncio.run(run_profile())
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, Text, ForeignKey, Table
+from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, Text, ForeignKey, Table, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from database import Base
@@ -13,16 +13,17 @@ class User(Base):
     user_id = Column(String, primary_key=True, default=generate_uuid)
     username = Column(String, nullable=False)
     email = Column(String, unique=True, nullable=False, index=True)
-    role = Column(String, default='user')  # 'user' or 'admin'
+    role = Column(String, default='user', index=True)  # 'user' or 'admin'
     picture = Column(String, nullable=True)
     totp_secret = Column(String, nullable=True)
     is_2fa_enabled = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     
     # Relationships
     sessions = relationship('UserSession', back_populates='user', cascade='all, delete-orphan')
     properties = relationship('Property', back_populates='uploaded_by_user', foreign_keys='Property.uploaded_by')
+    saved_searches = relationship('SavedSearch', back_populates='user', cascade='all, delete-orphan')
 
 class UserSession(Base):
     __tablename__ = 'user_sessions'
@@ -52,10 +53,12 @@ class Property(Base):
     video_file = Column(String, nullable=True)
     floor_plan_file = Column(String, nullable=True)
     is_hidden = Column(Boolean, default=False)
-    field_visibility = Column(Text, nullable=True)  # JSON string for field visibility settings
+    field_visibility = Column(Text, nullable=True)  # Legacy JSON visibility settings, migrated into hidden_fields
+    hidden_fields = Column(Integer, nullable=False, default=0, server_default='0')  # Bitmask, see field_visibility.py
     uploaded_by = Column(String, ForeignKey('users.user_id'), nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    # Indexed for the search cache's shared catalog stamp, MAX(updated_at)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), index=True)
     
     # Relationships
     uploaded_by_user = relationship('User', back_populates='properties', foreign_keys=[uploaded_by])
@@ -70,3 +73,68 @@ class PropertyTag(Base):
     
     # Relationships
     property = relationship('Property', back_populates='tags')
+
+class SavedSearch(Base):
+    __tablename__ = 'saved_searches'
+    
+    search_id = Column(String, primary_key=True, default=generate_uuid)
+    user_id = Column(String, ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False, index=True)
+    name = Column(String, nullable=True)
+    filters = Column(Text, nullable=False)  # PropertySearchFilters as JSON
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    # Relationships
+    user = relationship('User', back_populates='saved_searches')
+    matches = relationship('SavedSearchMatch', back_populates='search', cascade='all, delete-orphan')
+
+class SavedSearchMatch(Base):
+    """A listing that matched a saved search, queued until the owner fetches it"""
+    __tablename__ = 'saved_search_matches'
+    __table_args__ = (UniqueConstraint('search_id', 'property_id'),)
+    
+    match_id = Column(String, primary_key=True, default=generate_uuid)
+    search_id = Column(String, ForeignKey('saved_searches.search_id', ondelete='CASCADE'), nullable=False, index=True)
+    property_id = Column(String, ForeignKey('properties.property_id', ondelete='CASCADE'), nullable=False)
+    event = Column(String, nullable=False)  # 'created' or 'updated'
+    matched_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    delivered_at = Column(DateTime, nullable=True, index=True)
+    
+    # Relationships
+    search = relationship('SavedSearch', back_populates='matches')
+
+class AuditEvent(Base):
+    """An admin action, written in batches by audit_service.AuditLog"""
+    __tablename__ = 'audit_events'
+    
+    audit_id = Column(String, primary_key=True, default=generate_uuid)
+    occurred_at = Column(DateTime, nullable=False, index=True)
+    actor_id = Column(String, nullable=True, index=True)  # No foreign key: the trail outlives deleted users
+    action = Column(String, nullable=False, index=True)  # e.g. 'user.delete', 'property.toggle_visibility'
+    target_id = Column(String, nullable=True, index=True)
+    details = Column(Text, nullable=True)  # JSON
+
+class SearchQueryStat(Base):
+    """Sampled property searches aggregated per normalized query, see search_cache.QueryLog"""
+    __tablename__ = 'search_query_stats'
+    
+    query_key = Column(String, primary_key=True)  # Hash of the normalized filters, view and fields
+    filters = Column(Text, nullable=False)  # Normalized PropertySearchFilters as JSON
+    public = Column(Boolean, nullable=False)
+    fields = Column(String, nullable=True)  # Sparse fieldset, comma-separated
+    samples = Column(Integer, nullable=False, default=0)
+    total_ms = Column(Float, nullable=False, default=0.0)
+    max_ms = Column(Float, nullable=False, default=0.0)
+    result_count = Column(Integer, nullable=True)  # From the latest sample
+    last_seen_at = Column(DateTime, nullable=False, index=True)
+
+class DuplicateFlag(Base):
+    """A listing suspected of duplicating another, kept for admin review (see duplicate_service)"""
+    __tablename__ = 'duplicate_flags'
+    __table_args__ = (UniqueConstraint('property_id', 'duplicate_of'),)
+    
+    flag_id = Column(String, primary_key=True, default=generate_uuid)
+    property_id = Column(String, ForeignKey('properties.property_id', ondelete='CASCADE'), nullable=False, index=True)
+    duplicate_of = Column(String, ForeignKey('properties.property_id', ondelete='CASCADE'), nullable=False, index=True)
+    similarity = Column(Float, nullable=False)  # Estimated Jaccard similarity of the listings' text
+    flagged_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    dismissed_at = Column(DateTime, nullable=True, index=True)  # Set when an admin marks it as not a duplicate
@@ -0,0 +1,87 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from collections import OrderedDict
+from typing import Optional, Tuple
+import hashlib
+import threading
+import memory_profiling
+import models
+import property_service
+import tracing
+
+# Encoded single-property responses kept per process
+CACHE_SIZE = 1024
+
+PUBLIC_CACHE_CONTROL = "public, max-age=30, stale-while-revalidate=60"
+ADMIN_CACHE_CONTROL = "private, no-cache"
+
+class PropertyResponseCache:
+    """Encoded GET /properties/{id} bodies keyed by row version.
+
+    A request first reads only (updated_at, is_hidden, hidden_fields) by primary key. That
+    version yields the ETag, so a matching If-None-Match is answered without loading the row
+    or its tags, and an unchanged row is served from the cached body. Change listeners evict
+    entries on local writes; the version check covers writes made by other workers.
+    Public bodies are never built for hidden listings.
+    """
+
+    def __init__(self, size: int = CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def version(db: Session, property_id: str) -> Optional[Tuple]:
+        with tracing.span('query'):
+            row = db.execute(
+                select(models.Property.updated_at, models.Property.is_hidden, models.Property.hidden_fields)
+                .where(models.Property.property_id == property_id)
+            ).first()
+        return tuple(row) if row else None
+
+    @staticmethod
+    def etag(property_id: str, version: Tuple, public: bool) -> str:
+        updated_at, is_hidden, hidden_fields = version
+        raw = f"{property_id}|{updated_at.isoformat() if updated_at else ''}|{int(bool(is_hidden))}|{hidden_fields or 0}|{'p' if public else 'a'}"
+        return f'W/"{hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()}"'
+
+    def body(self, db: Session, property_id: str, version: Tuple, public: bool) -> Optional[bytes]:
+        key = (property_id, public)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        db_property = property_service.get_property(db, property_id)
+        # Hidden since its version was checked: public callers don't get it
+        if not db_property or (public and db_property.is_hidden):
+            return None
+        prop = property_service.property_to_schema(db_property, public=public)
+        with tracing.span('encode'):
+            encoded = prop.model_dump_json(exclude_unset=True).encode()
+        # Store under the version actually serialized, which may be newer than the one checked
+        serialized_version = (db_property.updated_at, db_property.is_hidden, db_property.hidden_fields)
+        with self._lock:
+            self._entries[key] = (serialized_version, encoded)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return encoded
+
+    def on_change(self, event: str, property_id: str, db_property: Optional[models.Property]):
+        """Property change listener: evict both views of the property"""
+        with self._lock:
+            self._entries.pop((property_id, True), None)
+            self._entries.pop((property_id, False), None)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def memory_stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': sum(len(body) for _, body in self._entries.values())}
+
+property_cache = PropertyResponseCache()
+property_service.add_change_listener(property_cache.on_change)
+memory_profiling.register_cache('property_responses', property_cache.memory_stats)
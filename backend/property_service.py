@@ -1,13 +1,40 @@
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
-from typing import Optional, List
+from sqlalchemy import select, or_, and_
+from typing import Optional, List, Callable, Iterator
+from datetime import datetime, timezone
+import logging
 import models
 import schemas
+import field_visibility
+import write_counter
+import tracing
 
-def create_property(db: Session, property_data: schemas.PropertyCreate, user_id: Optional[str] = None,
-                   video_file: Optional[str] = None, floor_plan_file: Optional[str] = None):
-    # Create property
+logger = logging.getLogger(__name__)
+
+# Callbacks run after a property write commits, as listener(event, property_id, db_property).
+# Events are 'created', 'updated' and 'deleted' (db_property is None for deletes).
+_change_listeners: List[Callable] = []
+
+def add_change_listener(listener: Callable):
+    if listener not in _change_listeners:
+        _change_listeners.append(listener)
+
+def remove_change_listener(listener: Callable):
+    if listener in _change_listeners:
+        _change_listeners.remove(listener)
+
+def notify_change(event: str, property_id: str, db_property: Optional[models.Property] = None):
+    write_counter.bump('properties')
+    for listener in list(_change_listeners):
+        try:
+            listener(event, property_id, db_property)
+        except Exception:
+            logger.exception("Property change listener %r failed", listener)
+
+def apply_create_property(db: Session, property_data: schemas.PropertyCreate, user_id: Optional[str] = None,
+                          video_file: Optional[str] = None, floor_plan_file: Optional[str] = None) -> models.Property:
+    """Stage a new property and its tags in db without committing"""
     db_property = models.Property(
         name=property_data.name,
         budget=property_data.budget,
@@ -22,82 +49,198 @@ def create_property(db: Session, property_data: schemas.PropertyCreate, user_id:
         floor_plan_file=floor_plan_file,
         uploaded_by=user_id
     )
+    # Through the relationship, so the tags are in memory for readers of the result
+    db_property.tags = [models.PropertyTag(tag_name=tag.strip()) for tag in property_data.tags or ()]
     db.add(db_property)
-    db.flush()  # Get property_id without committing
-    
-    # Add tags
-    if property_data.tags:
-        for tag in property_data.tags:
-            db_tag = models.PropertyTag(
-                property_id=db_property.property_id,
-                tag_name=tag.strip()
-            )
-            db.add(db_tag)
-    
+    return db_property
+
+def create_property(db: Session, property_data: schemas.PropertyCreate, user_id: Optional[str] = None,
+                   video_file: Optional[str] = None, floor_plan_file: Optional[str] = None):
+    db_property = apply_create_property(db, property_data, user_id, video_file, floor_plan_file)
     db.commit()
     db.refresh(db_property)
+    notify_change('created', db_property.property_id, db_property)
     return db_property
 
 def get_property(db: Session, property_id: str):
-    return db.query(models.Property).filter(models.Property.property_id == property_id).first()
+    with tracing.span('query'):
+        return db.query(models.Property).filter(models.Property.property_id == property_id).first()
 
 def get_properties(db: Session, skip: int = 0, limit: int = 100, show_hidden: bool = False):
     query = db.query(models.Property)
     if not show_hidden:
         query = query.filter(models.Property.is_hidden == False)
-    return query.offset(skip).limit(limit).all()
+    with tracing.span('query'):
+        return query.offset(skip).limit(limit).all()
 
-def search_properties(db: Session, filters: schemas.PropertySearchFilters):
-    query = db.query(models.Property)
-    
-    # Apply filters
-    if filters.name:
-        query = query.filter(models.Property.name.ilike(f"%{filters.name}%"))
-    
-    if filters.location:
-        query = query.filter(models.Property.location.ilike(f"%{filters.location}%"))
-    
-    if filters.min_budget is not None:
-        query = query.filter(models.Property.budget >= filters.min_budget)
-    
-    if filters.max_budget is not None:
-        query = query.filter(models.Property.budget <= filters.max_budget)
-    
-    if filters.configurations:
-        query = query.filter(models.Property.configurations.ilike(f"%{filters.configurations}%"))
-    
-    if filters.developer:
-        query = query.filter(models.Property.developer.ilike(f"%{filters.developer}%"))
-    
-    if filters.min_price_per_sqft is not None:
-        query = query.filter(models.Property.price_per_sqft >= filters.min_price_per_sqft)
-    
-    if filters.max_price_per_sqft is not None:
-        query = query.filter(models.Property.price_per_sqft <= filters.max_price_per_sqft)
-    
-    if filters.min_carpet_area is not None:
-        query = query.filter(models.Property.carpet_area >= filters.min_carpet_area)
+def get_properties_by_ids(db: Session, property_ids: List[str], show_hidden: bool = False):
+    """Load properties by ID in the given order, skipping missing (and hidden) ones"""
+    found = {}
+    for start in range(0, len(property_ids), 500):
+        query = db.query(models.Property).filter(models.Property.property_id.in_(property_ids[start:start + 500]))
+        if not show_hidden:
+            query = query.filter(models.Property.is_hidden == False)
+        with tracing.span('query'):
+            for db_property in query:
+                found[db_property.property_id] = db_property
+    return [found[property_id] for property_id in property_ids if property_id in found]
+
+def get_tags_by_property(db: Session, property_ids: List[str]) -> dict:
+    """Tag names for many properties in one query, as {property_id: [tag_name, ...]}"""
+    tags = {property_id: [] for property_id in property_ids}
+    if property_ids:
+        rows = db.query(models.PropertyTag.property_id, models.PropertyTag.tag_name).filter(
+            models.PropertyTag.property_id.in_(property_ids)
+        )
+        with tracing.span('tags'):
+            for property_id, tag_name in rows:
+                tags[property_id].append(tag_name)
+    return tags
+
+def _search_conditions(filters: schemas.PropertySearchFilters) -> list:
+    """WHERE clauses for every filter except free text (q)"""
+    conditions = []
+    for column in ('name', 'location', 'configurations', 'developer'):
+        term = getattr(filters, column)
+        if term:
+            conditions.append(getattr(models.Property, column).ilike(f"%{term}%"))
     
-    if filters.max_carpet_area is not None:
-        query = query.filter(models.Property.carpet_area <= filters.max_carpet_area)
+    for column in ('budget', 'price_per_sqft', 'carpet_area'):
+        low = getattr(filters, f'min_{column}')
+        high = getattr(filters, f'max_{column}')
+        if low is not None:
+            conditions.append(getattr(models.Property, column) >= low)
+        if high is not None:
+            conditions.append(getattr(models.Property, column) <= high)
     
-    # Filter by tags
+    # Filter by tags (any of them); a subquery rather than a join so each property appears once
     if filters.tags:
         tag_list = [tag.strip() for tag in filters.tags.split(',')]
-        query = query.join(models.PropertyTag).filter(
-            models.PropertyTag.tag_name.in_(tag_list)
-        )
+        conditions.append(models.Property.property_id.in_(
+            select(models.PropertyTag.property_id).where(models.PropertyTag.tag_name.in_(tag_list))
+        ))
     
     # Hide hidden properties for non-admin
     if not filters.show_hidden:
-        query = query.filter(models.Property.is_hidden == False)
+        conditions.append(models.Property.is_hidden == False)
+    return conditions
+
+def search_properties(db: Session, filters: schemas.PropertySearchFilters):
+    """Properties matching the filters; with free text (q), only its matches, best first"""
+    query = db.query(models.Property).filter(*_search_conditions(filters))
     
-    return query.all()
+    if filters.q:
+        return _rank_text_matches(query, filters)
+    
+    with tracing.span('query'):
+        return query.all()
 
-def update_property(db: Session, property_id: str, property_data: schemas.PropertyUpdate):
-    db_property = get_property(db, property_id)
+def _text_ranking(filters: schemas.PropertySearchFilters) -> List[str]:
+    import text_search_service
+    with tracing.span('text'):
+        ranked = text_search_service.get_text_search_index().search(filters.q, filters.show_hidden)
+    return [property_id for property_id, _ in ranked]
+
+def _rank_text_matches(query, filters: schemas.PropertySearchFilters):
+    # The text index picks and ranks candidates; the other filters run on them by primary key
+    property_ids = _text_ranking(filters)
+    found = {}
+    for start in range(0, len(property_ids), 500):
+        with tracing.span('query'):
+            for db_property in query.filter(models.Property.property_id.in_(property_ids[start:start + 500])):
+                found[db_property.property_id] = db_property
+    return [found[property_id] for property_id in property_ids if property_id in found]
+
+# Columns of the ORM-free read path, in PropertyRow slot order
+ROW_COLUMNS = (
+    'property_id', 'name', 'budget', 'configurations', 'location', 'price_per_sqft', 'carpet_area',
+    'developer', 'description', 'gmaps_link', 'video_file', 'floor_plan_file', 'is_hidden',
+    'hidden_fields', 'uploaded_by', 'created_at', 'updated_at',
+)
+
+_ROW_SELECT = select(*[getattr(models.Property, column) for column in ROW_COLUMNS])
+
+class PropertyRow:
+    """A property's column values plus its tag names, for read-only responses.
+
+    Loaded with Core select() instead of as ORM entities, so reading skips the identity
+    map, change tracking and relationship loaders. property_to_schema accepts one in
+    place of a models.Property when given tags=row.tags.
+    """
+    __slots__ = ROW_COLUMNS + ('tags',)
+
+    def __init__(self, values, tags: Optional[List[str]] = None):
+        (self.property_id, self.name, self.budget, self.configurations, self.location, self.price_per_sqft,
+         self.carpet_area, self.developer, self.description, self.gmaps_link, self.video_file,
+         self.floor_plan_file, self.is_hidden, self.hidden_fields, self.uploaded_by, self.created_at,
+         self.updated_at) = values
+        self.tags = tags
+
+def _attach_tags(db: Session, rows: List[PropertyRow]):
+    for start in range(0, len(rows), 500):
+        chunk = rows[start:start + 500]
+        tags = get_tags_by_property(db, [row.property_id for row in chunk])
+        for row in chunk:
+            row.tags = tags[row.property_id]
+
+def _load_rows(db: Session, stmt, with_tags: bool) -> List[PropertyRow]:
+    with tracing.span('query'):
+        rows = [PropertyRow(values) for values in db.execute(stmt)]
+    if with_tags:
+        _attach_tags(db, rows)
+    return rows
+
+def get_property_rows(db: Session, skip: int = 0, limit: int = 100, show_hidden: bool = False,
+                      with_tags: bool = True) -> List[PropertyRow]:
+    """get_properties as PropertyRows"""
+    stmt = _ROW_SELECT
+    if not show_hidden:
+        stmt = stmt.where(models.Property.is_hidden == False)
+    return _load_rows(db, stmt.offset(skip).limit(limit), with_tags)
+
+def get_property_rows_by_ids(db: Session, property_ids: List[str], show_hidden: bool = False,
+                             with_tags: bool = True) -> List[PropertyRow]:
+    """get_properties_by_ids as PropertyRows"""
+    stmt = _ROW_SELECT if show_hidden else _ROW_SELECT.where(models.Property.is_hidden == False)
+    return _rows_in_order(db, stmt, property_ids, with_tags)
+
+def _rows_in_order(db: Session, stmt, property_ids: List[str], with_tags: bool) -> List[PropertyRow]:
+    found = {}
+    for start in range(0, len(property_ids), 500):
+        for row in _load_rows(db, stmt.where(models.Property.property_id.in_(property_ids[start:start + 500])), False):
+            found[row.property_id] = row
+    rows = [found[property_id] for property_id in property_ids if property_id in found]
+    if with_tags:
+        _attach_tags(db, rows)
+    return rows
+
+def search_property_rows(db: Session, filters: schemas.PropertySearchFilters,
+                         with_tags: bool = True) -> List[PropertyRow]:
+    """search_properties as PropertyRows"""
+    stmt = _ROW_SELECT.where(*_search_conditions(filters))
+    if filters.q:
+        return _rows_in_order(db, stmt, _text_ranking(filters), with_tags)
+    return _load_rows(db, stmt, with_tags)
+
+def iter_property_row_batches(db: Session, show_hidden: bool, batch_size: int) -> Iterator[List[PropertyRow]]:
+    """The whole catalog in creation order, batch_size PropertyRows (with tags) per server-side cursor fetch"""
+    stmt = _ROW_SELECT.order_by(models.Property.created_at).execution_options(yield_per=batch_size)
+    if not show_hidden:
+        stmt = stmt.where(models.Property.is_hidden == False)
+    for partition in db.execute(stmt).partitions():
+        rows = [PropertyRow(values) for values in partition]
+        _attach_tags(db, rows)
+        yield rows
+
+def _get_for_update(db: Session, property_id: str) -> models.Property:
+    # Session.get answers from the identity map when the caller has already loaded the row
+    db_property = db.get(models.Property, property_id)
     if not db_property:
         raise HTTPException(status_code=404, detail="Property not found")
+    return db_property
+
+def apply_update_property(db: Session, property_id: str, property_data: schemas.PropertyUpdate) -> models.Property:
+    db_property = _get_for_update(db, property_id)
     
     # Update fields
     update_data = property_data.dict(exclude_unset=True, exclude={'tags'})
@@ -106,31 +249,29 @@ def update_property(db: Session, property_id: str, property_data: schemas.Proper
     
     # Update tags if provided
     if property_data.tags is not None:
-        # Delete existing tags
-        db.query(models.PropertyTag).filter(
-            models.PropertyTag.property_id == property_id
-        ).delete()
-        
-        # Add new tags
-        for tag in property_data.tags:
-            db_tag = models.PropertyTag(
-                property_id=property_id,
-                tag_name=tag.strip()
-            )
-            db.add(db_tag)
-    
+        # Tags live in their own table, so mark the row itself as changed
+        db_property.updated_at = datetime.now(timezone.utc)
+        # Replaced tags are deleted as orphans
+        db_property.tags = [models.PropertyTag(tag_name=tag.strip()) for tag in property_data.tags]
+    return db_property
+
+def update_property(db: Session, property_id: str, property_data: schemas.PropertyUpdate):
+    db_property = apply_update_property(db, property_id, property_data)
     db.commit()
     db.refresh(db_property)
+    notify_change('updated', property_id, db_property)
     return db_property
 
-def toggle_property_visibility(db: Session, property_id: str):
-    db_property = get_property(db, property_id)
-    if not db_property:
-        raise HTTPException(status_code=404, detail="Property not found")
-    
+def apply_toggle_visibility(db: Session, property_id: str) -> models.Property:
+    db_property = _get_for_update(db, property_id)
     db_property.is_hidden = not db_property.is_hidden
+    return db_property
+
+def toggle_property_visibility(db: Session, property_id: str):
+    db_property = apply_toggle_visibility(db, property_id)
     db.commit()
     db.refresh(db_property)
+    notify_change('updated', property_id, db_property)
     return db_property
 
 def delete_property(db: Session, property_id: str):
@@ -138,39 +279,72 @@ def delete_property(db: Session, property_id: str):
     if db_property:
         db.delete(db_property)
         db.commit()
+        notify_change('deleted', property_id)
         return True
     return False
 
-def property_to_schema(db_property: models.Property) -> schemas.Property:
-    """Convert database property to schema with tags"""
-    tags = [tag.tag_name for tag in db_property.tags]
+def apply_field_visibility(db: Session, property_id: str, visibility: dict) -> models.Property:
+    db_property = _get_for_update(db, property_id)
+    db_property.hidden_fields = field_visibility.mask_from_dict(visibility)
+    db_property.field_visibility = None
+    return db_property
+
+def update_field_visibility(db: Session, property_id: str, visibility: dict):
+    db_property = apply_field_visibility(db, property_id, visibility)
+    db.commit()
+    db.refresh(db_property)
+    notify_change('updated', property_id, db_property)
+    return db_property
+
+def migrate_legacy_field_visibility(db: Session) -> int:
+    """Compile legacy JSON field_visibility values into hidden_fields bitmasks"""
+    legacy = db.query(models.Property).filter(models.Property.field_visibility.isnot(None)).all()
+    for db_property in legacy:
+        db_property.hidden_fields = field_visibility.mask_from_json(db_property.field_visibility)
+        db_property.field_visibility = None
+    if legacy:
+        db.commit()
+    return len(legacy)
+
+@tracing.traced('to_schema')
+def property_to_schema(db_property: models.Property, public: bool = False,
+                       fields: Optional[frozenset] = None, tags: Optional[List[str]] = None) -> schemas.Property:
+    """Convert database property to schema with tags.
+
+    Public responses leave out the fields hidden by the property's visibility mask;
+    endpoints serve them with response_model_exclude_unset so they are omitted entirely.
+    Tags are only loaded when no sparse fieldset is given or it includes them, and
+    batch readers can pass them in pre-aggregated to skip the lazy relationship load.
+    """
+    mask = db_property.hidden_fields or 0
+    data = {
+        'property_id': db_property.property_id,
+        'name': db_property.name,
+        'budget': db_property.budget,
+        'configurations': db_property.configurations,
+        'location': db_property.location,
+        'price_per_sqft': db_property.price_per_sqft,
+        'carpet_area': db_property.carpet_area,
+        'developer': db_property.developer,
+        'description': db_property.description,
+        'gmaps_link': db_property.gmaps_link,
+        'video_file': db_property.video_file,
+        'floor_plan_file': db_property.floor_plan_file,
+        'is_hidden': db_property.is_hidden,
+        'field_visibility': field_visibility.visibility_dict(mask),
+        'uploaded_by': db_property.uploaded_by,
+        'created_at': db_property.created_at,
+        'updated_at': db_property.updated_at,
+    }
     
-    # Parse field visibility JSON
-    field_visibility = None
-    if db_property.field_visibility:
-        import json
-        try:
-            field_visibility = json.loads(db_property.field_visibility)
-        except:
-            field_visibility = None
+    hidden = field_visibility.hidden_attributes(mask) if public else frozenset()
+    if 'tags' not in hidden and (fields is None or 'tags' in fields):
+        if tags is None:
+            # Lazy relationship load: one query per property
+            with tracing.span('tags'):
+                tags = [tag.tag_name for tag in db_property.tags]
+        data['tags'] = tags
+    for attribute in hidden:
+        data.pop(attribute, None)
     
-    return schemas.Property(
-        property_id=db_property.property_id,
-        name=db_property.name,
-        budget=db_property.budget,
-        configurations=db_property.configurations,
-        location=db_property.location,
-        price_per_sqft=db_property.price_per_sqft,
-        carpet_area=db_property.carpet_area,
-        developer=db_property.developer,
-        description=db_property.description,
-        gmaps_link=db_property.gmaps_link,
-        video_file=db_property.video_file,
-        floor_plan_file=db_property.floor_plan_file,
-        is_hidden=db_property.is_hidden,
-        field_visibility=field_visibility,
-        uploaded_by=db_property.uploaded_by,
-        created_at=db_property.created_at,
-        updated_at=db_property.updated_at,
-        tags=tags
-    )
+    return schemas.Property(**data)
@@ -0,0 +1,536 @@
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional, List
+import logging
+import queue
+import threading
+import time
+import numpy as np
+import memory_profiling
+import models
+import schemas
+import property_service
+import text_search_service
+
+logger = logging.getLogger(__name__)
+
+MAX_SAVED_SEARCHES = 50
+
+MAX_MATCHES_PAGE = 100
+
+# (property attribute, lower bound filter, upper bound filter)
+RANGES = (
+    ('budget', 'min_budget', 'max_budget'),
+    ('price_per_sqft', 'min_price_per_sqft', 'max_price_per_sqft'),
+    ('carpet_area', 'min_carpet_area', 'max_carpet_area'),
+)
+
+# Case-insensitive substring filters, as in property_service.search_properties
+TEXT_FIELDS = ('name', 'location', 'configurations', 'developer')
+
+class IntervalIndex:
+    """Which saved searches' [low, high] ranges contain a value.
+
+    Intervals are kept sorted by their low end: a stabbing query bisects to the intervals
+    starting at or below the value and keeps those whose high end reaches it. Additions
+    go to a short unsorted list that is merged into the sorted arrays once it grows.
+    Removed slots stay in the arrays until the next merge; the caller masks them out.
+    """
+
+    MERGE_AT = 1024
+
+    def __init__(self):
+        self._intervals = {}
+        self._pending = []
+        self._lows = np.empty(0)
+        self._highs = np.empty(0)
+        self._slots = np.empty(0, dtype=np.int64)
+
+    def add(self, slot: int, low: float, high: float):
+        self._intervals[slot] = (low, high)
+        self._pending.append(slot)
+        if len(self._pending) >= self.MERGE_AT:
+            self.merge()
+
+    def remove(self, slot: int):
+        self._intervals.pop(slot, None)
+
+    def merge(self):
+        slots = np.fromiter(self._intervals, dtype=np.int64, count=len(self._intervals))
+        bounds = np.array(list(self._intervals.values()), dtype=np.float64).reshape(len(slots), 2)
+        order = np.argsort(bounds[:, 0], kind='stable')
+        self._slots = slots[order]
+        self._lows = bounds[order, 0]
+        self._highs = bounds[order, 1]
+        self._pending = []
+
+    def stab(self, value: float) -> np.ndarray:
+        count = np.searchsorted(self._lows, value, side='right')
+        stabbed = self._slots[:count][self._highs[:count] >= value]
+        recent = [
+            slot for slot in self._pending
+            if slot in self._intervals and self._intervals[slot][0] <= value <= self._intervals[slot][1]
+        ]
+        if recent:
+            stabbed = np.concatenate([stabbed, np.array(recent, dtype=np.int64)])
+        return stabbed
+
+class Listing(NamedTuple):
+    """The parts of a listing saved searches look at, read once on the writing thread"""
+    ranges: dict
+    tags: frozenset
+    text: dict
+    words: frozenset
+
+    @classmethod
+    def of(cls, db_property: models.Property) -> 'Listing':
+        tags = frozenset(tag.tag_name for tag in db_property.tags)
+        return cls(
+            ranges={attribute: getattr(db_property, attribute) for attribute, _, _ in RANGES},
+            tags=tags,
+            text={field: (getattr(db_property, field) or '').lower() for field in TEXT_FIELDS},
+            words=frozenset(text_search_service.document_terms(
+                db_property.name, db_property.description, db_property.location, db_property.developer, tags
+            )),
+        )
+
+class _SearchTable:
+    """One built generation of the saved search index (see SavedSearchIndex)"""
+
+    def __init__(self):
+        self._search_ids: List[str] = []
+        self._slot = {}
+        self._need = np.zeros(0, dtype=np.int16)
+        self._active = np.zeros(0, dtype=bool)
+        self._ranges = {attribute: IntervalIndex() for attribute, _, _ in RANGES}
+        self._tags = defaultdict(set)
+        self._terms = {field: defaultdict(set) for field in TEXT_FIELDS}
+        # Longest term per text field, bounding the substrings of a listing worth looking up
+        self._longest = dict.fromkeys(TEXT_FIELDS, 0)
+        self._words = defaultdict(set)
+        self._constraints = {}
+        # numpy views of the posting sets and search ids, rebuilt after changes
+        self._arrays = {}
+        self._id_array = None
+
+    @classmethod
+    def build(cls, session_factory) -> '_SearchTable':
+        db = session_factory()
+        try:
+            rows = db.execute(select(models.SavedSearch.search_id, models.SavedSearch.filters)).all()
+        finally:
+            db.close()
+        table = cls()
+        for search_id, filters in rows:
+            table.add(search_id, schemas.PropertySearchFilters.model_validate_json(filters))
+        for index in table._ranges.values():
+            index.merge()
+        return table
+
+    def memory_stats(self) -> dict:
+        arrays = [self._need, self._active, *self._arrays.values()]
+        return {
+            'entries': len(self._slot),
+            'cached_postings': len(self._arrays),
+            'array_bytes': sum(array.nbytes for array in arrays),
+        }
+
+    def _postings(self, key: tuple, slots: set) -> np.ndarray:
+        array = self._arrays.get(key)
+        if array is None:
+            array = self._arrays[key] = np.fromiter(slots, dtype=np.int64, count=len(slots))
+        return array
+
+    def add(self, search_id: str, filters: schemas.PropertySearchFilters):
+        self.remove(search_id)
+        slot = len(self._search_ids)
+        self._search_ids.append(search_id)
+        self._id_array = None
+        self._slot[search_id] = slot
+        if slot >= len(self._need):
+            capacity = max(1024, 2 * len(self._need))
+            self._need = np.resize(self._need, capacity)
+            self._active = np.resize(self._active, capacity)
+            self._active[slot:] = False
+
+        constraints = []
+        for attribute, low_name, high_name in RANGES:
+            low, high = getattr(filters, low_name), getattr(filters, high_name)
+            if low is not None or high is not None:
+                self._ranges[attribute].add(slot, -np.inf if low is None else low, np.inf if high is None else high)
+                constraints.append(('range', attribute))
+        if filters.tags:
+            tags = {tag.strip() for tag in filters.tags.split(',')}
+            for tag in tags:
+                self._tags[tag].add(slot)
+                self._arrays.pop(('tag', tag), None)
+            constraints.append(('tags', tags))
+        for field in TEXT_FIELDS:
+            term = getattr(filters, field)
+            if term:
+                term = term.lower()
+                self._terms[field][term].add(slot)
+                self._longest[field] = max(self._longest[field], len(term))
+                self._arrays.pop((field, term), None)
+                constraints.append(('text', (field, term)))
+        for word in text_search_service.query_terms(filters.q):
+            self._words[word].add(slot)
+            self._arrays.pop(('word', word), None)
+            constraints.append(('word', word))
+
+        self._need[slot] = len(constraints)
+        self._active[slot] = True
+        self._constraints[slot] = constraints
+
+    def remove(self, search_id: str):
+        slot = self._slot.pop(search_id, None)
+        if slot is None:
+            return
+        self._active[slot] = False
+        for kind, value in self._constraints.pop(slot):
+            if kind == 'range':
+                self._ranges[value].remove(slot)
+            elif kind == 'tags':
+                for tag in value:
+                    self._tags[tag].discard(slot)
+                    self._arrays.pop(('tag', tag), None)
+            elif kind == 'word':
+                self._words[value].discard(slot)
+                self._arrays.pop(('word', value), None)
+                if not self._words[value]:
+                    del self._words[value]
+            else:
+                field, term = value
+                self._terms[field][term].discard(slot)
+                self._arrays.pop(value, None)
+                if not self._terms[field][term]:
+                    del self._terms[field][term]
+
+    def match(self, listing: Listing) -> List[str]:
+        count = len(self._search_ids)
+        hits = np.zeros(count, dtype=np.int16)
+
+        for attribute, _, _ in RANGES:
+            value = listing.ranges[attribute]
+            if value is not None:
+                hits[self._ranges[attribute].stab(value)] += 1
+
+        # A search listing several of the tags counts once
+        tag_hits = np.zeros(count, dtype=bool)
+        for tag in listing.tags:
+            if self._tags.get(tag):
+                tag_hits[self._postings(('tag', tag), self._tags[tag])] = True
+        hits += tag_hits
+
+        # Look up the listing's own substrings rather than scanning every indexed term
+        for field in TEXT_FIELDS:
+            value, terms, longest = listing.text[field], self._terms[field], self._longest[field]
+            if not value or not terms:
+                continue
+            substrings = {
+                value[start:end]
+                for start in range(len(value))
+                for end in range(start + 1, min(len(value), start + longest) + 1)
+            }
+            for term in substrings & terms.keys():
+                hits[self._postings((field, term), terms[term])] += 1
+
+        # A free-text word matches when some word of the listing equals it or, if long
+        # enough, starts with it: look up each listing word and its prefixes
+        matched_words = set()
+        for word in listing.words:
+            if word in self._words:
+                matched_words.add(word)
+            for end in range(text_search_service.MIN_PREFIX_LENGTH, len(word)):
+                if word[:end] in self._words:
+                    matched_words.add(word[:end])
+        for word in matched_words:
+            hits[self._postings(('word', word), self._words[word])] += 1
+
+        matched = np.flatnonzero((hits == self._need[:count]) & self._active[:count])
+        if self._id_array is None:
+            self._id_array = np.array(self._search_ids, dtype=object)
+        return self._id_array[matched].tolist()
+
+class SavedSearchIndex:
+    """Reverse index from listings to the saved searches they satisfy.
+
+    Each saved search is split into its constraints: one per bounded numeric range
+    (interval indexes), one for its tags (inverted index, any tag matches), one per
+    text filter (grouped by search term) and one per free-text word. Matching a listing
+    looks up the satisfied constraints in each structure, keyed by the listing's own
+    values, substrings and words, and counts them per search; searches whose count
+    reaches their number of constraints match. Cost follows the listing and the
+    satisfied constraints, not the number of saved searches or distinct terms.
+
+    start() builds the first index on a background thread and match() waits for it;
+    it is only called from the match outbox thread, never from a property write. After
+    that, a match on an index older than MAX_AGE schedules a background rebuild, which
+    picks up other workers' saved searches, and keeps using the current index until the
+    new one is swapped in. Searches saved or deleted during a rebuild are replayed onto
+    the new index first.
+    """
+
+    MAX_AGE = 300.0
+
+    # Seconds between attempts while the first build keeps failing
+    RETRY_INTERVAL = 5.0
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._table: Optional[_SearchTable] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._built_at = 0.0
+        self._rebuilding = False
+        self._pending = []
+
+    def memory_stats(self) -> dict:
+        table = self._table
+        return table.memory_stats() if table is not None else {'entries': 0}
+
+    # ---- maintenance ----
+
+    def start(self):
+        """Build the first index in the background"""
+        self._schedule_rebuild()
+
+    def _schedule_rebuild(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+            self._pending = []
+        threading.Thread(target=self._rebuild, name='saved-search-rebuild', daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            table = _SearchTable.build(self.session_factory)
+        except Exception:
+            logger.exception("Saved search index rebuild failed")
+            with self._lock:
+                self._rebuilding = False
+            return
+        with self._lock:
+            for search_id, filters in self._pending:
+                if filters is None:
+                    table.remove(search_id)
+                else:
+                    table.add(search_id, filters)
+            self._table = table
+            self._built_at = time.monotonic()
+            self._rebuilding = False
+            self._pending = []
+        self._ready.set()
+
+    def _apply(self, search_id: str, filters: Optional[schemas.PropertySearchFilters]):
+        with self._lock:
+            if self._table is not None:
+                if filters is None:
+                    self._table.remove(search_id)
+                else:
+                    self._table.add(search_id, filters)
+            if self._rebuilding:
+                self._pending.append((search_id, filters))
+
+    def add(self, search_id: str, filters: schemas.PropertySearchFilters):
+        self._apply(search_id, filters)
+
+    def remove(self, search_id: str):
+        self._apply(search_id, None)
+
+    # ---- matching ----
+
+    def match(self, listing: Listing) -> List[str]:
+        """Ids of saved searches the listing satisfies"""
+        if self._table is None or time.monotonic() - self._built_at > self.MAX_AGE:
+            self._schedule_rebuild()
+        # Only until the first build succeeds
+        while not self._ready.wait(self.RETRY_INTERVAL):
+            self._schedule_rebuild()
+        with self._lock:
+            return self._table.match(listing)
+
+class MatchOutbox:
+    """Matches waiting to be written as SavedSearchMatch rows.
+
+    Property writes only enqueue the listing; a background thread matches it against
+    the saved search index and writes whatever has accumulated in one transaction, so
+    alerts add neither matching nor commits to the write path. A listing is queued at
+    most once per saved search, however often it is edited.
+    """
+
+    BATCH = 500
+
+    def __init__(self, session_factory, index: SavedSearchIndex):
+        self.session_factory = session_factory
+        self.index = index
+        self._queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def on_change(self, event: str, property_id: str, db_property: Optional[models.Property]):
+        """Property change listener: queue created and updated listings for matching"""
+        # Hidden listings match no saved search
+        if db_property is None or db_property.is_hidden:
+            return
+        self._queue.put((event, property_id, Listing.of(db_property)))
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='saved-search-outbox', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            while len(items) < self.BATCH:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in items
+            items = [item for item in items if item is not None]
+            if items:
+                try:
+                    matches = [(event, property_id, self.index.match(listing)) for event, property_id, listing in items]
+                    matches = [match for match in matches if match[2]]
+                    if matches:
+                        self._write(matches)
+                except Exception:
+                    logger.exception("Failed to queue saved search matches for %d listings", len(items))
+            if stopping:
+                return
+
+    def _write(self, items: List[tuple]):
+        db = self.session_factory()
+        try:
+            property_ids = {property_id for _, property_id, _ in items}
+            existing = set(db.execute(
+                select(models.SavedSearchMatch.search_id, models.SavedSearchMatch.property_id)
+                .where(models.SavedSearchMatch.property_id.in_(property_ids))
+            ).all())
+            rows = []
+            for event, property_id, search_ids in items:
+                for search_id in search_ids:
+                    if (search_id, property_id) not in existing:
+                        existing.add((search_id, property_id))
+                        rows.append(models.SavedSearchMatch(search_id=search_id, property_id=property_id, event=event))
+            db.add_all(rows)
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker queued some of these first, or a search was deleted meanwhile
+                db.rollback()
+                for row in rows:
+                    db.add(models.SavedSearchMatch(search_id=row.search_id, property_id=row.property_id, event=row.event))
+                    try:
+                        db.commit()
+                    except IntegrityError:
+                        db.rollback()
+        finally:
+            db.close()
+
+def _search_to_schema(db_search: models.SavedSearch) -> schemas.SavedSearch:
+    return schemas.SavedSearch(
+        search_id=db_search.search_id,
+        name=db_search.name,
+        filters=schemas.PropertySearchFilters.model_validate_json(db_search.filters),
+        created_at=db_search.created_at,
+    )
+
+def list_saved_searches(db: Session, user_id: str) -> List[schemas.SavedSearch]:
+    searches = db.query(models.SavedSearch).filter(models.SavedSearch.user_id == user_id).order_by(
+        models.SavedSearch.created_at
+    ).all()
+    return [_search_to_schema(s) for s in searches]
+
+def create_saved_search(db: Session, user_id: str, search_data: schemas.SavedSearchCreate) -> schemas.SavedSearch:
+    count = db.query(models.SavedSearch).filter(models.SavedSearch.user_id == user_id).count()
+    if count >= MAX_SAVED_SEARCHES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SAVED_SEARCHES} saved searches per user")
+
+    # Alerts only ever cover visible listings
+    filters = search_data.filters.model_copy(update={'show_hidden': False})
+    db_search = models.SavedSearch(
+        user_id=user_id,
+        name=search_data.name,
+        filters=filters.model_dump_json(exclude_defaults=True)
+    )
+    db.add(db_search)
+    db.commit()
+    db.refresh(db_search)
+    get_saved_search_index().add(db_search.search_id, filters)
+    return _search_to_schema(db_search)
+
+def delete_saved_search(db: Session, user_id: str, search_id: str) -> bool:
+    db_search = db.query(models.SavedSearch).filter(
+        models.SavedSearch.search_id == search_id,
+        models.SavedSearch.user_id == user_id
+    ).first()
+    if not db_search:
+        return False
+    db.delete(db_search)
+    db.commit()
+    get_saved_search_index().remove(search_id)
+    return True
+
+def take_matches(db: Session, user_id: str, limit: int = 50, public: bool = True) -> List[schemas.SavedSearchMatch]:
+    """Undelivered matches for the user's saved searches, oldest first, marked delivered"""
+    limit = max(1, min(limit, MAX_MATCHES_PAGE))
+    rows = db.query(models.SavedSearchMatch, models.Property).join(
+        models.SavedSearch, models.SavedSearch.search_id == models.SavedSearchMatch.search_id
+    ).join(
+        models.Property, models.Property.property_id == models.SavedSearchMatch.property_id
+    ).filter(
+        models.SavedSearch.user_id == user_id,
+        models.SavedSearchMatch.delivered_at.is_(None)
+    ).order_by(models.SavedSearchMatch.matched_at).limit(limit).all()
+
+    delivered_at = datetime.now(timezone.utc)
+    tags = property_service.get_tags_by_property(db, [db_property.property_id for _, db_property in rows])
+    matches = []
+    for match, db_property in rows:
+        match.delivered_at = delivered_at
+        # A listing hidden since it matched is delivered empty rather than leaked
+        visible = not (public and db_property.is_hidden)
+        matches.append(schemas.SavedSearchMatch(
+            match_id=match.match_id,
+            search_id=match.search_id,
+            property_id=match.property_id,
+            event=match.event,
+            matched_at=match.matched_at,
+            property=property_service.property_to_schema(
+                db_property, public=public, tags=tags.get(db_property.property_id, [])
+            ) if visible else None,
+        ))
+    if rows:
+        db.commit()
+    return matches
+
+_saved_search_index: Optional[SavedSearchIndex] = None
+_match_outbox: Optional[MatchOutbox] = None
+
+def get_saved_search_index() -> SavedSearchIndex:
+    global _saved_search_index
+    if _saved_search_index is None:
+        from database import SessionLocal
+        _saved_search_index = SavedSearchIndex(SessionLocal)
+        memory_profiling.register_cache('saved_searches', _saved_search_index.memory_stats)
+    return _saved_search_index
+
+def get_match_outbox() -> MatchOutbox:
+    global _match_outbox
+    if _match_outbox is None:
+        from database import SessionLocal
+        _match_outbox = MatchOutbox(SessionLocal, get_saved_search_index())
+    return _match_outbox
@@ -20,6 +20,12 @@ class User(UserBase):
     class Config:
         from_attributes = True
 
+class UserPage(BaseModel):
+    users: List[User]
+    next_cursor: Optional[str] = None
+    total: int
+    total_is_approximate: bool = False
+
 # Auth Schemas
 class LoginRequest(BaseModel):
     username: str
@@ -67,6 +73,9 @@ class PropertyUpdate(BaseModel):
 
 class Property(PropertyBase):
     property_id: str
+    # Optional so public responses can omit fields hidden by field visibility
+    budget: Optional[float] = None
+    location: Optional[str] = None
     video_file: Optional[str] = None
     floor_plan_file: Optional[str] = None
     is_hidden: bool = False
@@ -79,12 +88,83 @@ class Property(PropertyBase):
     class Config:
         from_attributes = True
 
+class PropertyBatchRequest(BaseModel):
+    property_ids: List[str] = Field(..., min_length=1, max_length=100)
+
+class PropertyBatchResponse(BaseModel):
+    properties: List[Property]
+    missing: List[str] = []
+
+# Duplicate Detection Schemas
+class DuplicateMatch(BaseModel):
+    property_id: str  # an existing property, or '#<position>' for an earlier listing of the same import
+    name: Optional[str] = None
+    similarity: float
+
+class PropertyImportItem(BaseModel):
+    position: int
+    property_id: Optional[str] = None  # None when rejected
+    duplicates: List[DuplicateMatch] = []
+    error: Optional[str] = None  # why creating it failed
+
+class PropertyImportResponse(BaseModel):
+    created: List[PropertyImportItem] = []
+    rejected: List[PropertyImportItem] = []
+
+class DuplicatePair(BaseModel):
+    property_id: str
+    duplicate_of: str
+    similarity: float
+    flag_id: Optional[str] = None  # None for pairs found by a catalog scan
+
+class DuplicateCluster(BaseModel):
+    properties: List[Property]
+    pairs: List[DuplicatePair]
+
+# Direct Upload Schemas
+class PresignUploadRequest(BaseModel):
+    filename: str
+    size: int = Field(..., gt=0)
+    content_type: Optional[str] = None
+
+class UploadedPart(BaseModel):
+    part_number: int
+    etag: str
+
+class CompleteUploadRequest(BaseModel):
+    key: str
+    upload_id: str
+    parts: List[UploadedPart]
+
+# Audit Schemas
+class AuditEvent(BaseModel):
+    audit_id: str
+    occurred_at: datetime
+    actor_id: Optional[str] = None
+    action: str
+    target_id: Optional[str] = None
+    details: Optional[dict] = None
+
+class AuditPage(BaseModel):
+    events: List[AuditEvent]
+    next_cursor: Optional[str] = None
+
+# Memory Profiling Schema
+class MemoryProfileRequest(BaseModel):
+    method: str = 'GET'
+    path: str  # e.g. /api/properties/search
+    query: Optional[str] = None  # query string without '?'
+    body: Optional[dict] = None
+    top: int = Field(15, ge=1, le=100)
+    group_by: str = 'lineno'  # lineno, filename or traceback
+
 # Field Visibility Schema
 class FieldVisibilityUpdate(BaseModel):
     field_visibility: dict  # e.g., {"budget": false, "location": true, "price_per_sqft": false}
 
 # Search Filters
 class PropertySearchFilters(BaseModel):
+    q: Optional[str] = None  # free text over name, description, location, developer and tags; ranks results
     name: Optional[str] = None
     location: Optional[str] = None
     min_budget: Optional[float] = None
@@ -97,3 +177,22 @@ class PropertySearchFilters(BaseModel):
     max_carpet_area: Optional[float] = None
     tags: Optional[str] = None
     show_hidden: bool = False
+
+# Saved Search Schemas
+class SavedSearchCreate(BaseModel):
+    name: Optional[str] = None
+    filters: PropertySearchFilters
+
+class SavedSearch(BaseModel):
+    search_id: str
+    name: Optional[str] = None
+    filters: PropertySearchFilters
+    created_at: datetime
+
+class SavedSearchMatch(BaseModel):
+    match_id: str
+    search_id: str
+    property_id: str
+    event: str
+    matched_at: datetime
+    property: Optional[Property] = None
@@ -0,0 +1,403 @@
+from fastapi import HTTPException, Response
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Tuple
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+import memory_profiling
+import models
+import schemas
+import property_service
+import serialization
+import text_search_service
+import write_counter
+
+logger = logging.getLogger(__name__)
+
+# Fraction of searches recorded in the query log
+SAMPLE_RATE = float(os.getenv('SEARCH_LOG_SAMPLE_RATE', '0.1'))
+
+# Most searched queries precomputed on startup and after catalog changes
+PREWARM_TOP = int(os.getenv('SEARCH_PREWARM_TOP', '20'))
+
+# Queries count towards the top list while searched within this many days
+TOP_WINDOW_DAYS = 7
+
+# Encoded responses kept per process, by total body size
+CACHE_BYTES = 64 * 1024 * 1024
+
+# Seconds a cached response may be served regardless of local write counters
+MAX_AGE = 60.0
+
+# Seconds between reads of the shared catalog stamp without a catalog snapshot, which
+# bounds how long another worker's write can go unseen
+STAMP_INTERVAL = 1.0
+
+LOG_FLUSH_INTERVAL = 10.0
+
+# Writes arriving within this many seconds of each other trigger one rewarm
+REWARM_DELAY = 2.0
+
+MAX_TOP_QUERIES = 200
+
+_SUBSTRING_FILTERS = ('name', 'location', 'configurations', 'developer')
+
+def normalize_filters(filters: schemas.PropertySearchFilters) -> schemas.PropertySearchFilters:
+    """Equivalent filters in one canonical form, so the same search from any client shares a key.
+
+    Substring filters are case-insensitive and free text is tokenized anyway, so both
+    are lower-cased and trimmed; tags are de-duplicated and sorted.
+    """
+    update = {field: (getattr(filters, field) or '').strip().lower() or None for field in _SUBSTRING_FILTERS}
+    update['q'] = ' '.join(text_search_service.query_terms(filters.q)) or None
+    if filters.tags:
+        update['tags'] = ','.join(sorted({tag.strip() for tag in filters.tags.split(',') if tag.strip()})) or None
+    return filters.model_copy(update=update)
+
+def _fields_value(field_set: Optional[frozenset]) -> Optional[str]:
+    return ','.join(sorted(field_set)) if field_set else None
+
+def query_key(filters: schemas.PropertySearchFilters, public: bool, field_set: Optional[frozenset]) -> str:
+    raw = f"{filters.model_dump_json(exclude_defaults=True)}|{'p' if public else 'a'}|{_fields_value(field_set) or ''}"
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+def run_search(db: Session, filters: schemas.PropertySearchFilters, public: bool,
+               field_set: Optional[frozenset], snapshot=None) -> Tuple[bytes, int]:
+    """Encoded search response body and its number of results"""
+    with_tags = field_set is None or 'tags' in field_set
+    if snapshot:
+        property_ids = snapshot.search(filters)
+        if filters.q:
+            matched = set(property_ids)
+            ranked = text_search_service.get_text_search_index().search(filters.q, filters.show_hidden)
+            property_ids = [property_id for property_id, _ in ranked if property_id in matched]
+        rows = property_service.get_property_rows_by_ids(db, property_ids, filters.show_hidden, with_tags)
+    else:
+        rows = property_service.search_property_rows(db, filters, with_tags)
+    body = serialization.dump_properties(
+        (property_service.property_to_schema(row, public=public, fields=field_set, tags=row.tags) for row in rows),
+        field_set
+    )
+    return body, len(rows)
+
+class CatalogStamp:
+    """Row count and latest updated_at of the properties table, shared by every worker.
+
+    Any create, edit or delete changes it. Read from the database at most once every
+    STAMP_INTERVAL seconds per process, and again after a local write so responses
+    computed after it are not stored under the stamp from before it.
+    """
+
+    def __init__(self):
+        self._value = None
+        self._read_at = 0.0
+        self._local_version = None
+
+    def current(self, db: Session) -> tuple:
+        now = time.monotonic()
+        local_version = write_counter.version('properties')
+        if self._value is None or now - self._read_at > STAMP_INTERVAL or local_version != self._local_version:
+            self._value = tuple(db.execute(
+                select(func.count(), func.max(models.Property.updated_at)).select_from(models.Property)
+            ).one())
+            self._read_at = now
+            self._local_version = local_version
+        return self._value
+
+catalog_stamp = CatalogStamp()
+
+def _catalog_version(db: Session, snapshot) -> tuple:
+    # A snapshot's version is already shared between workers
+    shared = snapshot.version if snapshot else catalog_stamp.current(db)
+    return write_counter.version('properties'), shared
+
+class SearchResponseCache:
+    """Encoded search responses keyed by normalized query, valid for one catalog version.
+
+    The version combines the local write counter, so this process's writes invalidate
+    at once, with a version shared by all workers: the catalog snapshot's when there is
+    one, else the catalog stamp. Another worker's write is therefore seen within
+    STAMP_INTERVAL seconds, or once the snapshot is rebuilt. Entries also expire after
+    MAX_AGE as a backstop.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str, version: tuple) -> Optional[Tuple[bytes, int]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry_version, stored_at, body, count = entry
+            if entry_version != version or time.monotonic() - stored_at > MAX_AGE:
+                return None
+            self._entries.move_to_end(key)
+            return body, count
+
+    def put(self, key: str, version: tuple, body: bytes, count: int):
+        if len(body) > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[2])
+            self._entries[key] = (version, time.monotonic(), body, count)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[2])
+
+    def memory_stats(self) -> dict:
+        return {'entries': len(self._entries), 'bytes': self._bytes}
+
+response_cache = SearchResponseCache()
+memory_profiling.register_cache('search_responses', response_cache.memory_stats)
+
+class QueryLog:
+    """Sampled searches aggregated per query in memory and flushed to search_query_stats.
+
+    Recording a sample is a dict update under a lock; a background thread adds the
+    aggregates to the table every LOG_FLUSH_INTERVAL seconds, so the log survives
+    restarts and combines every worker's traffic.
+    """
+
+    def __init__(self, session_factory, sample_rate: float = SAMPLE_RATE):
+        self.session_factory = session_factory
+        self.sample_rate = sample_rate
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, key: str, filters: schemas.PropertySearchFilters, public: bool,
+               field_set: Optional[frozenset], latency_ms: float, result_count: int):
+        if random.random() >= self.sample_rate:
+            return
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                entry = self._pending[key] = {
+                    'filters': filters.model_dump_json(exclude_defaults=True),
+                    'public': public,
+                    'fields': _fields_value(field_set),
+                    'samples': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                }
+            entry['samples'] += 1
+            entry['total_ms'] += latency_ms
+            entry['max_ms'] = max(entry['max_ms'], latency_ms)
+            entry['result_count'] = result_count
+            entry['last_seen_at'] = datetime.now(timezone.utc)
+
+    def flush(self):
+        """Add the pending aggregates to the table"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            for attempt in range(2):
+                try:
+                    self._write(pending)
+                    return
+                except IntegrityError:
+                    # Another worker inserted one of the new queries first; merge into its row
+                    if attempt:
+                        raise
+
+    def _write(self, pending: dict):
+        db = self.session_factory()
+        try:
+            existing = {
+                stat.query_key: stat for stat in
+                db.query(models.SearchQueryStat).filter(models.SearchQueryStat.query_key.in_(list(pending)))
+            }
+            for key, entry in pending.items():
+                stat = existing.get(key)
+                if stat is None:
+                    db.add(models.SearchQueryStat(query_key=key, **entry))
+                    continue
+                stat.samples += entry['samples']
+                stat.total_ms += entry['total_ms']
+                stat.max_ms = max(stat.max_ms, entry['max_ms'])
+                stat.result_count = entry['result_count']
+                stat.last_seen_at = entry['last_seen_at']
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def start(self):
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='search-query-log', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.wait(LOG_FLUSH_INTERVAL):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to write the search query log")
+
+def top_queries(db: Session, limit: int = PREWARM_TOP, days: int = TOP_WINDOW_DAYS) -> List[models.SearchQueryStat]:
+    """Most sampled queries searched within the last days"""
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    return db.execute(
+        select(models.SearchQueryStat)
+        .where(models.SearchQueryStat.last_seen_at >= since)
+        .order_by(models.SearchQueryStat.samples.desc(), models.SearchQueryStat.query_key)
+        .limit(limit)
+    ).scalars().all()
+
+def _stat_query(stat: models.SearchQueryStat) -> Tuple[schemas.PropertySearchFilters, Optional[frozenset]]:
+    filters = schemas.PropertySearchFilters.model_validate_json(stat.filters)
+    return filters, frozenset(stat.fields.split(',')) if stat.fields else None
+
+def top_queries_view(db: Session, limit: int, snapshot=None) -> List[dict]:
+    version = _catalog_version(db, snapshot)
+    view = []
+    for stat in top_queries(db, limit):
+        filters, field_set = _stat_query(stat)
+        view.append({
+            'filters': json.loads(stat.filters),
+            'public': stat.public,
+            'fields': stat.fields,
+            'samples': stat.samples,
+            'avg_ms': round(stat.total_ms / stat.samples, 2) if stat.samples else None,
+            'max_ms': round(stat.max_ms, 2),
+            'result_count': stat.result_count,
+            'last_seen_at': stat.last_seen_at,
+            'warm': response_cache.get(query_key(filters, stat.public, field_set), version) is not None,
+        })
+    return view
+
+class Prewarmer:
+    """Precomputes the top logged queries into the response cache in the background.
+
+    Runs once on start and again after property writes, REWARM_DELAY after a burst of
+    them ends, since every write leaves the cached responses stale.
+    """
+
+    def __init__(self, session_factory, top: int = PREWARM_TOP):
+        self.session_factory = session_factory
+        self.top = top
+        self.snapshot_manager = None
+        self._requested = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def request(self, *args):
+        """Property change listener: rewarm once writes settle"""
+        self._requested.set()
+
+    def start(self, snapshot_manager=None):
+        if self.top <= 0 or self._thread is not None:
+            return
+        self.snapshot_manager = snapshot_manager
+        self._stopped.clear()
+        self._requested.set()
+        self._thread = threading.Thread(target=self._run, name='search-prewarm', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopped.set()
+            self._requested.set()
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            self._requested.wait()
+            # Wait for the writes to stop arriving
+            while self._requested.is_set() and not self._stopped.is_set():
+                self._requested.clear()
+                self._stopped.wait(REWARM_DELAY)
+            if self._stopped.is_set():
+                return
+            try:
+                self.warm()
+            except Exception:
+                logger.exception("Search cache prewarm failed")
+
+    def warm(self) -> int:
+        """Compute the top queries missing from the cache; returns how many were computed"""
+        db = self.session_factory()
+        try:
+            warmed = 0
+            for stat in top_queries(db, self.top):
+                if self._stopped.is_set() or self._requested.is_set():
+                    break
+                filters, field_set = _stat_query(stat)
+                snapshot = self.snapshot_manager.current() if self.snapshot_manager else None
+                key = query_key(filters, stat.public, field_set)
+                version = _catalog_version(db, snapshot)
+                if response_cache.get(key, version) is not None:
+                    continue
+                try:
+                    body, count = run_search(db, filters, stat.public, field_set, snapshot)
+                except HTTPException:
+                    # The text index is still starting up; try again after the usual delay
+                    self._requested.set()
+                    break
+                response_cache.put(key, version, body, count)
+                # Release loaded properties between queries
+                db.expunge_all()
+                warmed += 1
+            return warmed
+        finally:
+            db.close()
+
+def cached_search(db: Session, filters: schemas.PropertySearchFilters, public: bool,
+                  field_set: Optional[frozenset], snapshot=None) -> Response:
+    """Search response served from the cache when the catalog hasn't changed, and sampled into the query log"""
+    start = time.perf_counter()
+    filters = normalize_filters(filters)
+    key = query_key(filters, public, field_set)
+    version = _catalog_version(db, snapshot)
+    cached = response_cache.get(key, version)
+    if cached is None:
+        cached = run_search(db, filters, public, field_set, snapshot)
+        response_cache.put(key, version, *cached)
+    body, count = cached
+    get_query_log().record(key, filters, public, field_set, (time.perf_counter() - start) * 1000, count)
+    return Response(content=body, media_type="application/json")
+
+_query_log: Optional[QueryLog] = None
+_prewarmer: Optional[Prewarmer] = None
+
+def get_query_log() -> QueryLog:
+    global _query_log
+    if _query_log is None:
+        from database import SessionLocal
+        _query_log = QueryLog(SessionLocal)
+    return _query_log
+
+def get_prewarmer() -> Prewarmer:
+    global _prewarmer
+    if _prewarmer is None:
+        from database import SessionLocal
+        _prewarmer = Prewarmer(SessionLocal)
+    return _prewarmer
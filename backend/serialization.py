@@ -0,0 +1,35 @@
+from fastapi import HTTPException, Response
+from pydantic import TypeAdapter
+from typing import Optional, List, Iterable
+import schemas
+import tracing
+
+# Property models are validated once in property_to_schema; list responses are
+# encoded straight from them instead of going through response_model re-validation
+# and the stdlib json encoder.
+PROPERTY_LIST_ADAPTER = TypeAdapter(List[schemas.Property])
+
+PROPERTY_FIELDS = frozenset(schemas.Property.model_fields)
+
+# Always returned so sparse rows can still be linked to the full property
+REQUIRED_FIELDS = frozenset({'property_id'})
+
+def parse_fields(fields: Optional[str]) -> Optional[frozenset]:
+    """Parse a ?fields=name,budget,location sparse fieldset parameter"""
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = requested - PROPERTY_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return frozenset(requested | REQUIRED_FIELDS)
+
+def dump_properties(properties: Iterable[schemas.Property], fields: Optional[frozenset] = None) -> bytes:
+    """Encode validated property models to JSON bytes, keeping only the requested fields"""
+    include = {'__all__': set(fields)} if fields else None
+    properties = list(properties)
+    with tracing.span('encode'):
+        return PROPERTY_LIST_ADAPTER.dump_json(properties, include=include, exclude_unset=True)
+
+def property_list_response(properties: Iterable[schemas.Property], fields: Optional[frozenset] = None) -> Response:
+    return Response(content=dump_properties(properties, fields), media_type="application/json")
@@ -1,43 +1,128 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Cookie, Response
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Cookie, Response, Header, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, RedirectResponse
 from sqlalchemy.orm import Session
 from typing import Optional, List
-import pyotp
+from datetime import datetime
+from functools import partial
 import secrets
 import os
-import shutil
+import threading
 from pathlib import Path
 
 # Import our modules
-from database import engine, get_db, Base
+from database import engine, get_db, Base, SessionLocal, ensure_columns, ensure_indexes
 import models
 import schemas
 import auth_service
 import property_service
+import serialization
+import storage
+import tracing
+from write_coalescer import WriteOp, get_write_coalescer
+from audit_service import get_audit_log
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Nothing here touches the database or filesystem at import time; that happens in
+# the app lifespan so worker restarts and test imports stay cheap.
+UPLOAD_DIR = Path(os.getenv('UPLOAD_DIR', '/app/backend/uploads'))
 
-# Create upload directory
-UPLOAD_DIR = Path("/app/backend/uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+# Directory for catalog export snapshots
+EXPORT_DIR = Path(os.getenv('EXPORT_DIR', '/app/backend/exports'))
 
-# Create the main app
-app = FastAPI(title="MAK Kotwal Venus API")
+def init_db():
+    """Create missing tables and columns and migrate legacy data"""
+    Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    ensure_indexes()
+    
+    # Compile legacy JSON field visibility into bitmasks
+    db = SessionLocal()
+    try:
+        property_service.migrate_legacy_field_visibility(db)
+    finally:
+        db.close()
+
+def start_catalog_indexes():
+    # Imported here so numpy and pandas load off the cold-start path
+    import similarity_service
+    import duplicate_service
+    import analytics_service
+    similarity_service.get_similarity_index().start()
+    duplicate_service.get_duplicate_index().start()
+    analytics_service.get_catalog_frame().start()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.storage = storage.storage_from_env(UPLOAD_DIR)
+    app.state.storage.prepare()
+    if app.state.init_db_on_startup:
+        init_db()
+    
+    # Multi-worker mode: search a shared memory-mapped catalog snapshot
+    app.state.catalog_snapshot = None
+    if os.getenv('CATALOG_SNAPSHOT_DIR'):
+        import catalog_snapshot
+        app.state.catalog_snapshot = catalog_snapshot.manager_from_env(SessionLocal)
+        app.state.catalog_snapshot.start()
+        property_service.add_change_listener(app.state.catalog_snapshot.request_rebuild)
+    
+    # Saved search alerts: match every created or updated listing, against an index
+    # built and periodically rebuilt on a background thread
+    import saved_search_service
+    saved_search_service.get_saved_search_index().start()
+    match_outbox = saved_search_service.get_match_outbox()
+    match_outbox.start()
+    property_service.add_change_listener(match_outbox.on_change)
+    
+    # Admin action trail, written in batches in the background
+    get_audit_log().start()
+    
+    # Free-text search and autocomplete indexes, built and periodically rebuilt on
+    # background threads
+    import text_search_service
+    import autocomplete_service
+    text_search_service.get_text_search_index().start()
+    autocomplete_service.get_autocomplete_index().start()
+    
+    # Similar-listing neighbours, the duplicate index and the analytics frame, built on
+    # background threads rather than on a request
+    catalog_indexes = threading.Thread(target=start_catalog_indexes, name='catalog-index-start', daemon=True)
+    catalog_indexes.start()
+    
+    # Sampled search query log, and the most searched queries kept warm in the response cache
+    import search_cache
+    search_cache.get_query_log().start()
+    prewarmer = search_cache.get_prewarmer()
+    prewarmer.start(app.state.catalog_snapshot)
+    property_service.add_change_listener(prewarmer.request)
+    
+    yield
+    
+    await get_write_coalescer().drain()
+    await get_audit_log().stop()
+    text_search_service.get_text_search_index().stop()
+    autocomplete_service.get_autocomplete_index().stop()
+    # Started indexes only stop cleanly once start_catalog_indexes has finished importing them
+    catalog_indexes.join()
+    import similarity_service
+    import duplicate_service
+    import analytics_service
+    similarity_service.get_similarity_index().stop()
+    duplicate_service.get_duplicate_index().stop()
+    analytics_service.get_catalog_frame().stop()
+    property_service.remove_change_listener(prewarmer.request)
+    prewarmer.stop()
+    search_cache.get_query_log().stop()
+    property_service.remove_change_listener(match_outbox.on_change)
+    match_outbox.stop()
+    if app.state.catalog_snapshot:
+        property_service.remove_change_listener(app.state.catalog_snapshot.request_rebuild)
+        app.state.catalog_snapshot.stop()
 
 # Create API router with prefix
 api_router = APIRouter(prefix="/api")
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 # Dependency to get current user
 async def get_current_user(
     session_token: Optional[str] = Cookie(None),
@@ -55,16 +140,48 @@ async def get_current_user(
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    session = auth_service.get_session(db, token)
-    if not session:
-        raise HTTPException(status_code=401, detail="Invalid or expired session")
-    
-    user = auth_service.get_user_by_id(db, session.user_id)
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
+    with tracing.span('auth'):
+        session = auth_service.get_session(db, token)
+        if not session:
+            raise HTTPException(status_code=401, detail="Invalid or expired session")
+        
+        user = auth_service.get_user_by_id(db, session.user_id)
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
     
     return user
 
+# Dependency to get the current user when a session cookie is present
+async def get_optional_user(
+    session_token: Optional[str] = Cookie(None),
+    db: Session = Depends(get_db)
+):
+    if not session_token:
+        return None
+    try:
+        with tracing.span('auth'):
+            session = auth_service.get_session(db, session_token)
+            if session:
+                return auth_service.get_user_by_id(db, session.user_id)
+    except:
+        pass
+    return None
+
+async def get_storage(request: Request) -> storage.StorageBackend:
+    return request.app.state.storage
+
+def new_storage_key(filename: str) -> str:
+    return f"{secrets.token_hex(8)}_{Path(filename or 'upload').name}"
+
+async def coalesced_write(db: Session, op: WriteOp) -> models.Property:
+    """Run a property write in the next group-commit batch.
+
+    The request session only served authentication by now; it gives its connection back
+    to the pool first, so requests waiting on a batch can't starve other requests of one.
+    """
+    db.close()
+    return await get_write_coalescer().submit(op)
+
 # Dependency to get admin user
 async def get_admin_user(current_user: models.User = Depends(get_current_user)):
     if current_user.role != 'admin':
@@ -106,6 +223,7 @@ async def init_2fa(
     db.commit()
     
     # Generate TOTP URI for QR code
+    import pyotp
     totp_uri = pyotp.totp.TOTP(secret).provisioning_uri(
         name=user.email,
         issuer_name="MAK Kotwal Venus"
@@ -238,14 +356,24 @@ async def logout(
 
 # ==================== USER MANAGEMENT ENDPOINTS ====================
 
-@api_router.get("/users", response_model=List[schemas.User])
+@api_router.get("/users", response_model=schemas.UserPage)
 async def get_all_users(
+    role: Optional[str] = None,
+    email_prefix: Optional[str] = None,
+    sort: str = 'created_at',
+    order: str = 'desc',
+    cursor: Optional[str] = None,
+    limit: int = 50,
     current_user: models.User = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
-    """Get all users (admin only)"""
-    users = auth_service.get_all_users(db)
-    return users
+    """List users a page at a time, filtered by role and email prefix (admin only)"""
+    if sort not in auth_service.USER_SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(auth_service.USER_SORT_COLUMNS)}")
+    if order not in ('asc', 'desc'):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+    limit = max(1, min(limit, auth_service.MAX_USER_PAGE))
+    return auth_service.list_users(db, role, email_prefix, sort, order, cursor, limit)
 
 @api_router.post("/users", response_model=schemas.User)
 async def create_new_user(
@@ -255,6 +383,7 @@ async def create_new_user(
 ):
     """Create new user (admin only)"""
     user = auth_service.create_user(db, user_data)
+    await get_audit_log().record(current_user, 'user.create', user.user_id, email=user.email, role=user.role)
     return user
 
 @api_router.delete("/users/{user_id}")
@@ -265,6 +394,7 @@ async def delete_user_endpoint(
 ):
     """Delete user (admin only)"""
     if auth_service.delete_user(db, user_id):
+        await get_audit_log().record(current_user, 'user.delete', user_id)
         return {"message": "User deleted successfully"}
     raise HTTPException(status_code=404, detail="User not found")
 
@@ -278,6 +408,7 @@ async def update_user_role_endpoint(
     """Update user role (admin only)"""
     user = auth_service.update_user_role(db, user_id, new_role)
     if user:
+        await get_audit_log().record(current_user, 'user.role_update', user_id, role=new_role)
         return {"message": "User role updated", "user": user}
     raise HTTPException(status_code=404, detail="User not found")
 
@@ -285,6 +416,7 @@ async def update_user_role_endpoint(
 
 @api_router.post("/properties", response_model=schemas.Property)
 async def create_property_endpoint(
+    response: Response,
     name: str = Form(...),
     budget: float = Form(...),
     location: str = Form(...),
@@ -297,29 +429,22 @@ async def create_property_endpoint(
     tags: Optional[str] = Form(None),
     video_file: Optional[UploadFile] = File(None),
     floor_plan_file: Optional[UploadFile] = File(None),
+    video_file_key: Optional[str] = Form(None),
+    floor_plan_file_key: Optional[str] = Form(None),
     current_user: models.User = Depends(get_current_user),
+    file_storage: storage.StorageBackend = Depends(get_storage),
     db: Session = Depends(get_db)
 ):
-    """Create new property"""
-    # Handle file uploads
-    video_filename = None
-    if video_file:
-        video_filename = f"{secrets.token_hex(8)}_{video_file.filename}"
-        video_path = UPLOAD_DIR / video_filename
-        with open(video_path, "wb") as buffer:
-            shutil.copyfileobj(video_file.file, buffer)
-    
-    floor_plan_filename = None
-    if floor_plan_file:
-        floor_plan_filename = f"{secrets.token_hex(8)}_{floor_plan_file.filename}"
-        floor_plan_path = UPLOAD_DIR / floor_plan_filename
-        with open(floor_plan_path, "wb") as buffer:
-            shutil.copyfileobj(floor_plan_file.file, buffer)
+    """Create new property (files either uploaded inline or via /uploads/presign and passed as *_key).
+
+    Listings that look like existing ones are rejected with 409 or created with their
+    suspected duplicates flagged for review, depending on DUPLICATE_POLICY.
+    """
+    import duplicate_service
     
     # Parse tags
     tag_list = [tag.strip() for tag in tags.split(',')] if tags else []
     
-    # Create property
     property_data = schemas.PropertyCreate(
         name=name,
         budget=budget,
@@ -333,58 +458,292 @@ async def create_property_endpoint(
         tags=tag_list
     )
     
-    db_property = property_service.create_property(
-        db, property_data, current_user.user_id, video_filename, floor_plan_filename
-    )
+    # Checked before storing any upload, so a rejected listing leaves no orphaned files
+    duplicates = []
+    if duplicate_service.POLICY != 'allow':
+        duplicates = duplicate_service.find_duplicates(property_data)
+        if duplicates and duplicate_service.POLICY == 'reject':
+            raise duplicate_service.duplicate_conflict(db, duplicates)
+    
+    # Handle file uploads
+    video_filename = video_file_key
+    if video_file:
+        video_filename = new_storage_key(video_file.filename)
+        file_storage.save(video_filename, video_file.file, video_file.content_type)
+    
+    floor_plan_filename = floor_plan_file_key
+    if floor_plan_file:
+        floor_plan_filename = new_storage_key(floor_plan_file.filename)
+        file_storage.save(floor_plan_filename, floor_plan_file.file, floor_plan_file.content_type)
+    
+    for key in (video_file_key, floor_plan_file_key):
+        if key and not file_storage.exists(key):
+            raise HTTPException(status_code=400, detail=f"Uploaded file not found: {key}")
     
+    # Create property
+    db_property = await coalesced_write(db, WriteOp('created', partial(
+        duplicate_service.apply_create_flagged, property_data=property_data, duplicates=duplicates,
+        user_id=current_user.user_id, video_file=video_filename, floor_plan_file=floor_plan_filename
+    )))
+    
+    if duplicates:
+        response.headers["X-Possible-Duplicates"] = ",".join(property_id for property_id, _ in duplicates)
     return property_service.property_to_schema(db_property)
 
-@api_router.get("/properties", response_model=List[schemas.Property])
+@api_router.post("/properties/import", response_model=schemas.PropertyImportResponse)
+async def import_properties_endpoint(
+    listings: List[schemas.PropertyCreate],
+    on_duplicate: Optional[str] = None,
+    current_user: models.User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Create many properties at once (admin only).
+
+    Each listing is checked against the catalog and the listings before it in the import;
+    on_duplicate ('flag', 'reject' or 'allow', default DUPLICATE_POLICY) decides what
+    happens to suspected duplicates.
+    """
+    import asyncio
+    import duplicate_service
+    policy = on_duplicate or duplicate_service.POLICY
+    if policy not in duplicate_service.POLICIES:
+        raise HTTPException(status_code=400, detail=f"on_duplicate must be one of {', '.join(duplicate_service.POLICIES)}")
+    if len(listings) > duplicate_service.MAX_IMPORT:
+        raise HTTPException(status_code=400, detail=f"At most {duplicate_service.MAX_IMPORT} listings per import")
+    
+    if policy == 'allow':
+        found = [[] for _ in listings]
+    else:
+        found = duplicate_service.find_batch_duplicates(listings)
+    result = schemas.PropertyImportResponse()
+    accepted = []
+    for position, duplicates in enumerate(found):
+        item = schemas.PropertyImportItem(position=position, duplicates=duplicate_service.describe(db, duplicates))
+        if duplicates and policy == 'reject':
+            result.rejected.append(item)
+        else:
+            accepted.append((position, duplicates, item))
+    
+    # Submitted together so they share group commits; earlier listings of the import are
+    # flagged once they have property ids
+    outcomes = await asyncio.gather(*(
+        coalesced_write(db, WriteOp('created', partial(
+            duplicate_service.apply_create_flagged, property_data=listings[position],
+            duplicates=[match for match in duplicates if not match[0].startswith('#')], user_id=current_user.user_id
+        )))
+        for position, duplicates, _ in accepted
+    ), return_exceptions=True)
+    
+    created_ids = {}
+    for (position, _, item), outcome in zip(accepted, outcomes):
+        if isinstance(outcome, Exception):
+            item.error = str(outcome.detail) if isinstance(outcome, HTTPException) else str(outcome)
+            result.rejected.append(item)
+        else:
+            item.property_id = created_ids[position] = outcome.property_id
+            result.created.append(item)
+    
+    in_import_flags = [
+        (created_ids[position], created_ids[int(property_id[1:])], similarity)
+        for position, duplicates, _ in accepted if position in created_ids
+        for property_id, similarity in duplicates
+        if property_id.startswith('#') and int(property_id[1:]) in created_ids
+    ]
+    if in_import_flags:
+        duplicate_service.add_flags(db, in_import_flags)
+    
+    await get_audit_log().record(current_user, 'property.import', None, policy=policy,
+                                 created=len(result.created), rejected=len(result.rejected))
+    return result
+
+@api_router.get("/properties", response_model=List[schemas.Property], response_model_exclude_unset=True)
 async def get_properties_endpoint(
     skip: int = 0,
     limit: int = 100,
+    fields: Optional[str] = None,
     current_user: Optional[models.User] = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get all properties"""
+    """Get all properties (optionally only the comma-separated ?fields=)"""
+    field_set = serialization.parse_fields(fields)
     show_hidden = current_user.role == 'admin' if current_user else False
-    properties = property_service.get_properties(db, skip, limit, show_hidden)
-    return [property_service.property_to_schema(p) for p in properties]
+    rows = property_service.get_property_rows(db, skip, limit, show_hidden, with_tags=field_set is None or 'tags' in field_set)
+    return serialization.property_list_response(
+        (property_service.property_to_schema(row, public=not show_hidden, fields=field_set, tags=row.tags) for row in rows),
+        field_set
+    )
 
-@api_router.post("/properties/search", response_model=List[schemas.Property])
+@api_router.post("/properties/search", response_model=List[schemas.Property], response_model_exclude_unset=True)
 async def search_properties_endpoint(
     filters: schemas.PropertySearchFilters,
-    db: Session = Depends(get_db),
-    session_token: Optional[str] = Cookie(None)
+    request: Request,
+    fields: Optional[str] = None,
+    current_user: Optional[models.User] = Depends(get_optional_user),
+    db: Session = Depends(get_db)
 ):
     """Search properties with filters (public endpoint, but admin sees hidden properties)"""
-    # Try to get current user if session exists
-    current_user = None
-    if session_token:
-        try:
-            session = auth_service.get_session(db, session_token)
-            if session:
-                current_user = auth_service.get_user_by_id(db, session.user_id)
-        except:
-            pass
+    import search_cache
+    field_set = serialization.parse_fields(fields)
+    
+    # Admin can see hidden properties and fields
+    is_admin = bool(current_user and current_user.role == 'admin')
+    filters.show_hidden = is_admin
+    
+    snapshot = request.app.state.catalog_snapshot.current() if request.app.state.catalog_snapshot else None
+    return search_cache.cached_search(db, filters, not is_admin, field_set, snapshot)
+
+@api_router.get("/properties/changes")
+async def property_changes_endpoint(
+    request: Request,
+    filters: schemas.PropertySearchFilters = Depends(),
+    current_user: Optional[models.User] = Depends(get_optional_user)
+):
+    """Server-sent events for created, updated and removed properties matching the filters"""
+    from change_feed import change_feed
+    is_admin = bool(current_user and current_user.role == 'admin')
+    filters.show_hidden = is_admin
+    
+    subscriber = change_feed.subscribe(filters, is_admin)
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many subscribers", headers={"Retry-After": "30"})
+    return StreamingResponse(
+        change_feed.stream(subscriber, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/properties/export")
+async def export_properties_endpoint(
+    format: str = 'ndjson',
+    accept_encoding: Optional[str] = Header(None),
+    current_user: Optional[models.User] = Depends(get_optional_user)
+):
+    """Stream the full catalog as NDJSON or CSV (admin export includes hidden properties and fields)"""
+    import export_service
+    if format not in export_service.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+    
+    is_admin = bool(current_user and current_user.role == 'admin')
+    gzip = export_service.accepts_gzip(accept_encoding)
+    headers = {
+        "Content-Disposition": f'attachment; filename="properties.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
     
-    # Admin can see hidden properties
-    if current_user and current_user.role == 'admin':
-        filters.show_hidden = True
+    return StreamingResponse(
+        export_service.stream_export(format, public=not is_admin, gzip=gzip),
+        media_type=export_service.EXPORT_FORMATS[format],
+        headers=headers
+    )
+
+@api_router.post("/properties/export/snapshot", status_code=202)
+async def create_export_snapshot_endpoint(
+    background_tasks: BackgroundTasks,
+    current_user: models.User = Depends(get_admin_user)
+):
+    """Write a Parquet snapshot of the catalog in the background (admin only)"""
+    import export_service
+    if not export_service.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet snapshots require pyarrow")
+    background_tasks.add_task(export_service.write_parquet_snapshot, EXPORT_DIR)
+    await get_audit_log().record(current_user, 'export.snapshot')
+    return {"message": "Snapshot scheduled"}
+
+@api_router.get("/properties/export/snapshot")
+async def download_export_snapshot_endpoint(
+    current_user: models.User = Depends(get_admin_user)
+):
+    """Download the latest Parquet snapshot (admin only)"""
+    import export_service
+    snapshot_path = EXPORT_DIR / export_service.SNAPSHOT_FILENAME
+    if not snapshot_path.exists():
+        raise HTTPException(status_code=404, detail="No snapshot available")
+    return FileResponse(
+        path=snapshot_path,
+        filename=export_service.SNAPSHOT_FILENAME,
+        media_type='application/vnd.apache.parquet'
+    )
+
+@api_router.post("/properties/batch", response_model=schemas.PropertyBatchResponse, response_model_exclude_unset=True)
+async def batch_get_properties_endpoint(
+    batch: schemas.PropertyBatchRequest,
+    current_user: Optional[models.User] = Depends(get_optional_user),
+    db: Session = Depends(get_db)
+):
+    """Get up to 100 properties by ID in request order, listing IDs not found (or hidden)"""
+    is_admin = bool(current_user and current_user.role == 'admin')
+    property_ids = list(dict.fromkeys(batch.property_ids))
+    properties = property_service.get_properties_by_ids(db, property_ids, show_hidden=is_admin)
+    tags = property_service.get_tags_by_property(db, [p.property_id for p in properties])
     
-    properties = property_service.search_properties(db, filters)
-    return [property_service.property_to_schema(p) for p in properties]
+    found = {p.property_id for p in properties}
+    response = schemas.PropertyBatchResponse(
+        properties=[
+            property_service.property_to_schema(p, public=not is_admin, tags=tags[p.property_id])
+            for p in properties
+        ],
+        missing=[property_id for property_id in property_ids if property_id not in found]
+    )
+    return Response(content=response.model_dump_json(exclude_unset=True), media_type="application/json")
 
-@api_router.get("/properties/{property_id}", response_model=schemas.Property)
+@api_router.get("/properties/{property_id}", response_model=schemas.Property, response_model_exclude_unset=True)
 async def get_property_endpoint(
     property_id: str,
+    if_none_match: Optional[str] = Header(None),
+    current_user: Optional[models.User] = Depends(get_optional_user),
     db: Session = Depends(get_db)
 ):
-    """Get single property"""
-    db_property = property_service.get_property(db, property_id)
-    if not db_property:
+    """Get single property (supports If-None-Match revalidation)"""
+    from property_cache import property_cache, PUBLIC_CACHE_CONTROL, ADMIN_CACHE_CONTROL
+    version = property_cache.version(db, property_id)
+    if not version:
         raise HTTPException(status_code=404, detail="Property not found")
-    return property_service.property_to_schema(db_property)
+    
+    public = not (current_user and current_user.role == 'admin')
+    _, is_hidden, _ = version
+    if is_hidden and public:
+        # Decided before the ETag or cache are touched, so nothing about the listing leaks
+        raise HTTPException(status_code=404, detail="Property not found")
+    
+    etag = property_cache.etag(property_id, version, public)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": PUBLIC_CACHE_CONTROL if public else ADMIN_CACHE_CONTROL,
+        "Vary": "Cookie",
+    }
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+        return Response(status_code=304, headers=headers)
+    
+    body = property_cache.body(db, property_id, version, public)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Property not found")
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@api_router.get("/properties/{property_id}/similar", response_model=List[schemas.Property], response_model_exclude_unset=True)
+async def similar_properties_endpoint(
+    property_id: str,
+    limit: int = 6,
+    current_user: Optional[models.User] = Depends(get_optional_user),
+    db: Session = Depends(get_db)
+):
+    """Get precomputed similar properties, most similar first"""
+    import similarity_service
+    is_admin = bool(current_user and current_user.role == 'admin')
+    source = property_service.get_property(db, property_id)
+    if source is None or (source.is_hidden and not is_admin):
+        raise HTTPException(status_code=404, detail="Property not found")
+    
+    neighbours = similarity_service.get_similarity_index().similar(property_id)
+    if neighbours is None:
+        raise HTTPException(status_code=404, detail="Property not found")
+    
+    limit = max(0, min(limit, similarity_service.NEIGHBOURS))
+    properties = property_service.get_properties_by_ids(db, [pid for pid, _ in neighbours], show_hidden=is_admin)
+    return serialization.property_list_response(
+        property_service.property_to_schema(p, public=not is_admin) for p in properties[:limit]
+    )
 
 @api_router.patch("/properties/{property_id}", response_model=schemas.Property)
 async def update_property_endpoint(
@@ -394,7 +753,12 @@ async def update_property_endpoint(
     db: Session = Depends(get_db)
 ):
     """Update property"""
-    db_property = property_service.update_property(db, property_id, property_data)
+    db_property = await coalesced_write(db, WriteOp('updated', partial(
+        property_service.apply_update_property, property_id=property_id, property_data=property_data
+    ), property_id))
+    if current_user.role == 'admin':
+        await get_audit_log().record(current_user, 'property.update', property_id,
+                                     fields=sorted(property_data.model_dump(exclude_unset=True)))
     return property_service.property_to_schema(db_property)
 
 @api_router.patch("/properties/{property_id}/toggle-visibility")
@@ -404,7 +768,10 @@ async def toggle_property_visibility_endpoint(
     db: Session = Depends(get_db)
 ):
     """Toggle property visibility (admin only)"""
-    db_property = property_service.toggle_property_visibility(db, property_id)
+    db_property = await coalesced_write(db, WriteOp('updated', partial(
+        property_service.apply_toggle_visibility, property_id=property_id
+    ), property_id))
+    await get_audit_log().record(current_user, 'property.toggle_visibility', property_id, is_hidden=db_property.is_hidden)
     return property_service.property_to_schema(db_property)
 
 @api_router.patch("/properties/{property_id}/field-visibility")
@@ -415,15 +782,11 @@ async def update_field_visibility_endpoint(
     db: Session = Depends(get_db)
 ):
     """Update field visibility settings (admin only)"""
-    db_property = property_service.get_property(db, property_id)
-    if not db_property:
-        raise HTTPException(status_code=404, detail="Property not found")
-    
-    import json
-    db_property.field_visibility = json.dumps(visibility_data.field_visibility)
-    db.commit()
-    db.refresh(db_property)
-    
+    db_property = await coalesced_write(db, WriteOp('updated', partial(
+        property_service.apply_field_visibility, property_id=property_id, visibility=visibility_data.field_visibility
+    ), property_id))
+    await get_audit_log().record(current_user, 'property.field_visibility', property_id,
+                                 field_visibility=visibility_data.field_visibility)
     return property_service.property_to_schema(db_property)
 
 @api_router.delete("/properties/{property_id}")
@@ -434,17 +797,240 @@ async def delete_property_endpoint(
 ):
     """Delete property (admin only)"""
     if property_service.delete_property(db, property_id):
+        await get_audit_log().record(current_user, 'property.delete', property_id)
         return {"message": "Property deleted successfully"}
     raise HTTPException(status_code=404, detail="Property not found")
 
+@api_router.get("/autocomplete")
+async def autocomplete_endpoint(
+    q: str = '',
+    field: Optional[str] = None,
+    limit: int = 8
+):
+    """Complete a location, developer, name or tag prefix, ranked by listing count"""
+    import autocomplete_service
+    if field is not None and field not in autocomplete_service.FIELDS:
+        raise HTTPException(status_code=400, detail=f"field must be one of: {', '.join(autocomplete_service.FIELDS)}")
+    limit = max(1, min(limit, autocomplete_service.MAX_LIMIT))
+    return autocomplete_service.get_autocomplete_index().complete(q, field, limit)
+
+# ==================== SAVED SEARCH ENDPOINTS ====================
+
+@api_router.get("/saved-searches", response_model=List[schemas.SavedSearch], response_model_exclude_unset=True)
+async def list_saved_searches_endpoint(
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """List the current user's saved searches"""
+    import saved_search_service
+    return saved_search_service.list_saved_searches(db, current_user.user_id)
+
+@api_router.post("/saved-searches", response_model=schemas.SavedSearch, response_model_exclude_unset=True)
+async def create_saved_search_endpoint(
+    search_data: schemas.SavedSearchCreate,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Save search filters; new or updated listings that match them are queued as alerts"""
+    import saved_search_service
+    return saved_search_service.create_saved_search(db, current_user.user_id, search_data)
+
+@api_router.get("/saved-searches/matches", response_model=List[schemas.SavedSearchMatch], response_model_exclude_unset=True)
+async def saved_search_matches_endpoint(
+    limit: int = 50,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Take the queued listing alerts for the current user's saved searches, oldest first"""
+    import saved_search_service
+    return saved_search_service.take_matches(db, current_user.user_id, limit, public=current_user.role != 'admin')
+
+@api_router.delete("/saved-searches/{search_id}")
+async def delete_saved_search_endpoint(
+    search_id: str,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Delete one of the current user's saved searches"""
+    import saved_search_service
+    if saved_search_service.delete_saved_search(db, current_user.user_id, search_id):
+        return {"message": "Saved search deleted successfully"}
+    raise HTTPException(status_code=404, detail="Saved search not found")
+
+# ==================== ANALYTICS ENDPOINTS ====================
+
+@api_router.get("/dashboard/summary")
+async def dashboard_summary_endpoint(
+    days: int = 30,
+    top_locations: int = 10,
+    current_user: models.User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Property and user counts, daily listings and top locations in one call (admin only)"""
+    import summary_service
+    days = max(1, min(days, 365))
+    top_locations = max(1, min(top_locations, 50))
+    return summary_service.get_summary(db, days, top_locations)
+
+@api_router.get("/analytics/market")
+async def market_analytics_endpoint(
+    group_by: str = 'location',
+    include_hidden: bool = True,
+    current_user: models.User = Depends(get_admin_user)
+):
+    """Price per sqft and budget distributions plus inventory counts per group (admin only)"""
+    import analytics_service
+    if group_by not in analytics_service.GROUP_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(analytics_service.GROUP_COLUMNS)}")
+    
+    frame = analytics_service.get_catalog_frame().frame()
+    return {
+        "group_by": group_by,
+        "groups": analytics_service.market_stats(frame, group_by, include_hidden)
+    }
+
+# ==================== SEARCH INSIGHT ENDPOINTS ====================
+
+@api_router.get("/admin/search/top-queries")
+async def top_search_queries_endpoint(
+    request: Request,
+    limit: int = 20,
+    current_user: models.User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Most searched normalized filters with latency, result counts and cache state (admin only)"""
+    import search_cache
+    limit = max(1, min(limit, search_cache.MAX_TOP_QUERIES))
+    search_cache.get_query_log().flush()
+    snapshot = request.app.state.catalog_snapshot.current() if request.app.state.catalog_snapshot else None
+    return {
+        "sample_rate": search_cache.get_query_log().sample_rate,
+        "window_days": search_cache.TOP_WINDOW_DAYS,
+        "queries": search_cache.top_queries_view(db, limit, snapshot),
+    }
+
+# ==================== DUPLICATE REVIEW ENDPOINTS ====================
+
+@api_router.get("/admin/duplicates", response_model=List[schemas.DuplicateCluster])
+async def duplicate_clusters_endpoint(
+    scan: bool = False,
+    limit: int = 50,
+    current_user: models.User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Groups of suspected duplicate listings, largest first (admin only).
+
+    Built from open flags, or with scan=true from a comparison of the whole catalog.
+    """
+    import duplicate_service
+    limit = max(1, min(limit, duplicate_service.MAX_CLUSTERS))
+    return duplicate_service.list_clusters(db, scan, limit)
+
+@api_router.post("/admin/duplicates/{flag_id}/dismiss")
+async def dismiss_duplicate_endpoint(
+    flag_id: str,
+    current_user: models.User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Mark a flagged pair as not duplicates (admin only)"""
+    import duplicate_service
+    if not duplicate_service.dismiss_flag(db, flag_id):
+        raise HTTPException(status_code=404, detail="Duplicate flag not found")
+    await get_audit_log().record(current_user, 'duplicate.dismiss', flag_id)
+    return {"message": "Duplicate flag dismissed"}
+
+# ==================== AUDIT ENDPOINTS ====================
+
+@api_router.get("/admin/audit", response_model=schemas.AuditPage)
+async def audit_events_endpoint(
+    actor_id: Optional[str] = None,
+    action: Optional[str] = None,
+    target_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    current_user: models.User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Admin actions a page at a time, newest first (admin only)"""
+    import audit_service
+    # Include actions still waiting in the queue
+    await get_audit_log().flush()
+    limit = max(1, min(limit, audit_service.MAX_AUDIT_PAGE))
+    return audit_service.list_events(db, actor_id, action, target_id, since, until, cursor, limit)
+
+# ==================== MEMORY PROFILING ENDPOINTS ====================
+
+@api_router.get("/admin/memory")
+async def memory_status_endpoint(current_user: models.User = Depends(get_admin_user)):
+    """Process memory, peak memory per profiled endpoint and in-process cache sizes (admin only)"""
+    import memory_profiling
+    return memory_profiling.profiler.status()
+
+@api_router.post("/admin/memory/profile")
+async def memory_profile_endpoint(
+    profile: schemas.MemoryProfileRequest,
+    request: Request,
+    current_user: models.User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Replay one API request under tracemalloc as the calling admin (admin only).
+
+    Reports its peak and retained memory with the top allocation sites for each; the
+    response body itself is only measured.
+    """
+    import json
+    import memory_profiling
+    if not profile.path.startswith('/api/') or profile.path.startswith(memory_profiling.PROFILING_PATH):
+        raise HTTPException(status_code=400, detail="path must be an /api/ endpoint other than memory profiling")
+    if profile.group_by not in ('lineno', 'filename', 'traceback'):
+        raise HTTPException(status_code=400, detail="group_by must be one of: lineno, filename, traceback")
+    if memory_profiling.profiler.busy:
+        raise HTTPException(status_code=409, detail="A memory profile is already running")
+    
+    # Don't hold a pooled connection while the replayed request needs one
+    db.close()
+    headers = [(b'cookie', request.headers.get('cookie', '').encode())]
+    body = json.dumps(profile.body).encode() if profile.body is not None else b''
+    return await memory_profiling.replay(
+        request.app, profile.method, profile.path, (profile.query or '').encode(), body,
+        headers, profile.top, profile.group_by
+    )
+
 # ==================== FILE DOWNLOAD ENDPOINTS ====================
 
+@api_router.post("/uploads/presign")
+async def presign_upload_endpoint(
+    upload: schemas.PresignUploadRequest,
+    current_user: models.User = Depends(get_current_user),
+    file_storage: storage.StorageBackend = Depends(get_storage)
+):
+    """Start a direct multipart upload; PUT each part to its URL, then call /uploads/complete"""
+    return file_storage.create_multipart_upload(new_storage_key(upload.filename), upload.size, upload.content_type)
+
+@api_router.post("/uploads/complete")
+async def complete_upload_endpoint(
+    upload: schemas.CompleteUploadRequest,
+    current_user: models.User = Depends(get_current_user),
+    file_storage: storage.StorageBackend = Depends(get_storage)
+):
+    """Finish a direct multipart upload; the key can then be passed when creating a property"""
+    file_storage.complete_multipart_upload(upload.key, upload.upload_id, [part.model_dump() for part in upload.parts])
+    return {"key": upload.key}
+
 @api_router.get("/files/{filename}")
-async def download_file(filename: str):
+async def download_file(
+    filename: str,
+    file_storage: storage.StorageBackend = Depends(get_storage)
+):
     """Download uploaded files (video/floor plan)"""
-    file_path = UPLOAD_DIR / filename
+    presigned_url = file_storage.presign_get(filename, filename)
+    if presigned_url:
+        return RedirectResponse(presigned_url, status_code=307)
     
-    if not file_path.exists():
+    file_path = file_storage.path(filename)
+    if file_path is None or not file_path.is_file():
         raise HTTPException(status_code=404, detail="File not found")
     
     return FileResponse(
@@ -463,5 +1049,51 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
-# Include the router in the main app
-app.include_router(api_router)
+def create_app(init_db_on_startup: Optional[bool] = None) -> FastAPI:
+    """Build the API app.
+
+    Schema creation and migrations run on startup unless disabled here or with
+    INIT_DB_ON_STARTUP=false (e.g. when a separate deploy step runs init_db()).
+    Admission control is on unless ADMISSION_CONTROL=false; budgets per route class
+    are tuned with ADMISSION_SEARCH / ADMISSION_WRITE / ADMISSION_DOWNLOAD / ADMISSION_STREAM.
+    Tracing is off unless TRACE_SAMPLE_RATE is set (TRACE_FILE adds OTLP JSON export).
+    MEMORY_PROFILE_SAMPLE_RATE profiles that fraction of requests under tracemalloc.
+    SEARCH_LOG_SAMPLE_RATE and SEARCH_PREWARM_TOP tune the search query log and prewarming.
+    """
+    if init_db_on_startup is None:
+        init_db_on_startup = os.getenv('INIT_DB_ON_STARTUP', 'true').lower() in ('1', 'true', 'yes')
+    
+    app = FastAPI(title="MAK Kotwal Venus API", lifespan=lifespan)
+    app.state.init_db_on_startup = init_db_on_startup
+    
+    # Rate limits and load shedding (added first so CORS headers wrap its rejections)
+    if os.getenv('ADMISSION_CONTROL', 'true').lower() in ('1', 'true', 'yes'):
+        from admission_control import AdmissionControlMiddleware
+        app.add_middleware(AdmissionControlMiddleware)
+    
+    # Sampled per-endpoint memory peaks, reported by /api/admin/memory
+    import memory_profiling
+    memory_sample_rate = memory_profiling.sample_rate_from_env()
+    if memory_sample_rate > 0:
+        app.add_middleware(memory_profiling.MemoryProfilingMiddleware, sample_rate=memory_sample_rate)
+    
+    # CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    
+    # Sampled span tracing with Server-Timing headers. Added last, so it is the outermost
+    # middleware and times everything, CORS preflights included.
+    trace_options = tracing.middleware_options_from_env()
+    if trace_options:
+        app.add_middleware(tracing.TracingMiddleware, **trace_options)
+    
+    # Include the router in the main app
+    app.include_router(api_router)
+    return app
+
+app = create_app()
@@ -0,0 +1,335 @@
+from fastapi import HTTPException
+from sqlalchemy import select
+from collections import defaultdict
+from typing import Optional, List, Tuple
+import logging
+import math
+import re
+import threading
+import time
+import numpy as np
+import memory_profiling
+import models
+import property_service
+
+logger = logging.getLogger(__name__)
+
+# Neighbours kept per property; the endpoint returns a prefix after dropping hidden ones
+NEIGHBOURS = 20
+
+# Score = weighted blend of numeric closeness, tag Jaccard and exact location match
+NUMERIC_WEIGHT = 0.6
+TAG_WEIGHT = 0.25
+LOCATION_WEIGHT = 0.15
+
+NUMERIC_FEATURES = ('budget', 'price_per_sqft', 'carpet_area', 'configurations')
+
+BUILD_BLOCK = 256
+
+_bedrooms_re = re.compile(r'(\d+(?:\.\d+)?)')
+
+def _raw_features(db_property) -> List[float]:
+    """budget (log scale), price_per_sqft, carpet_area and bedroom count, NaN when unknown"""
+    budget = db_property.budget
+    bedrooms = _bedrooms_re.search(db_property.configurations or '')
+    return [
+        math.log1p(budget) if budget and budget > 0 else math.nan,
+        db_property.price_per_sqft if db_property.price_per_sqft is not None else math.nan,
+        db_property.carpet_area if db_property.carpet_area is not None else math.nan,
+        float(bedrooms.group(1)) if bedrooms else math.nan,
+    ]
+
+class _NeighbourTable:
+    """Precomputed nearest neighbours over the whole catalog.
+
+    Built once with blocked, vectorized scoring of every property against every other,
+    then kept current from property writes: a changed property is scored against the
+    catalog once (scores are symmetric), which both gives its own neighbour list and
+    tells which other lists it should enter or leave. Normalization statistics are
+    frozen at build time. Not thread-safe; SimilarityIndex serializes access.
+    """
+
+    def __init__(self):
+        self.neighbours = {}
+        # Reverse lists (who lists a property) and each row's weakest neighbour score
+        self._listed_by = defaultdict(set)
+        self._kth = np.zeros(0)
+        self._ids: List[str] = []
+        self._row = {}
+
+    @classmethod
+    def build(cls, session_factory) -> '_NeighbourTable':
+        table = cls()
+        table._load(session_factory)
+        table._build()
+        return table
+
+    def memory_stats(self) -> dict:
+        arrays = ('_features', '_tags', '_tag_counts', '_location_codes', '_kth')
+        return {
+            'entries': len(self.neighbours),
+            'neighbours': sum(len(neighbours) for neighbours in self.neighbours.values()),
+            'array_bytes': sum(getattr(self, name).nbytes for name in arrays if hasattr(self, name)),
+        }
+
+    # ---- feature storage ----
+
+    def _load(self, session_factory):
+        db = session_factory()
+        try:
+            rows = db.execute(select(
+                models.Property.property_id, models.Property.budget, models.Property.price_per_sqft,
+                models.Property.carpet_area, models.Property.configurations, models.Property.location
+            )).all()
+            tags = defaultdict(set)
+            for property_id, tag_name in db.execute(select(models.PropertyTag.property_id, models.PropertyTag.tag_name)):
+                tags[property_id].add(tag_name)
+        finally:
+            db.close()
+
+        self._ids = [row.property_id for row in rows]
+        self._row = {property_id: i for i, property_id in enumerate(self._ids)}
+        raw = np.array([_raw_features(row) for row in rows], dtype=np.float64).reshape(len(rows), len(NUMERIC_FEATURES))
+        self._mean = np.nan_to_num(np.nanmean(raw, axis=0)) if len(rows) else np.zeros(len(NUMERIC_FEATURES))
+        std = np.nanstd(raw, axis=0) if len(rows) else np.ones(len(NUMERIC_FEATURES))
+        self._std = np.where(np.isfinite(std) & (std > 0), std, 1.0)
+        self._features = self._normalize(raw)
+
+        self._locations = {}
+        self._location_codes = np.array([self._location_code(row.location) for row in rows], dtype=np.int64)
+        self._tag_columns = {}
+        for tag_names in tags.values():
+            for tag_name in tag_names:
+                self._tag_columns.setdefault(tag_name, len(self._tag_columns))
+        self._tags = np.zeros((len(rows), len(self._tag_columns)), dtype=np.float32)
+        for property_id, tag_names in tags.items():
+            if property_id in self._row:
+                self._tags[self._row[property_id], [self._tag_columns[t] for t in tag_names]] = 1.0
+        self._tag_counts = self._tags.sum(axis=1)
+
+    def _normalize(self, raw: np.ndarray) -> np.ndarray:
+        # Unknown values sit at the mean so they neither attract nor repel
+        return np.nan_to_num((raw - self._mean) / self._std)
+
+    def _location_code(self, location: Optional[str]) -> int:
+        if not location:
+            return -1
+        return self._locations.setdefault(location.strip().lower(), len(self._locations))
+
+    def _tag_vector(self, tag_names) -> np.ndarray:
+        new = [t for t in tag_names if t not in self._tag_columns]
+        for tag_name in new:
+            self._tag_columns[tag_name] = len(self._tag_columns)
+        if new:
+            self._tags = np.hstack([self._tags, np.zeros((len(self._ids), len(new)), dtype=np.float32)])
+        vector = np.zeros(len(self._tag_columns), dtype=np.float32)
+        vector[[self._tag_columns[t] for t in tag_names]] = 1.0
+        return vector
+
+    # ---- scoring ----
+
+    def _scores(self, features: np.ndarray, tags: np.ndarray, locations: np.ndarray) -> np.ndarray:
+        """Scores of a block of properties (rows) against the whole catalog (columns)"""
+        sq_dist = (
+            (features ** 2).sum(axis=1)[:, None]
+            + (self._features ** 2).sum(axis=1)[None, :]
+            - 2.0 * features @ self._features.T
+        )
+        numeric = 1.0 / (1.0 + np.sqrt(np.maximum(sq_dist, 0.0)))
+
+        intersection = tags @ self._tags.T
+        union = tags.sum(axis=1)[:, None] + self._tag_counts[None, :] - intersection
+        jaccard = np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+        same_location = (locations[:, None] == self._location_codes[None, :]) & (locations[:, None] >= 0)
+        return NUMERIC_WEIGHT * numeric + TAG_WEIGHT * jaccard + LOCATION_WEIGHT * same_location
+
+    def _top(self, scores: np.ndarray, exclude: int) -> List[Tuple[str, float]]:
+        scores = scores.copy()
+        scores[exclude] = -np.inf
+        k = min(NEIGHBOURS, len(scores) - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self._ids[i], float(scores[i])) for i in top]
+
+    def _set_neighbours(self, row: int, neighbours: List[Tuple[str, float]]):
+        property_id = self._ids[row]
+        for old, _ in self.neighbours.get(property_id, ()):
+            self._listed_by[old].discard(property_id)
+        for new, _ in neighbours:
+            self._listed_by[new].add(property_id)
+        self.neighbours[property_id] = neighbours
+        self._kth[row] = neighbours[-1][1] if len(neighbours) >= NEIGHBOURS else -np.inf
+
+    def _row_scores(self, row: int) -> np.ndarray:
+        return self._scores(self._features[row:row + 1], self._tags[row:row + 1], self._location_codes[row:row + 1])[0]
+
+    def _build(self):
+        self.neighbours = {}
+        self._listed_by = defaultdict(set)
+        self._kth = np.full(len(self._ids), -np.inf)
+        for start in range(0, len(self._ids), BUILD_BLOCK):
+            stop = min(start + BUILD_BLOCK, len(self._ids))
+            block = self._scores(self._features[start:stop], self._tags[start:stop], self._location_codes[start:stop])
+            for offset, scores in enumerate(block):
+                self._set_neighbours(start + offset, self._top(scores, start + offset))
+
+    # ---- incremental maintenance ----
+
+    def apply(self, property_id: str, values: Optional[tuple]):
+        """Refresh the lists affected by one property's (raw features, tag names, location), None once deleted"""
+        if values is None:
+            self._remove(property_id)
+        else:
+            self._upsert(property_id, *values)
+
+    def _remove(self, property_id: str):
+        row = self._row.get(property_id)
+        if row is None:
+            return
+        for old, _ in self.neighbours.pop(property_id, ()):
+            self._listed_by[old].discard(property_id)
+        affected = self._listed_by.pop(property_id, set())
+
+        keep = np.ones(len(self._ids), dtype=bool)
+        keep[row] = False
+        self._features = self._features[keep]
+        self._tags = self._tags[keep]
+        self._tag_counts = self._tag_counts[keep]
+        self._location_codes = self._location_codes[keep]
+        self._kth = self._kth[keep]
+        del self._ids[row]
+        self._row = {pid: i for i, pid in enumerate(self._ids)}
+
+        for other in affected:
+            other_row = self._row[other]
+            self._set_neighbours(other_row, self._top(self._row_scores(other_row), other_row))
+
+    def _upsert(self, property_id: str, raw: List[float], tag_names: set, location: Optional[str]):
+        features = self._normalize(np.array([raw], dtype=np.float64))
+        tags = self._tag_vector(tag_names)
+        location = self._location_code(location)
+
+        row = self._row.get(property_id)
+        if row is None:
+            row = len(self._ids)
+            self._ids.append(property_id)
+            self._row[property_id] = row
+            self._features = np.vstack([self._features, features])
+            self._tags = np.vstack([self._tags, tags[None, :]])
+            self._tag_counts = np.append(self._tag_counts, tags.sum())
+            self._location_codes = np.append(self._location_codes, location)
+            self._kth = np.append(self._kth, -np.inf)
+        else:
+            self._features[row] = features[0]
+            self._tags[row] = tags
+            self._tag_counts[row] = tags.sum()
+            self._location_codes[row] = location
+
+        scores = self._row_scores(row)
+        self._set_neighbours(row, self._top(scores, row))
+
+        # Lists that held this property may need to drop it now; recompute those from scratch
+        previously_listed = {self._row[other] for other in self._listed_by.get(property_id, ())}
+        for other_row in previously_listed:
+            self._set_neighbours(other_row, self._top(self._row_scores(other_row), other_row))
+
+        # Everyone else only needs it if it now beats their weakest neighbour
+        candidates = scores > self._kth
+        candidates[row] = False
+        for other_row in np.flatnonzero(candidates):
+            if other_row in previously_listed:
+                continue
+            merged = self.neighbours[self._ids[other_row]] + [(property_id, float(scores[other_row]))]
+            merged.sort(key=lambda n: -n[1])
+            self._set_neighbours(other_row, merged[:NEIGHBOURS])
+
+class SimilarityIndex:
+    """Similar listings, served from a _NeighbourTable that is rebuilt in the background.
+
+    The full build scores every pair of properties, so it never runs on a request:
+    start() builds the first table on a background thread (lookups answer 503 until it
+    is ready), and a lookup on a table older than MAX_AGE schedules a rebuild, which
+    picks up other workers' writes, while the current table keeps serving. Local writes
+    update the current table, and those arriving during a rebuild are replayed onto the
+    new table before it is swapped in.
+    """
+
+    MAX_AGE = 3600.0
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._table: Optional[_NeighbourTable] = None
+        self._lock = threading.Lock()
+        self._built_at = 0.0
+        self._rebuilding = False
+        self._pending = []
+
+    def memory_stats(self) -> dict:
+        table = self._table
+        return table.memory_stats() if table is not None else {'entries': 0}
+
+    def start(self):
+        """Listen for property writes and build the first table in the background"""
+        self._schedule_rebuild()
+
+    def stop(self):
+        property_service.remove_change_listener(self.on_change)
+
+    def _schedule_rebuild(self):
+        property_service.add_change_listener(self.on_change)
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+            self._pending = []
+        threading.Thread(target=self._rebuild, name='similarity-rebuild', daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            table = _NeighbourTable.build(self.session_factory)
+        except Exception:
+            logger.exception("Similarity index rebuild failed")
+            with self._lock:
+                self._rebuilding = False
+            return
+        with self._lock:
+            for property_id, values in self._pending:
+                table.apply(property_id, values)
+            self._table = table
+            self._built_at = time.monotonic()
+            self._rebuilding = False
+            self._pending = []
+
+    def on_change(self, event: str, property_id: str, db_property: Optional[models.Property]):
+        """Property change listener: refresh the affected neighbour lists"""
+        values = None
+        if db_property is not None:
+            values = (_raw_features(db_property), {tag.tag_name for tag in db_property.tags}, db_property.location)
+        with self._lock:
+            if self._table is not None:
+                self._table.apply(property_id, values)
+            if self._rebuilding:
+                self._pending.append((property_id, values))
+
+    def similar(self, property_id: str) -> Optional[List[Tuple[str, float]]]:
+        """Neighbours of property_id, or None if it isn't in the catalog"""
+        if self._table is None or time.monotonic() - self._built_at > self.MAX_AGE:
+            self._schedule_rebuild()
+        with self._lock:
+            if self._table is None:
+                raise HTTPException(status_code=503, detail="Similar listings are being computed",
+                                    headers={"Retry-After": "5"})
+            return self._table.neighbours.get(property_id)
+
+_similarity_index: Optional[SimilarityIndex] = None
+
+def get_similarity_index() -> SimilarityIndex:
+    global _similarity_index
+    if _similarity_index is None:
+        from database import SessionLocal
+        _similarity_index = SimilarityIndex(SessionLocal)
+        memory_profiling.register_cache('similarity', _similarity_index.memory_stats)
+    return _similarity_index
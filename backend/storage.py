@@ -0,0 +1,158 @@
+from abc import ABC, abstractmethod
+from fastapi import HTTPException
+from pathlib import Path
+from typing import Optional, List, BinaryIO
+import math
+import os
+import shutil
+
+# Multipart part size for direct uploads; S3 requires >= 5 MiB for all but the last part
+PART_SIZE = 16 * 1024 * 1024
+MAX_PARTS = 10000
+
+# Lifetime of presigned URLs in seconds
+PRESIGN_EXPIRES = 3600
+
+class StorageBackend(ABC):
+    """Where uploaded videos and floor plans live.
+
+    save/exists are required. Downloads are served either from a presigned URL
+    (presign_get) or from a file on disk (path); a backend provides at least one. Backends
+    that can hand out presigned URLs also support direct multipart uploads; the others
+    leave those to the API.
+    """
+
+    supports_direct_upload = False
+
+    def prepare(self):
+        pass
+
+    @abstractmethod
+    def save(self, key: str, fileobj: BinaryIO, content_type: Optional[str] = None):
+        ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    def presign_get(self, key: str, filename: Optional[str] = None) -> Optional[str]:
+        return None
+
+    def path(self, key: str) -> Optional[Path]:
+        """Local file holding key, for backends that keep files on disk"""
+        return None
+
+    def create_multipart_upload(self, key: str, size: int, content_type: Optional[str] = None) -> dict:
+        raise HTTPException(status_code=501, detail="Direct uploads are not supported by this storage backend")
+
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: List[dict]):
+        raise HTTPException(status_code=501, detail="Direct uploads are not supported by this storage backend")
+
+class LocalStorage(StorageBackend):
+    """Files in a local directory, served through /api/files"""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def prepare(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Optional[Path]:
+        # Keys are flat file names; anything that could escape root is treated as missing
+        if not key or Path(key).name != key or key.startswith('.'):
+            return None
+        return self.root / key
+
+    def save(self, key: str, fileobj: BinaryIO, content_type: Optional[str] = None):
+        path = self.path(key)
+        if path is None:
+            raise HTTPException(status_code=400, detail="Invalid file name")
+        with open(path, "wb") as buffer:
+            shutil.copyfileobj(fileobj, buffer)
+
+    def exists(self, key: str) -> bool:
+        path = self.path(key)
+        return path is not None and path.is_file()
+
+class S3Storage(StorageBackend):
+    """Objects in an S3-compatible bucket (AWS, MinIO, or a local stand-in via S3_ENDPOINT_URL)"""
+
+    supports_direct_upload = True
+
+    def __init__(self, bucket: str, prefix: str = '', endpoint_url: Optional[str] = None, region: Optional[str] = None):
+        import boto3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def save(self, key: str, fileobj: BinaryIO, content_type: Optional[str] = None):
+        extra = {'ContentType': content_type} if content_type else None
+        self.client.upload_fileobj(fileobj, self.bucket, self._object_key(key), ExtraArgs=extra)
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+            return True
+        except ClientError:
+            return False
+
+    def presign_get(self, key: str, filename: Optional[str] = None) -> Optional[str]:
+        params = {'Bucket': self.bucket, 'Key': self._object_key(key)}
+        if filename:
+            params['ResponseContentDisposition'] = f'attachment; filename="{filename}"'
+        return self.client.generate_presigned_url('get_object', Params=params, ExpiresIn=PRESIGN_EXPIRES)
+
+    def create_multipart_upload(self, key: str, size: int, content_type: Optional[str] = None) -> dict:
+        part_count = max(1, math.ceil(size / PART_SIZE))
+        if part_count > MAX_PARTS:
+            raise HTTPException(status_code=400, detail="File too large")
+
+        params = {'Bucket': self.bucket, 'Key': self._object_key(key)}
+        if content_type:
+            params['ContentType'] = content_type
+        upload_id = self.client.create_multipart_upload(**params)['UploadId']
+        part_urls = [
+            self.client.generate_presigned_url(
+                'upload_part',
+                Params={'Bucket': self.bucket, 'Key': self._object_key(key), 'UploadId': upload_id, 'PartNumber': number},
+                ExpiresIn=PRESIGN_EXPIRES
+            )
+            for number in range(1, part_count + 1)
+        ]
+        return {"key": key, "upload_id": upload_id, "part_size": PART_SIZE, "part_urls": part_urls}
+
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: List[dict]):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self._object_key(key),
+                UploadId=upload_id,
+                MultipartUpload={'Parts': [
+                    {'PartNumber': part['part_number'], 'ETag': part['etag']}
+                    for part in sorted(parts, key=lambda part: part['part_number'])
+                ]}
+            )
+        except ClientError as e:
+            # Unknown or already finished uploads, and missing, reordered or undersized parts
+            error = e.response.get('Error', {})
+            status_code = 404 if error.get('Code') == 'NoSuchUpload' else 400
+            raise HTTPException(status_code=status_code, detail=f"Could not complete upload: {error.get('Message') or error.get('Code')}")
+
+def storage_from_env(upload_dir: Path) -> StorageBackend:
+    """STORAGE_BACKEND=local (default, files under upload_dir) or s3 (S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL, S3_REGION)"""
+    backend = os.getenv('STORAGE_BACKEND', 'local').lower()
+    if backend == 's3':
+        return S3Storage(
+            bucket=os.environ['S3_BUCKET'],
+            prefix=os.getenv('S3_PREFIX', ''),
+            endpoint_url=os.getenv('S3_ENDPOINT_URL') or None,
+            region=os.getenv('S3_REGION') or None,
+        )
+    if backend != 'local':
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+    return LocalStorage(upload_dir)
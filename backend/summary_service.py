@@ -0,0 +1,66 @@
+from sqlalchemy import select, func, case
+from sqlalchemy.orm import Session
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import threading
+import time
+import memory_profiling
+import models
+import write_counter
+
+# Seconds a cached summary may be served regardless of local write counters
+MAX_AGE = 60.0
+
+_cache = {}
+_lock = threading.Lock()
+
+memory_profiling.register_cache('summary', lambda: {'entries': len(_cache)})
+
+def _compute(db: Session, days: int, top_locations: int) -> dict:
+    total, hidden = db.execute(select(
+        func.count(),
+        func.coalesce(func.sum(case((models.Property.is_hidden == True, 1), else_=0)), 0)
+    ).select_from(models.Property)).one()
+
+    roles = db.execute(
+        select(models.User.role, func.count()).group_by(models.User.role)
+    ).all()
+
+    # Users created before roles default to 'user', so NULL rows count as users too
+    users_by_role = defaultdict(int)
+    for role, count in roles:
+        users_by_role[role or 'user'] += count
+
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    day = func.date(models.Property.created_at)
+    per_day = db.execute(
+        select(day, func.count()).where(models.Property.created_at >= since).group_by(day).order_by(day)
+    ).all()
+
+    locations = db.execute(
+        select(models.Property.location, func.count().label('count'))
+        .where(models.Property.is_hidden == False)
+        .group_by(models.Property.location)
+        .order_by(func.count().desc(), models.Property.location)
+        .limit(top_locations)
+    ).all()
+
+    return {
+        "properties": {"total": total, "visible": total - hidden, "hidden": hidden},
+        "users_by_role": dict(users_by_role),
+        "listings_per_day": [{"date": str(d), "count": count} for d, count in per_day],
+        "top_locations": [{"location": location, "count": count} for location, count in locations],
+    }
+
+def get_summary(db: Session, days: int = 30, top_locations: int = 10) -> dict:
+    """Dashboard summary, cached until a property or user write or MAX_AGE seconds"""
+    key = (days, top_locations)
+    versions = (write_counter.version('properties'), write_counter.version('users'))
+    with _lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == versions and time.monotonic() - cached[1] < MAX_AGE:
+            return cached[2]
+    summary = _compute(db, days, top_locations)
+    with _lock:
+        _cache[key] = (versions, time.monotonic(), summary)
+    return summary
@@ -0,0 +1,283 @@
+from fastapi import HTTPException
+from sqlalchemy import select
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Optional, List, Tuple, Iterable
+import logging
+import math
+import re
+import threading
+import time
+import memory_profiling
+import models
+import property_service
+
+logger = logging.getLogger(__name__)
+
+# Term frequencies are weighted by the field they occur in, so a match in the name
+# outranks one buried in the description
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'tags': 2.0,
+    'location': 1.5,
+    'developer': 1.5,
+    'description': 1.0,
+}
+
+# BM25 term frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+# A query word also matches longer words starting with it, at this fraction of an exact match
+PREFIX_WEIGHT = 0.5
+
+# Shorter query words only match exactly; a single letter would expand to most of the vocabulary
+MIN_PREFIX_LENGTH = 2
+
+MAX_QUERY_TERMS = 10
+
+_word_re = re.compile(r'\w+')
+
+# Highest code point, so prefix + _PREFIX_END sorts after every term starting with prefix
+_PREFIX_END = '\U0010ffff'
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _word_re.findall(text.lower()) if text else []
+
+def query_terms(q: Optional[str]) -> List[str]:
+    """Distinct words of a free-text query, in order"""
+    return list(dict.fromkeys(tokenize(q)))[:MAX_QUERY_TERMS]
+
+def document_terms(name, description, location, developer, tags: Iterable[str]) -> dict:
+    """{term: field-weighted frequency} for one property"""
+    terms = defaultdict(float)
+    for field, text in (('name', name), ('description', description), ('location', location), ('developer', developer)):
+        for term in tokenize(text):
+            terms[term] += FIELD_WEIGHTS[field]
+    for tag in tags:
+        for term in tokenize(tag):
+            terms[term] += FIELD_WEIGHTS['tags']
+    return terms
+
+def matches_query(q: Optional[str], name, description, location, developer, tags: Iterable[str]) -> bool:
+    """Whether one property matches q the way TextSearchIndex.search does (every word, as a prefix)"""
+    words = query_terms(q)
+    if not words:
+        return True
+    terms = document_terms(name, description, location, developer, tags)
+    return all(
+        word in terms or (len(word) >= MIN_PREFIX_LENGTH and any(term.startswith(word) for term in terms))
+        for word in words
+    )
+
+class _InvertedIndex:
+    """Postings, document lengths and the sorted vocabulary for one build of the catalog.
+
+    Not thread-safe; TextSearchIndex serializes access.
+    """
+
+    def __init__(self):
+        # term -> {property_id: weighted frequency}, and the sorted terms for prefix lookups
+        self._postings = defaultdict(dict)
+        self._vocabulary: List[str] = []
+        self._documents = {}
+        self._lengths = {}
+        self._total_length = 0.0
+        self._hidden = set()
+
+    @classmethod
+    def build(cls, session_factory) -> '_InvertedIndex':
+        db = session_factory()
+        try:
+            rows = db.execute(select(
+                models.Property.property_id, models.Property.name, models.Property.description,
+                models.Property.location, models.Property.developer, models.Property.is_hidden
+            )).all()
+            tags = defaultdict(list)
+            for property_id, tag_name in db.execute(select(models.PropertyTag.property_id, models.PropertyTag.tag_name)):
+                tags[property_id].append(tag_name)
+        finally:
+            db.close()
+
+        index = cls()
+        for row in rows:
+            terms = document_terms(row.name, row.description, row.location, row.developer, tags[row.property_id])
+            index._add(row.property_id, terms, bool(row.is_hidden), sort=False)
+        # One sort instead of an insort per new term
+        index._vocabulary = sorted(index._postings)
+        return index
+
+    def memory_stats(self) -> dict:
+        return {
+            'entries': len(self._documents),
+            'terms': len(self._vocabulary),
+            'postings': sum(len(postings) for postings in self._postings.values()),
+        }
+
+    def _add(self, property_id: str, terms: dict, is_hidden: bool, sort: bool = True):
+        self._documents[property_id] = terms
+        length = sum(terms.values())
+        self._lengths[property_id] = length
+        self._total_length += length
+        if is_hidden:
+            self._hidden.add(property_id)
+        for term, frequency in terms.items():
+            postings = self._postings[term]
+            if not postings and sort:
+                insort(self._vocabulary, term)
+            postings[property_id] = frequency
+
+    def _remove(self, property_id: str):
+        terms = self._documents.pop(property_id, None)
+        if terms is None:
+            return
+        self._total_length -= self._lengths.pop(property_id)
+        self._hidden.discard(property_id)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[property_id]
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+
+    def apply(self, property_id: str, document: Optional[tuple]):
+        """Reindex one property from its (terms, is_hidden), None once deleted"""
+        self._remove(property_id)
+        if document is not None:
+            self._add(property_id, *document)
+
+    def _word_frequencies(self, word: str) -> dict:
+        """{property_id: frequency} for a query word: its exact term plus discounted prefix expansions"""
+        frequencies = dict(self._postings.get(word, ()))
+        if len(word) < MIN_PREFIX_LENGTH:
+            return frequencies
+        start = bisect_left(self._vocabulary, word)
+        stop = bisect_left(self._vocabulary, word + _PREFIX_END, start)
+        for term in self._vocabulary[start:stop]:
+            if term == word:
+                continue
+            for property_id, frequency in self._postings[term].items():
+                frequencies[property_id] = frequencies.get(property_id, 0.0) + PREFIX_WEIGHT * frequency
+        return frequencies
+
+    def search(self, words: List[str], show_hidden: bool) -> List[Tuple[str, float]]:
+        word_frequencies = sorted((self._word_frequencies(word) for word in words), key=len)
+        if not word_frequencies[0]:
+            return []
+        count = len(self._documents)
+        average_length = self._total_length / count
+
+        candidates = set(word_frequencies[0])
+        for frequencies in word_frequencies[1:]:
+            candidates.intersection_update(frequencies)
+        if not show_hidden:
+            candidates -= self._hidden
+
+        scores = dict.fromkeys(candidates, 0.0)
+        for frequencies in word_frequencies:
+            matched = len(frequencies)
+            idf = math.log(1 + (count - matched + 0.5) / (matched + 0.5))
+            for property_id in candidates:
+                frequency = frequencies[property_id]
+                norm = K1 * (1 - B + B * self._lengths[property_id] / average_length)
+                scores[property_id] += idf * frequency * (K1 + 1) / (frequency + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+class TextSearchIndex:
+    """In-process inverted index for the free-text q search parameter.
+
+    Covers name, description, location, developer and tags with per-field weights, and
+    ranks with BM25. Every query word must match, either exactly or as the prefix of a
+    longer word. Kept current from property writes. Hidden properties are indexed so
+    admins can find them.
+
+    start() builds the first index on a background thread; searches arriving before it
+    is ready answer 503 with Retry-After rather than wait for it. After that, a search on an index older than MAX_AGE schedules
+    a background rebuild, which picks up other workers' writes, and keeps using the
+    current index until the new one is swapped in. Writes arriving during a rebuild are
+    replayed onto the new index first.
+    """
+
+    MAX_AGE = 300.0
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._index: Optional[_InvertedIndex] = None
+        self._lock = threading.Lock()
+        self._built_at = 0.0
+        self._rebuilding = False
+        self._pending = []
+
+    def memory_stats(self) -> dict:
+        index = self._index
+        return index.memory_stats() if index is not None else {'entries': 0}
+
+    def start(self):
+        """Listen for property writes and build the first index in the background"""
+        self._schedule_rebuild()
+
+    def stop(self):
+        property_service.remove_change_listener(self.on_change)
+
+    def _schedule_rebuild(self):
+        property_service.add_change_listener(self.on_change)
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+            self._pending = []
+        threading.Thread(target=self._rebuild, name='text-search-rebuild', daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            index = _InvertedIndex.build(self.session_factory)
+        except Exception:
+            logger.exception("Text search index rebuild failed")
+            with self._lock:
+                self._rebuilding = False
+            return
+        with self._lock:
+            for property_id, document in self._pending:
+                index.apply(property_id, document)
+            self._index = index
+            self._built_at = time.monotonic()
+            self._rebuilding = False
+            self._pending = []
+
+    def on_change(self, event: str, property_id: str, db_property: Optional[models.Property]):
+        """Property change listener: reindex the property"""
+        document = None
+        if db_property is not None:
+            terms = document_terms(
+                db_property.name, db_property.description, db_property.location, db_property.developer,
+                [tag.tag_name for tag in db_property.tags]
+            )
+            document = (terms, bool(db_property.is_hidden))
+        with self._lock:
+            if self._index is not None:
+                self._index.apply(property_id, document)
+            if self._rebuilding:
+                self._pending.append((property_id, document))
+
+    def search(self, q: str, show_hidden: bool = False) -> List[Tuple[str, float]]:
+        """(property_id, BM25 score) for properties matching every word of q, best first"""
+        words = query_terms(q)
+        if not words:
+            return []
+        if self._index is None or time.monotonic() - self._built_at > self.MAX_AGE:
+            self._schedule_rebuild()
+        if self._index is None:
+            # Only until the first build finishes; a failed build is retried by the next search
+            raise HTTPException(status_code=503, detail="Text search is starting up", headers={"Retry-After": "5"})
+        with self._lock:
+            return self._index.search(words, show_hidden)
+
+_text_search_index: Optional[TextSearchIndex] = None
+
+def get_text_search_index() -> TextSearchIndex:
+    global _text_search_index
+    if _text_search_index is None:
+        from database import SessionLocal
+        _text_search_index = TextSearchIndex(SessionLocal)
+        memory_profiling.register_cache('text_search', _text_search_index.memory_stats)
+    return _text_search_index
@@ -0,0 +1,243 @@
+from contextvars import ContextVar
+from typing import Optional
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import secrets
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = 'mak-kotwal-venus-api'
+
+# Traces waiting to be written before new ones are dropped
+MAX_QUEUED_TRACES = 10000
+
+# OTLP span kinds
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+
+class Trace:
+    """Spans recorded for one sampled request"""
+
+    def __init__(self, name: str, attributes: Optional[dict] = None):
+        self.trace_id = secrets.token_hex(16)
+        self.spans = []
+        self.start_unix_ns = time.time_ns()
+        self._start = time.perf_counter_ns()
+        self.root = Span(self, name, None, attributes or {}, KIND_SERVER)
+
+    def unix_ns(self, perf_ns: int) -> int:
+        return self.start_unix_ns + (perf_ns - self._start)
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: total time per span name, in first-seen order"""
+        totals = {}
+        counts = {}
+        for span in self.spans:
+            if span is self.root or span.end is None:
+                continue
+            totals[span.name] = totals.get(span.name, 0) + span.end - span.start
+            counts[span.name] = counts.get(span.name, 0) + 1
+        metrics = [
+            f'{name};desc="{counts[name]}x";dur={total / 1e6:.2f}' if counts[name] > 1 else f'{name};dur={total / 1e6:.2f}'
+            for name, total in totals.items()
+        ]
+        metrics.append(f'total;dur={(time.perf_counter_ns() - self.root.start) / 1e6:.2f}')
+        return ', '.join(metrics)
+
+class Span:
+    __slots__ = ('trace', 'name', 'span_id', 'parent', 'attributes', 'kind', 'start', 'end', 'error', '_token')
+
+    def __init__(self, trace: Trace, name: str, parent: Optional['Span'], attributes: dict, kind: int = KIND_INTERNAL):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent = parent
+        self.attributes = attributes
+        self.kind = kind
+        self.start = time.perf_counter_ns()
+        self.end = None
+        self.error = None
+        trace.spans.append(self)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        _current_span.reset(self._token)
+        return False
+
+    def finish(self):
+        self.end = time.perf_counter_ns()
+
+    def to_otlp(self) -> dict:
+        span = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.trace.unix_ns(self.start)),
+            'endTimeUnixNano': str(self.trace.unix_ns(self.end if self.end is not None else self.start)),
+            'attributes': [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 0},
+        }
+        if self.parent is not None:
+            span['parentSpanId'] = self.parent.span_id
+        return span
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar('current_span', default=None)
+
+def span(name: str, **attributes):
+    """Time a stage of the current request: with tracing.span('query'): ...
+
+    Outside a sampled request this returns a shared no-op, so instrumented code costs
+    one context variable lookup when tracing is off.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NOOP_SPAN
+    return Span(parent.trace, name, parent, attributes)
+
+def traced(name: str):
+    """Decorator form of span() for functions called once per item"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+class SpanFileExporter:
+    """Appends each trace as one OTLP/JSON ExportTraceServiceRequest line.
+
+    That is the format of the OpenTelemetry Collector's file exporter, so the file can be
+    replayed into a collector or loaded by tools that read OTLP JSON. Writes happen on a
+    background thread so the event loop never waits on disk. A batch that cannot be
+    written is logged and dropped, and traces arriving while MAX_QUEUED_TRACES are
+    already waiting are dropped with a warning, so a failing disk costs traces, not memory.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue = queue.Queue(maxsize=MAX_QUEUED_TRACES)
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='span-exporter', daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Trace):
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            with self._lock:
+                dropped, self._dropped = self._dropped, self._dropped + 1
+            # Warn on the first drop of each run of them
+            if not dropped:
+                logger.warning("Span export queue is full; dropping traces")
+
+    def _run(self):
+        while True:
+            traces = [self._queue.get()]
+            while True:
+                try:
+                    traces.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            with self._lock:
+                dropped, self._dropped = self._dropped, 0
+            if dropped:
+                logger.warning("Dropped %d traces while the span export queue was full", dropped)
+            try:
+                with open(self.path, 'a') as f:
+                    for trace in traces:
+                        f.write(json.dumps(self._request(trace), separators=(',', ':')) + '\n')
+            except (OSError, TypeError, ValueError):
+                logger.exception("Failed to write %d traces to %s", len(traces), self.path)
+
+    @staticmethod
+    def _request(trace: Trace) -> dict:
+        return {'resourceSpans': [{
+            'resource': {'attributes': [_otlp_attribute('service.name', SERVICE_NAME)]},
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [span.to_otlp() for span in trace.spans],
+            }],
+        }]}
+
+class TracingMiddleware:
+    """ASGI middleware that traces a sample of requests.
+
+    Sampled requests get a Server-Timing header summing their spans by name (visible in
+    browser dev tools) and, with an exporter, are written out as OTLP JSON.
+    """
+
+    def __init__(self, app, sample_rate: float, exporter: Optional[SpanFileExporter] = None):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or random.random() >= self.sample_rate:
+            return await self.app(scope, receive, send)
+
+        trace = Trace(f"{scope['method']} {scope['path']}", {
+            'http.request.method': scope['method'],
+            'url.path': scope['path'],
+        })
+        root = trace.root
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                root.attributes['http.response.status_code'] = message['status']
+                message = {**message, 'headers': [
+                    *message.get('headers', ()), (b'server-timing', trace.server_timing().encode())
+                ]}
+            await send(message)
+
+        token = _current_span.set(root)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except Exception as exc:
+            root.error = type(exc).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            root.finish()
+            if self.exporter is not None:
+                self.exporter.export(trace)
+
+def middleware_options_from_env() -> Optional[dict]:
+    """TRACE_SAMPLE_RATE (0-1, default 0 = off) and TRACE_FILE (optional OTLP JSON lines output)"""
+    sample_rate = float(os.getenv('TRACE_SAMPLE_RATE', '0'))
+    if sample_rate <= 0:
+        return None
+    path = os.getenv('TRACE_FILE')
+    return {'sample_rate': min(sample_rate, 1.0), 'exporter': SpanFileExporter(path) if path else None}
@@ -0,0 +1,142 @@
+from sqlalchemy.orm import sessionmaker, selectinload
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from typing import Optional, Callable, List
+import asyncio
+import logging
+import os
+import models
+import property_service
+
+logger = logging.getLogger(__name__)
+
+# How long the first write of a batch waits for others to join it
+WINDOW_SECONDS = float(os.getenv('WRITE_COALESCE_WINDOW_MS', '2')) / 1000
+
+MAX_BATCH = 64
+
+class WriteOp:
+    """One caller's write: apply(db) stages changes without committing and returns the property.
+
+    property_id names an existing property the op touches, so the batch can load all of
+    them (with their tags) in one query before any op runs.
+    """
+
+    def __init__(self, event: str, apply: Callable, property_id: Optional[str] = None):
+        self.event = event
+        self.apply = apply
+        self.property_id = property_id
+
+class WriteCoalescer:
+    """Group commit for property writes.
+
+    Writes submitted while a batch is being committed, or within WINDOW_SECONDS of the
+    first one, share a single transaction, so concurrent uploads pay for one commit (one
+    fsync and one trip through SQLite's write lock) instead of one each. Batches run one
+    at a time on a dedicated thread, which also keeps the event loop free while they do.
+
+    Each op is flushed on its own, so a failing op is rolled back and reported to its
+    caller alone and the rest of the batch is replayed without it. Sessions don't expire
+    objects on commit: column defaults are generated client-side, so the committed
+    objects are already complete and no refresh round trip is needed.
+    """
+
+    def __init__(self, session_factory, window: float = WINDOW_SECONDS, max_batch: int = MAX_BATCH):
+        self.session_factory = session_factory
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='write-coalescer')
+
+    async def submit(self, op: WriteOp) -> models.Property:
+        """Queue op for the next batch and wait for its own result or error"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((op, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+        return await future
+
+    async def _flush(self):
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(self.window)
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            try:
+                results = await loop.run_in_executor(self._executor, self._run_batch, [op for op, _ in batch])
+            except Exception as exc:
+                results = [(False, exc)] * len(batch)
+            for (_, future), (ok, value) in zip(batch, results):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _run_batch(self, ops: List[WriteOp]) -> List[tuple]:
+        results = [None] * len(ops)
+        remaining = list(range(len(ops)))
+        while remaining:
+            db = self.session_factory()
+            try:
+                property_ids = {ops[i].property_id for i in remaining if ops[i].property_id}
+                # Held for the batch: the identity map only keeps weak references
+                preloaded = db.query(models.Property).options(selectinload(models.Property.tags)).filter(
+                    models.Property.property_id.in_(property_ids)
+                ).all() if property_ids else []
+
+                applied, failed = [], None
+                for i in remaining:
+                    try:
+                        db_property = ops[i].apply(db)
+                        db.flush()
+                    except HTTPException as exc:
+                        # Validation errors are raised before an op changes anything
+                        results[i] = (False, exc)
+                        continue
+                    except Exception as exc:
+                        failed = (i, exc)
+                        break
+                    applied.append((i, db_property))
+
+                if failed is not None:
+                    db.rollback()
+                    results[failed[0]] = (False, failed[1])
+                    remaining = [i for i in remaining if i != failed[0] and results[i] is None]
+                    continue
+
+                try:
+                    db.commit()
+                except Exception as exc:
+                    db.rollback()
+                    logger.exception("Coalesced write batch of %d failed to commit", len(applied))
+                    for i, _ in applied:
+                        results[i] = (False, exc)
+                    break
+
+                for i, db_property in applied:
+                    property_service.notify_change(ops[i].event, db_property.property_id, db_property)
+                    results[i] = (True, db_property)
+                break
+            finally:
+                db.close()
+        return results
+
+    async def drain(self):
+        """Wait for queued writes to commit (on shutdown)"""
+        if self._flusher is not None:
+            await self._flusher
+
+_write_coalescer: Optional[WriteCoalescer] = None
+
+def get_write_coalescer() -> WriteCoalescer:
+    global _write_coalescer
+    if _write_coalescer is None:
+        from database import make_engine
+        # A connection of its own, so writes never queue behind request sessions for the shared pool
+        writer = make_engine(pool_size=1, max_overflow=0)
+        _write_coalescer = WriteCoalescer(
+            sessionmaker(bind=writer, autocommit=False, autoflush=False, expire_on_commit=False)
+        )
+    return _write_coalescer
@@ -0,0 +1,14 @@
+import threading
+
+# Bumped after every committed write so cached reads can tell they are stale.
+# Counters are per process; caches keyed on them should also expire by age so
+# writes made by other workers are picked up.
+_versions = {'properties': 0, 'users': 0}
+_lock = threading.Lock()
+
+def bump(kind: str):
+    with _lock:
+        _versions[kind] += 1
+
+def version(kind: str) -> int:
+    return _versions[kind]
@@ -167,7 +167,7 @@ const PropertyDetailsModal = ({ property, isOpen, onClose, onUpdate }) => {
           )}
 
           {/* Price */}
-          {isFieldVisible('budget') && (
+          {property.budget != null && isFieldVisible('budget') && (
             <div className="bg-amber-200/10 p-4 rounded-lg border border-amber-200/20">
               <div className="flex items-center gap-2 mb-2">
                 <DollarSign className="w-5 h-5 text-amber-200" />
@@ -191,7 +191,7 @@ const PropertyDetailsModal = ({ property, isOpen, onClose, onUpdate }) => {
             )}
 
             {/* Location */}
-            {isFieldVisible('location') && (
+            {property.location != null && isFieldVisible('location') && (
               <div className="bg-black/30 p-4 rounded-lg border border-gray-800">
                 <div className="flex items-center gap-2 mb-2">
                   <MapPin className="w-5 h-5 text-amber-200" />
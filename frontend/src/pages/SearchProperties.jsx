@@ -362,33 +362,45 @@ const SearchProperties = () => {
                   )}
                   <CardHeader>
                     <CardTitle className="text-xl text-white font-serif">{property.name}</CardTitle>
-                    <p className="text-amber-200 text-lg font-medium">{formatCurrency(property.budget)}</p>
+                    {property.budget != null && (
+                      <p className="text-amber-200 text-lg font-medium">{formatCurrency(property.budget)}</p>
+                    )}
                     {property.is_hidden && (
                       <span className="text-xs text-red-400">Hidden from users</span>
                     )}
                   </CardHeader>
                   <CardContent>
                     <div className="space-y-2 text-sm">
-                      <div className="flex justify-between">
-                        <span className="text-gray-400">Configuration:</span>
-                        <span className="text-white">{property.configurations}</span>
-                      </div>
-                      <div className="flex justify-between">
-                        <span className="text-gray-400">Location:</span>
-                        <span className="text-white">{property.location}</span>
-                      </div>
-                      <div className="flex justify-between">
-                        <span className="text-gray-400">Carpet Area:</span>
-                        <span className="text-white">{property.carpet_area} sqft</span>
-                      </div>
-                      <div className="flex justify-between">
-                        <span className="text-gray-400">Price/Sqft:</span>
-                        <span className="text-white">₹{property.price_per_sqft?.toLocaleString()}</span>
-                      </div>
-                      <div className="flex justify-between">
-                        <span className="text-gray-400">Developer:</span>
-                        <span className="text-white">{property.developer}</span>
-                      </div>
+                      {property.configurations != null && (
+                        <div className="flex justify-between">
+                          <span className="text-gray-400">Configuration:</span>
+                          <span className="text-white">{property.configurations}</span>
+                        </div>
+                      )}
+                      {property.location != null && (
+                        <div className="flex justify-between">
+                          <span className="text-gray-400">Location:</span>
+                          <span className="text-white">{property.location}</span>
+                        </div>
+                      )}
+                      {property.carpet_area != null && (
+                        <div className="flex justify-between">
+                          <span className="text-gray-400">Carpet Area:</span>
+                          <span className="text-white">{property.carpet_area} sqft</span>
+                        </div>
+                      )}
+                      {property.price_per_sqft != null && (
+                        <div className="flex justify-between">
+                          <span className="text-gray-400">Price/Sqft:</span>
+                          <span className="text-white">₹{property.price_per_sqft.toLocaleString()}</span>
+                        </div>
+                      )}
+                      {property.developer != null && (
+                        <div className="flex justify-between">
+                          <span className="text-gray-400">Developer:</span>
+                          <span className="text-white">{property.developer}</span>
+                        </div>
+                      )}
                       {property.gmaps_link && (
                         <div className="pt-2">
                           <a
@@ -14,6 +14,7 @@ const UserManagement = () => {
   const { user } = useAuth();
   const { toast } = useToast();
   const [users, setUsers] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [showAddForm, setShowAddForm] = useState(false);
   const [newUser, setNewUser] = useState({
     name: '',
@@ -25,15 +26,17 @@ const UserManagement = () => {
     loadUsers();
   }, []);
 
-  const loadUsers = async () => {
+  const loadUsers = async (cursor = null) => {
     try {
-      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/users`, {
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/users${query}`, {
         credentials: 'include'
       });
       
       if (response.ok) {
         const data = await response.json();
-        setUsers(data);
+        setUsers(cursor ? [...users, ...data.users] : data.users);
+        setNextCursor(data.next_cursor);
       }
     } catch (error) {
       console.error('Load users error:', error);
@@ -345,6 +348,17 @@ const UserManagement = () => {
             </Card>
           ))}
         </div>
+        {nextCursor && (
+          <div className="flex justify-center mt-6">
+            <Button
+              onClick={() => loadUsers(nextCursor)}
+              variant="outline"
+              className="border-gray-700 text-gray-300 hover:bg-gray-800 transition-all duration-300"
+            >
+              Load More
+            </Button>
+          </div>
+        )}
       </main>
     </div>
   );
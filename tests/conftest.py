@@ -0,0 +1,32 @@
+"""Run the backend against a throwaway SQLite database and upload directory"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+_workdir = Path(tempfile.mkdtemp(prefix='backend-tests-'))
+
+# The backend reads its configuration at import time
+os.environ['DATABASE_URL'] = f"sqlite:///{_workdir / 'test.db'}"
+os.environ['UPLOAD_DIR'] = str(_workdir / 'uploads')
+os.environ['EXPORT_DIR'] = str(_workdir / 'exports')
+os.environ['ADMISSION_CONTROL'] = 'false'
+# Creating listings needs the duplicate index, which builds in the background after startup
+os.environ['DUPLICATE_POLICY'] = 'allow'
+sys.path.insert(0, str(BACKEND_DIR))
+
+@pytest.fixture(scope='session')
+def client():
+    from starlette.testclient import TestClient
+    import server
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+@pytest.fixture(scope='session')
+def admin_token(client):
+    challenge = client.post('/api/auth/init-2fa', json={'username': 'admin', 'email': 'admin@example.com', 'role': 'admin'}).json()
+    response = client.post('/api/auth/verify-2fa', json={'temp_token': challenge['temp_token'], 'otp_code': challenge['demo_otp']})
+    return response.cookies['session_token']
@@ -0,0 +1,33 @@
+import pytest
+
+@pytest.fixture
+def hidden_property_id(client, admin_token):
+    client.cookies.set('session_token', admin_token)
+    try:
+        created = client.post('/api/properties', data={
+            'name': 'Hidden Heights', 'budget': '12500000', 'location': 'Worli, Mumbai',
+            'description': 'Not yet public',
+        })
+        assert created.status_code == 200
+        property_id = created.json()['property_id']
+        toggled = client.patch(f'/api/properties/{property_id}/toggle-visibility')
+        assert toggled.json()['is_hidden'] is True
+    finally:
+        client.cookies.clear()
+    return property_id
+
+def test_anonymous_get_of_hidden_property_is_not_found(client, hidden_property_id):
+    response = client.get(f'/api/properties/{hidden_property_id}')
+    assert response.status_code == 404
+    assert 'public' not in response.headers.get('cache-control', '')
+    assert 'etag' not in response.headers
+
+def test_admin_get_of_hidden_property_is_private(client, admin_token, hidden_property_id):
+    client.cookies.set('session_token', admin_token)
+    try:
+        response = client.get(f'/api/properties/{hidden_property_id}')
+    finally:
+        client.cookies.clear()
+    assert response.status_code == 200
+    assert response.json()['is_hidden'] is True
+    assert response.headers['cache-control'].startswith('private')
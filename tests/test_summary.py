@@ -0,0 +1,22 @@
+def test_users_without_a_role_are_counted_with_users(client):
+    from sqlalchemy import update
+    from database import SessionLocal
+    import models
+    import summary_service
+
+    db = SessionLocal()
+    try:
+        before = summary_service._compute(db, 30, 10)['users_by_role'].get('user', 0)
+        db.add_all([
+            models.User(username='legacy', email='legacy@example.com'),
+            models.User(username='member', email='member@example.com', role='user'),
+        ])
+        db.flush()
+        # The ORM fills in the column default, so clear it the way legacy rows have it
+        db.execute(update(models.User).where(models.User.email == 'legacy@example.com').values(role=None))
+        db.commit()
+        users_by_role = summary_service._compute(db, 30, 10)['users_by_role']
+    finally:
+        db.close()
+    assert users_by_role['user'] == before + 2
+    assert None not in users_by_role